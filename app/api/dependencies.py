@@ -5,6 +5,7 @@ from typing import Dict, Any
 
 from graph.builder import graph, health_check, get_metrics
 from config import app_config
+from .sessions import session_runner
 
 
 def get_graph():
@@ -12,6 +13,11 @@ def get_graph():
     return graph
 
 
+def get_session_runner():
+    """Get the per-session run coordinator."""
+    return session_runner
+
+
 def get_health_check():
     """Get the health check function."""
     return health_check
@@ -31,6 +37,9 @@ def validate_user_id(user_id: str) -> str:
     """Validate and return user ID."""
     if not user_id or not user_id.strip():
         raise HTTPException(status_code=400, detail="User ID is required")
+    # The user ID is a memory namespace label, where "." would read back as two levels
+    if "." in user_id:
+        raise HTTPException(status_code=400, detail="User ID cannot contain '.'")
     return user_id.strip()
 
 
@@ -1,10 +1,21 @@
 """REST API endpoints for the memory agent."""
 
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
-from .dependencies import get_graph, get_health_check, get_metrics_func, validate_user_id, validate_session_id
+from chains.llm_cache import response_cache
+from config import app_config
+from graph.memory import aquery_todos
+from storage.unit_of_work import store_writer
+from storage.versioning import VersionConflictError
+from utils.resilience import CircuitOpenError
+from utils.llm_scheduler import SchedulerRejectedError
+
+from .dependencies import get_graph, get_session_runner, get_health_check, get_metrics_func, validate_user_id, validate_session_id
+from .streaming import sse_frame, sse_frames, stream_deltas
 from ..models.requests import ChatRequest, ChatResponse, MemoryRequest, MemoryResponse, HealthResponse, MetricsResponse
 
 router = APIRouter()
@@ -13,9 +24,10 @@ router = APIRouter()
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
-    graph=Depends(get_graph)
+    graph=Depends(get_graph),
+    session_runner=Depends(get_session_runner)
 ):
-    """Synchronous chat endpoint."""
+    """Request/response chat endpoint."""
     try:
         # Validate inputs
         user_id = validate_user_id(request.user_id)
@@ -30,11 +42,15 @@ async def chat(
             }
         }
         
-        # Process with LangGraph
-        result = graph.invoke(
-            {"messages": [HumanMessage(content=request.message)]},
-            config
-        )
+        # Process with LangGraph, one run at a time per session; messages the
+        # same user sent while a run is in progress are answered together by the next run
+        async def run(messages):
+            return await graph.ainvoke(
+                {"messages": [HumanMessage(content=message) for message in messages]},
+                config
+            )
+        
+        result = await session_runner.submit(session_id, request.message, run, group=user_id)
         
         # Extract response
         response_message = result["messages"][-1].content
@@ -50,10 +66,59 @@ async def chat(
             }
         )
         
+    except HTTPException:
+        # Validation errors keep their status
+        raise
+    except (CircuitOpenError, SchedulerRejectedError) as e:
+        # The model provider is failing or saturated; tell clients to back off instead of a generic 500
+        raise HTTPException(status_code=503, detail=f"Chat temporarily unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    graph=Depends(get_graph),
+    session_runner=Depends(get_session_runner)
+):
+    """Streaming chat endpoint: the turn as Server-Sent Events (tokens, node and memory events, then `done`)."""
+    user_id = validate_user_id(request.user_id)
+    session_id = validate_session_id(request.session_id)
+    config = {
+        "configurable": {
+            "thread_id": session_id,
+            "user_id": user_id,
+            "todo_category": "general"
+        }
+    }
+    
+    async def turn():
+        # Streamed turns are not merged, but never overlap with other runs on the session
+        async with session_runner.exclusive(session_id):
+            async for event in stream_deltas(graph, {"messages": [HumanMessage(content=request.message)]}, config):
+                yield event
+    
+    async def frames():
+        # Headers are already sent once streaming starts, so failures are reported as an error event
+        try:
+            async for frame in sse_frames(turn(), app_config.sse_heartbeat_seconds, http_request.is_disconnected):
+                yield frame
+            yield sse_frame({"type": "done", "session_id": session_id, "user_id": user_id})
+        except (CircuitOpenError, SchedulerRejectedError) as e:
+            yield sse_frame({"type": "error", "status": 503, "message": f"Chat temporarily unavailable: {str(e)}"})
+        except Exception as e:
+            yield sse_frame({"type": "error", "status": 500, "message": f"Chat processing failed: {str(e)}"})
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/memories/profile/{user_id}", response_model=MemoryResponse)
 async def get_profile(
     user_id: str,
@@ -65,7 +130,9 @@ async def get_profile(
         
         # Search for profile memories
         profile_namespace = ("profile", "general", user_id)
-        memories = graph.store.search(profile_namespace)
+        # Include updates still being flushed by write-behind
+        await store_writer.wait(user_id)
+        memories = await graph.store.asearch(profile_namespace)
         
         profile_data = [mem.value for mem in memories] if memories else []
         
@@ -76,6 +143,8 @@ async def get_profile(
             message="Profile memories retrieved successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve profile: {str(e)}")
 
@@ -92,15 +161,21 @@ async def update_profile(
         
         # Store profile data
         profile_namespace = ("profile", "general", user_id)
-        graph.store.put(profile_namespace, "user_profile", request.data)
+        # Compare-and-set when the body carries the _version it was read at, else overwrite
+        stored = await store_writer.aput(graph.store, profile_namespace, "user_profile", request.data)
+        response_cache.bump(user_id)
         
         return MemoryResponse(
             user_id=user_id,
-            data=request.data,
+            data=stored,
             success=True,
             message="Profile updated successfully"
         )
         
+    except HTTPException:
+        raise
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update profile: {str(e)}")
 
@@ -108,25 +183,35 @@ async def update_profile(
 @router.get("/memories/todos/{user_id}", response_model=MemoryResponse)
 async def get_todos(
     user_id: str,
+    status: Optional[List[str]] = Query(None, description="Only todos with one of these statuses (repeatable)"),
+    due_before: Optional[datetime] = Query(None, description="Only todos due before this time, soonest first"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     graph=Depends(get_graph)
 ):
-    """Get user todo memories."""
+    """Get user todo memories, newest first (or soonest deadline first with `due_before`), one page at a time."""
     try:
         user_id = validate_user_id(user_id)
         
-        # Search for todo memories
-        todo_namespace = ("todo", "general", user_id)
-        memories = graph.store.search(todo_namespace)
+        # Include updates still being flushed by write-behind
+        await store_writer.wait(user_id)
+        memories, next_cursor = await aquery_todos(
+            graph.store, user_id, "general", statuses=status, due_before=due_before, limit=limit, cursor=cursor
+        )
         
-        todo_data = [mem.value for mem in memories] if memories else []
+        todo_data = [mem.value for mem in memories]
         
         return MemoryResponse(
             user_id=user_id,
-            data={"todos": todo_data},
+            data={"todos": todo_data, "next_cursor": next_cursor},
             success=True,
             message="Todo memories retrieved successfully"
         )
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve todos: {str(e)}")
 
@@ -143,15 +228,21 @@ async def update_todos(
         
         # Store todo data
         todo_namespace = ("todo", "general", user_id)
-        graph.store.put(todo_namespace, "user_todos", request.data)
+        # Compare-and-set when the body carries the _version it was read at, else overwrite
+        stored = await store_writer.aput(graph.store, todo_namespace, "user_todos", request.data)
+        response_cache.bump(user_id)
         
         return MemoryResponse(
             user_id=user_id,
-            data=request.data,
+            data=stored,
             success=True,
             message="Todos updated successfully"
         )
         
+    except HTTPException:
+        raise
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update todos: {str(e)}")
 
@@ -167,7 +258,9 @@ async def get_instructions(
         
         # Search for instruction memories
         instructions_namespace = ("instructions", "general", user_id)
-        memories = graph.store.search(instructions_namespace)
+        # Include updates still being flushed by write-behind
+        await store_writer.wait(user_id)
+        memories = await graph.store.asearch(instructions_namespace)
         
         instruction_data = [mem.value for mem in memories] if memories else []
         
@@ -178,6 +271,8 @@ async def get_instructions(
             message="Instruction memories retrieved successfully"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve instructions: {str(e)}")
 
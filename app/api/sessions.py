@@ -0,0 +1,128 @@
+"""Per-session serialization and message coalescing for the API layer.
+
+Graph runs on the same `thread_id` must not overlap: both would load the same
+checkpoint and the later write would drop the other turn. `SessionRunner`
+runs at most one graph run per session at a time. Messages that arrive while
+a run is in progress are queued; once the run finishes (and no new message
+has arrived for `window` seconds) they are merged into a single follow-up
+run, and every caller whose message was merged receives that run's result.
+Only messages submitted with the same `group` (the user) are merged: a run
+carries its caller's user_id, so another user's message waits for a run of
+its own.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import app_config
+
+RunFn = Callable[[List[Any]], Awaitable[Any]]
+
+
+class _Session:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending: List[Tuple[Any, RunFn, asyncio.Future, Any]] = []
+        self.last_arrival = 0.0
+        self.worker: Optional[asyncio.Task] = None
+        self.users = 0
+
+
+class SessionRunner:
+    """One graph run at a time per session, merging messages that queue up behind a run."""
+
+    def __init__(self, window: float = 0.3):
+        self.window = window
+        self._sessions: Dict[str, _Session] = {}
+        self.runs = 0
+        self.merged_messages = 0
+
+    def _acquire(self, key: str) -> _Session:
+        session = self._sessions.setdefault(key, _Session())
+        session.users += 1
+        return session
+
+    def _release(self, key: str, session: _Session):
+        session.users -= 1
+        if session.users == 0 and self._sessions.get(key) is session:
+            del self._sessions[key]
+
+    @asynccontextmanager
+    async def exclusive(self, key: str) -> AsyncIterator[None]:
+        """Hold the session for a run that cannot be merged (e.g. a streamed WebSocket turn)."""
+        session = self._acquire(key)
+        try:
+            async with session.lock:
+                yield
+        finally:
+            self._release(key, session)
+
+    async def submit(self, key: str, message: Any, run: RunFn, group: Any = None) -> Any:
+        """Queue `message` for session `key` and return the result of the run that handles it.
+
+        `run` receives the list of merged messages; the first queued caller's
+        `run` is used for the merged batch, which only takes messages of that
+        caller's `group`.
+        """
+        session = self._acquire(key)
+        try:
+            future = asyncio.get_running_loop().create_future()
+            session.pending.append((message, run, future, group))
+            session.last_arrival = time.monotonic()
+            if session.worker is None or session.worker.done():
+                # The worker keeps the session alive even if every caller goes away
+                session.users += 1
+                session.worker = asyncio.create_task(self._drain(key, session))
+            return await future
+        finally:
+            self._release(key, session)
+
+    async def _drain(self, key: str, session: _Session):
+        try:
+            first = True
+            while session.pending:
+                if not first:
+                    # Give a chatty client a moment to finish typing before the merged run
+                    while (delay := session.last_arrival + self.window - time.monotonic()) > 0:
+                        await asyncio.sleep(delay)
+                first = False
+                async with session.lock:
+                    queued = [entry for entry in session.pending if not entry[2].done()]
+                    if not queued:
+                        session.pending = []
+                        continue
+                    # Other groups' messages stay queued for runs of their own
+                    batch = [entry for entry in queued if entry[3] == queued[0][3]]
+                    session.pending = [entry for entry in queued if entry[3] != queued[0][3]]
+                    self.runs += 1
+                    self.merged_messages += len(batch) - 1
+                    try:
+                        result = await batch[0][1]([entry[0] for entry in batch])
+                    except Exception as e:
+                        for _, _, future, _ in batch:
+                            if not future.done():
+                                future.set_exception(e)
+                    except BaseException:
+                        # Cancelled (e.g. on shutdown): don't leave callers waiting forever
+                        for _, _, future, _ in batch + session.pending:
+                            future.cancel()
+                        raise
+                    else:
+                        for _, _, future, _ in batch:
+                            if not future.done():
+                                future.set_result(result)
+        finally:
+            self._release(key, session)
+
+    def is_active(self, key: str) -> bool:
+        """Whether a run for session `key` is in progress or queued."""
+        return key in self._sessions
+
+    def stats(self) -> Dict[str, int]:
+        """Session counters for monitoring."""
+        return {"active_sessions": len(self._sessions), "runs": self.runs, "merged_messages": self.merged_messages}
+
+
+# Global runner shared by the REST and WebSocket endpoints
+session_runner = SessionRunner(window=app_config.chat_coalesce_window)
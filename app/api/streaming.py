@@ -0,0 +1,146 @@
+"""Delta streaming of graph runs: reply tokens, node boundaries and memory notices.
+
+`stream_mode="values"` sends the whole accumulated state after every step, so
+each turn re-sends the full conversation (bytes on the wire grow
+quadratically with its length) and the client sees nothing until a node has
+finished. `stream_deltas` runs the graph with `stream_mode=["messages",
+"tasks"]` instead and yields small events:
+
+- `{"type": "node_start", "node": ...}` / `{"type": "node_end", "node": ...}`
+- `{"type": "token", "text": ...}`: the next piece of the reply, as the model
+  produces it
+- `{"type": "message", "text": ...}`: a reply that was not (or not exactly)
+  streamed as tokens, e.g. a cached answer, a templated acknowledgement or a
+  hedged call won by the second attempt. It replaces the tokens of that node.
+- `{"type": "memory", "kind": "profile" | "todo" | "instructions", "summary": ...}`
+
+Tokens of the extraction, routing and summary model calls are not forwarded.
+
+`sse_frames` carries the same events as Server-Sent Events for
+`POST /api/v1/chat/stream`, with heartbeat comments while nothing happens.
+"""
+import asyncio
+import json
+from contextlib import suppress
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+
+# Nodes whose model output is the reply shown to the user
+REPLY_NODES = ("task_asis", "acknowledge_update")
+
+# Memory kind reported for each update node
+MEMORY_KINDS = {"update_profile": "profile", "update_todos": "todo", "update_instructions": "instructions"}
+
+# Memory notices are cut to this many characters
+SUMMARY_CHARS = 200
+
+# SSE comment line sent when no event has gone out for a heartbeat interval
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+_END = object()
+
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    # `text` is a method before langchain-core 1.0 and a (still callable) str property from then on
+    text = message.text
+    return text if isinstance(text, str) else text()
+
+
+def _reply_events(result: Dict[str, Any], streamed: str) -> list:
+    """A `message` event for each reply in a node's output that its tokens did not already spell out."""
+    return [
+        {"type": "message", "text": text}
+        for message in result.get("messages") or []
+        if isinstance(message, AIMessage) and (text := _text(message)) and text != streamed
+    ]
+
+
+def _memory_event(node: str, result: Dict[str, Any]) -> Optional[dict]:
+    """The notice for an update node: its acknowledgement, or else what the ToolMessage reports."""
+    for message in result.get("messages") or []:
+        if isinstance(message, ToolMessage):
+            summary = message.artifact or _text(message)
+            return {"type": "memory", "kind": MEMORY_KINDS[node], "summary": summary[:SUMMARY_CHARS]}
+    return None
+
+
+async def stream_deltas(graph, inputs: Dict[str, Any], config: Dict[str, Any]) -> AsyncIterator[dict]:
+    """Run `graph` on `inputs` and yield the turn as delta events (see the module docstring)."""
+    # Per running task: the model run whose tokens are being forwarded, and the text sent so far
+    # (a hedged reply has two runs; only the first one to produce a token is forwarded)
+    runs: Dict[str, str] = {}
+    texts: Dict[str, str] = {}
+    async for mode, chunk in graph.astream(inputs, config, stream_mode=["messages", "tasks"]):
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") not in REPLY_NODES or not isinstance(message, AIMessageChunk):
+                continue
+            text = _text(message)
+            task = metadata["langgraph_checkpoint_ns"].rsplit(":", 1)[-1]
+            if not text or runs.setdefault(task, message.id) != message.id:
+                continue
+            texts[task] = texts.get(task, "") + text
+            yield {"type": "token", "text": text}
+        elif "result" not in chunk:
+            yield {"type": "node_start", "node": chunk["name"]}
+        else:
+            node, result = chunk["name"], chunk["result"]
+            runs.pop(chunk["id"], None)
+            streamed = texts.pop(chunk["id"], "")
+            if isinstance(result, dict):
+                if node in REPLY_NODES:
+                    for event in _reply_events(result, streamed):
+                        yield event
+                elif node in MEMORY_KINDS and (event := _memory_event(node, result)):
+                    yield event
+            yield {"type": "node_end", "node": node}
+
+
+def sse_frame(event: Dict[str, Any]) -> str:
+    """One Server-Sent Events frame: the event type as `event:`, the other fields as JSON `data:`."""
+    data = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(data, separators=(',', ':'), ensure_ascii=False)}\n\n"
+
+
+async def sse_frames(events: AsyncIterator[dict], heartbeat: float,
+                     disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+    """Encode `events` as SSE frames, with a heartbeat comment after every `heartbeat` seconds of silence.
+
+    `events` runs in a task of its own, so heartbeats also go out while it
+    waits for the session lock or a slow model call. It is cancelled (which
+    cancels the graph run) when the client has gone, as seen by
+    `disconnected()` at a heartbeat or by this generator being cancelled or
+    closed. Errors raised by `events` propagate to the caller.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for event in events:
+                await queue.put(event)
+            await queue.put(_END)
+        except Exception as error:
+            await queue.put(error)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if await disconnected():
+                    return
+                yield HEARTBEAT_FRAME
+                continue
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield sse_frame(item)
+    finally:
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
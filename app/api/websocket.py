@@ -1,10 +1,13 @@
 """WebSocket endpoints for real-time streaming."""
 
 import json
+import uuid
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from fastapi.encoders import jsonable_encoder
 from langchain_core.messages import HumanMessage
 
-from .dependencies import get_graph
+from .dependencies import get_graph, get_session_runner, validate_user_id
+from .streaming import stream_deltas
 from ..models.requests import WebSocketMessage
 
 router = APIRouter()
@@ -13,10 +16,14 @@ router = APIRouter()
 @router.websocket("/ws/chat")
 async def websocket_chat(
     websocket: WebSocket,
-    graph=Depends(get_graph)
+    graph=Depends(get_graph),
+    session_runner=Depends(get_session_runner)
 ):
     """WebSocket endpoint for real-time chat streaming."""
     await websocket.accept()
+    # Clients without a session ID get a thread of their own for this connection,
+    # instead of all anonymous sockets sharing one ever-growing thread
+    anonymous_thread_id = f"websocket-{uuid.uuid4()}"
     
     try:
         while True:
@@ -26,6 +33,7 @@ async def websocket_chat(
             # Validate message structure
             try:
                 message_data = WebSocketMessage(**data)
+                message_data.user_id = validate_user_id(message_data.user_id)
             except Exception as e:
                 await websocket.send_json({
                     "type": "error",
@@ -36,26 +44,29 @@ async def websocket_chat(
             # Create configuration for LangGraph
             config = {
                 "configurable": {
-                    "thread_id": message_data.session_id or "websocket-session",
+                    "thread_id": message_data.session_id or anonymous_thread_id,
                     "user_id": message_data.user_id,
                     "todo_category": "general"
                 }
             }
             
             try:
-                # Stream LangGraph response
-                for chunk in graph.stream(
-                    {"messages": [HumanMessage(content=message_data.message)]},
-                    config,
-                    stream_mode="values"
-                ):
-                    # Send chunk to client
-                    await websocket.send_json({
-                        "type": "chunk",
-                        "data": chunk,
-                        "session_id": message_data.session_id,
-                        "user_id": message_data.user_id
-                    })
+                # Stream LangGraph response; streamed turns are not merged, but
+                # still never overlap with other runs on the same session
+                async with session_runner.exclusive(config["configurable"]["thread_id"]):
+                    inputs = {"messages": [HumanMessage(content=message_data.message)]}
+                    if message_data.stream == "deltas":
+                        async for event in stream_deltas(graph, inputs, config):
+                            await websocket.send_json(event)
+                    else:
+                        async for chunk in graph.astream(inputs, config, stream_mode="values"):
+                            # Send chunk to client
+                            await websocket.send_json({
+                                "type": "chunk",
+                                "data": jsonable_encoder(chunk),
+                                "session_id": message_data.session_id,
+                                "user_id": message_data.user_id
+                            })
                 
                 # Send completion signal
                 await websocket.send_json({
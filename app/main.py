@@ -1,14 +1,21 @@
 """FastAPI Memory Agent Application."""
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from .api.routes import router as api_router
+from .api.sessions import session_runner
 from .api.websocket import router as websocket_router
 from .middleware.logging import LoggingMiddleware
 from utils.logging_config import logger
+from graph.builder import base_store, checkpoint_retention
+from graph.nodes import extraction_queue
+from storage.journaled_store import JournaledStore
+from storage.unit_of_work import store_writer
+from config import app_config
 
 
 @asynccontextmanager
@@ -16,9 +23,19 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     logger.info("Starting Asis Memory Agent API server")
+    # Threads with a run in progress are never garbage collected
+    checkpoint_retention.start(is_active=session_runner.is_active)
     yield
     # Shutdown
     logger.info("Shutting down Asis Memory Agent API server")
+    await checkpoint_retention.stop()
+    # Let deferred memory extraction finish before the process exits
+    await extraction_queue.drain(timeout=app_config.extraction_drain_timeout)
+    # ...and flush the memory writes still buffered by write-behind
+    await store_writer.drain(timeout=app_config.extraction_drain_timeout)
+    # Make the last group commit of a journaled memory store durable
+    if isinstance(base_store, JournaledStore):
+        await asyncio.to_thread(base_store.sync)
 
 
 # Create FastAPI application
@@ -58,6 +75,7 @@ async def root():
         "redoc": "/redoc",
         "health": "/api/v1/health",
         "metrics": "/api/v1/metrics",
+        "stream": "/api/v1/chat/stream",
         "websocket": "/ws/chat"
     })
 
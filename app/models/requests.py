@@ -1,6 +1,6 @@
 """Pydantic models for request/response validation."""
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Literal
 from pydantic import BaseModel
 
 
@@ -20,10 +20,15 @@ class ChatResponse(BaseModel):
 
 
 class WebSocketMessage(BaseModel):
-    """Message model for WebSocket communication."""
+    """Message model for WebSocket communication.
+
+    `stream` picks the reply format: "values" (the full graph state after
+    every step) or, opted into, "deltas" (tokens, node and memory events).
+    """
     message: str
     user_id: str = "default-user"
     session_id: Optional[str] = None
+    stream: Literal["values", "deltas"] = "values"
 
 
 class MemoryRequest(BaseModel):
@@ -53,5 +58,64 @@ class MetricsResponse(BaseModel):
     requests_total: int
     errors_total: int
     memory_updates: int
+    llm_calls_saved: int = 0
+    llm_cache_hits: int = 0
+    llm_cache_misses: int = 0
+    llm_cache_size: int = 0
+    model_retries: int = 0
+    model_hedges: int = 0
+    model_hedge_wins: int = 0
+    model_circuit_rejections: int = 0
+    model_circuit_state: str = "closed"
+    llm_queue_depth: int = 0
+    llm_in_flight: int = 0
+    llm_rejections: int = 0
+    llm_max_wait_ms: float = 0.0
+    llm_interactive_wait_ms: float = 0.0
+    llm_background_wait_ms: float = 0.0
+    checkpoint_sweeps: int = 0
+    checkpoint_pruned_checkpoints: int = 0
+    checkpoint_expired_threads: int = 0
+    checkpoint_evicted_threads: int = 0
+    checkpoint_bytes_reclaimed: int = 0
+    checkpoint_threads: int = 0
+    checkpoint_stored_bytes: int = 0
+    store_cache_hits: int = 0
+    store_cache_misses: int = 0
+    store_cache_hit_rate: float = 0.0
+    store_cache_namespaces: int = 0
+    store_cache_size_bytes: int = 0
+    store_cache_evictions: int = 0
+    store_cache_invalidations: int = 0
+    store_write_batches: int = 0
+    store_write_ops: int = 0
+    store_write_pending: int = 0
+    store_write_retries: int = 0
+    store_write_failed_batches: int = 0
+    store_write_lost_writes: int = 0
+    store_write_conflicts: int = 0
+    store_write_merges: int = 0
+    store_write_reextractions: int = 0
+    store_write_conflict_failures: int = 0
+    store_write_avg_flush_ms: float = 0.0
+    store_write_max_flush_ms: float = 0.0
+    extraction_pending: int = 0
+    extraction_completed: int = 0
+    extraction_failed: int = 0
+    store_journal_segment: int = 0
+    store_journal_records_since_snapshot: int = 0
+    store_journal_bytes: int = 0
+    store_journal_fsyncs: int = 0
+    store_journal_snapshots: int = 0
+    store_journal_last_snapshot_ms: float = 0.0
+    store_journal_restored_items: int = 0
+    store_journal_replayed_records: int = 0
+    store_journal_restore_ms: float = 0.0
+    store_journal_torn_frames: int = 0
+    redis_connections: int = 0
+    redis_idle_connections: int = 0
+    redis_round_trips: int = 0
+    redis_commands: int = 0
+    redis_errors: int = 0
     avg_response_time: float
     error_rate: float
@@ -0,0 +1 @@
+"""Microbenchmarks for the memory agent (run as `python -m benchmarks.<name>`)."""
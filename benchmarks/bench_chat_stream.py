@@ -0,0 +1,118 @@
+"""Perceived chat latency: POST /chat vs Server-Sent Events from POST /chat/stream.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat_stream [--requests 20] [--words 60] [--latency-ms 300] [--token-ms 15]
+
+Serves the app with uvicorn on a local port, backed by a stand-in model that
+waits `latency-ms` before its first word and `token-ms` between words, and
+times each request over real HTTP: until the full JSON reply for /chat, and
+until the first token and the `done` event for /chat/stream. A last stream
+is abandoned after its first token, to check its run is cancelled rather
+than finished in the background.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+from unittest.mock import patch
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.store.memory import InMemoryStore  # noqa: E402
+
+from app.api.dependencies import get_graph  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.fake_model import FakeChatModel  # noqa: E402
+from graph import nodes  # noqa: E402
+from graph.builder import builder  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def timed_chat(http: httpx.AsyncClient, i: int) -> float:
+    started = time.perf_counter()
+    response = await http.post("/api/v1/chat", json={"message": f"Question {i}", "session_id": f"chat-{i}"})
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def timed_stream(http: httpx.AsyncClient, i: int, abandon: bool = False):
+    """Seconds to the first token and to the done event (None when abandoned)."""
+    started = time.perf_counter()
+    first = None
+    body = {"message": f"Question {i}", "session_id": f"stream-{i}"}
+    async with http.stream("POST", "/api/v1/chat/stream", json=body) as response:
+        async for line in response.aiter_lines():
+            if line == "event: token" and first is None:
+                first = time.perf_counter() - started
+                if abandon:
+                    return first, None
+            elif line == "event: done":
+                return first, time.perf_counter() - started
+    raise RuntimeError("stream ended without a done event")
+
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+async def measure(base_url: str, requests: int, graph, reply_seconds: float):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        chat = [await timed_chat(http, i) for i in range(requests)]
+        stream = [await timed_stream(http, i) for i in range(requests)]
+        await timed_stream(http, requests, abandon=True)
+    # Give an uncancelled run time to finish and checkpoint its reply
+    await asyncio.sleep(2 * reply_seconds)
+    state = await graph.aget_state({"configurable": {"thread_id": f"stream-{requests}"}})
+    finished = any(message.type == "ai" for message in state.values.get("messages", []))
+    return chat, stream, finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=15)
+    args = parser.parse_args()
+
+    reply = " ".join(f"word{i}" for i in range(args.words))
+    model = FakeChatModel(responses=[reply], latency=args.latency_ms / 1000, token_latency=args.token_ms / 1000)
+    graph = builder.compile(checkpointer=MemorySaver(), store=InMemoryStore())
+    app.dependency_overrides[get_graph] = lambda: graph
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    with patch.object(nodes, "model", model):
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        try:
+            reply_seconds = (args.latency_ms + args.words * args.token_ms) / 1000
+            chat, stream, finished = asyncio.run(measure(f"http://127.0.0.1:{port}", args.requests, graph, reply_seconds))
+        finally:
+            server.should_exit = True
+            thread.join()
+    app.dependency_overrides.clear()
+
+    print(f"{args.words}-word replies, {args.latency_ms:.0f} ms to first word, {args.token_ms:.0f} ms per word, "
+          f"median of {args.requests} requests\n")
+    print(f"/chat          full reply   {median(chat) * 1000:>7.0f} ms")
+    print(f"/chat/stream   first token  {median([first for first, _ in stream]) * 1000:>7.0f} ms")
+    print(f"/chat/stream   done         {median([done for _, done in stream]) * 1000:>7.0f} ms")
+    print(f"\nabandoned stream: run {'finished anyway' if finished else 'cancelled'}")
+
+
+if __name__ == "__main__":
+    main()
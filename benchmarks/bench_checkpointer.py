@@ -0,0 +1,83 @@
+"""Checkpoint bytes per turn: MemorySaver vs SqliteSaver.
+
+Runs the same scripted conversation (fake model, no network) against each
+checkpointer and reports how many serialized bytes every turn adds, plus the
+time to load the latest checkpoint of the thread. Run from the repository root:
+
+    python -m benchmarks.bench_checkpointer [--turns 40]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.store.memory import InMemoryStore  # noqa: E402
+
+from benchmarks.fake_model import FakeChatModel  # noqa: E402
+from graph import nodes  # noqa: E402
+from graph.builder import builder  # noqa: E402
+from storage.sqlite_checkpointer import SqliteSaver  # noqa: E402
+from utils.logging_config import logger  # noqa: E402
+
+REPLY = "Sure - here is what I would suggest for that task. " * 6
+LOADS = 50
+
+
+def memory_saver_bytes(saver: MemorySaver) -> int:
+    """Serialized bytes held by a MemorySaver (checkpoints, metadata, channel blobs, writes)."""
+    total = sum(len(checkpoint[1]) + len(metadata[1])
+                for namespaces in saver.storage.values()
+                for checkpoints in namespaces.values()
+                for checkpoint, metadata, _ in checkpoints.values())
+    total += sum(len(blob[1]) for blob in saver.blobs.values())
+    total += sum(len(write[2][1]) for writes in saver.writes.values() for write in writes.values())
+    return total
+
+
+async def measure(name: str, saver, size, turns: int):
+    graph = builder.compile(checkpointer=saver, store=InMemoryStore())
+    config = {"configurable": {"thread_id": "bench", "user_id": "bench-user"}}
+    per_turn = []
+    with patch.object(nodes, "model", FakeChatModel(responses=[REPLY])):
+        for turn in range(turns):
+            before = size(saver)
+            await graph.ainvoke({"messages": [HumanMessage(content=f"Turn {turn}: please plan my week")]}, config)
+            per_turn.append(size(saver) - before)
+    start = time.perf_counter()
+    for _ in range(LOADS):
+        saver.get_tuple(config)
+    load_ms = (time.perf_counter() - start) / LOADS * 1000
+    first, last = per_turn[0], sum(per_turn[-10:]) / min(10, len(per_turn))
+    print(f"{name:<26}{first:>10,}{last:>14,.0f}{sum(per_turn):>12,}{load_ms:>12.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    print(f"{args.turns} turns on one thread; bytes added per turn and latest-checkpoint load time")
+    print(f"{'checkpointer':<26}{'turn 1':>10}{'last 10 avg':>14}{'total':>12}{'load ms':>12}")
+    await measure("MemorySaver", MemorySaver(), memory_saver_bytes, args.turns)
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = [
+            ("sqlite msgpack", dict(compression="none", snapshot_every=1)),
+            ("sqlite msgpack+deltas", dict(compression="none")),
+            ("sqlite compressed+deltas", dict(compression="zstd")),
+        ]
+        for i, (name, options) in enumerate(variants):
+            saver = SqliteSaver(os.path.join(tmp, f"{i}.db"), **options)
+            await measure(name, saver, SqliteSaver.stored_bytes, args.turns)
+            saver.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""Per-turn construction overhead: rebuilding extractors vs the shared registry.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_extractor_registry
+
+No network access is needed; runnables are only constructed, never invoked.
+"""
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from chains.extractors import (  # noqa: E402
+    create_todo_extractor, get_memory_router, get_todo_extractor, initialize_model,
+)
+from schemas.memory import UpdateMemory  # noqa: E402
+from utils.helpers import Sniffer  # noqa: E402
+
+TURNS = 200
+
+
+def per_turn_rebuild(model):
+    """What update_todos + task_asis used to do on every turn."""
+    create_todo_extractor(model, "ToDo").with_listeners(on_end=Sniffer())
+    model.bind_tools([UpdateMemory], parallel_tool_calls=False)
+
+
+def per_turn_registry(model):
+    """Registry lookups plus per-call listener attachment."""
+    get_todo_extractor(model, "ToDo").with_listeners(on_end=Sniffer())
+    get_memory_router(model)
+
+
+def measure(fn, model, turns: int = TURNS) -> float:
+    """Mean milliseconds per turn."""
+    start = time.perf_counter()
+    for _ in range(turns):
+        fn(model)
+    return (time.perf_counter() - start) / turns * 1000
+
+
+def main():
+    model = initialize_model()
+    # The first registry call builds; everything after is a lookup
+    per_turn_registry(model)
+
+    rebuild_ms = measure(per_turn_rebuild, model)
+    registry_ms = measure(per_turn_registry, model)
+
+    print(f"{'mode':<12}{'ms/turn':>12}")
+    print(f"{'rebuild':<12}{rebuild_ms:>12.3f}")
+    print(f"{'registry':<12}{registry_ms:>12.3f}")
+    print(f"speedup: {rebuild_ms / registry_ms:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Store throughput at 100k users: InMemoryStore vs SqliteStore.
+
+Loads one profile and a few todos per user, then times random gets, per-user
+namespace searches and filtered searches. Run from the repository root:
+
+    python -m benchmarks.bench_store_backends [--users 100000] [--ops 500]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from langgraph.store.base import PutOp
+from langgraph.store.memory import InMemoryStore
+
+from storage.sqlite_store import SqliteStore
+
+TODOS_PER_USER = 3
+BATCH_SIZE = 1000
+
+
+def load(store, users: int) -> float:
+    """Write every user's memories in batches of BATCH_SIZE ops; returns puts per second."""
+    ops, puts = [], 0
+    start = time.perf_counter()
+    for u in range(users):
+        user = f"user-{u}"
+        ops.append(PutOp(("profile", "general", user), "user_profile", {"name": user, "location": "Lisbon"}))
+        for t in range(TODOS_PER_USER):
+            ops.append(PutOp(("todo", "general", user), f"todo-{t}",
+                             {"task": f"Task {t} of {user}", "status": "done" if t == 0 else "not started"}))
+        if len(ops) >= BATCH_SIZE:
+            puts += len(ops)
+            store.batch(ops)
+            ops = []
+    if ops:
+        puts += len(ops)
+        store.batch(ops)
+    return puts / (time.perf_counter() - start)
+
+
+def rate(fn, ops: int, users: int, seed: int = 11) -> float:
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn(f"user-{rng.randrange(users)}")
+    return ops / (time.perf_counter() - start)
+
+
+def run(name: str, store, users: int, ops: int):
+    put_rate = load(store, users)
+    get_rate = rate(lambda user: store.get(("profile", "general", user), "user_profile"), ops, users)
+    search_rate = rate(lambda user: store.search(("todo", "general", user)), ops, users)
+    filter_rate = rate(lambda user: store.search(("todo", "general", user), filter={"status": "not started"}), ops, users)
+    print(f"{name:<10}{put_rate:>12,.0f}{get_rate:>12,.0f}{search_rate:>14,.0f}{filter_rate:>16,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=500, help="timed operations per measurement")
+    args = parser.parse_args()
+
+    print(f"{args.users:,} users, {TODOS_PER_USER} todos each; operations per second")
+    print(f"{'backend':<10}{'put':>12}{'get':>12}{'search':>14}{'filtered':>16}")
+    run("memory", InMemoryStore(), args.users, args.ops)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteStore(os.path.join(tmp, "bench.db"))
+        run("sqlite", store, args.users, args.ops)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
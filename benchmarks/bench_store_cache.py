@@ -0,0 +1,80 @@
+"""Memory loads per second on SqliteStore with and without the read-through cache.
+
+Simulates turns from a Zipf-distributed user population (a few hot users,
+a long tail): each turn loads the user's profile, todo and instruction
+namespaces in one batch, and a fraction of turns write a todo. Run from the
+repository root:
+
+    python -m benchmarks.bench_store_cache [--users 10000] [--turns 20000] [--zipf 1.1]
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from langgraph.store.base import PutOp  # noqa: E402
+
+from graph.memory import load_memories  # noqa: E402
+from storage.cached_store import CachedStore  # noqa: E402
+from storage.sqlite_store import SqliteStore  # noqa: E402
+
+WRITE_RATIO = 0.05
+CATEGORY = "general"
+
+
+def zipf_sampler(users: int, s: float, seed: int = 5):
+    """Returns a function drawing user indexes with P(k) proportional to 1 / k**s."""
+    rng = random.Random(seed)
+    cumulative = list(itertools.accumulate(1 / (k ** s) for k in range(1, users + 1)))
+    return lambda: bisect.bisect_left(cumulative, rng.random() * cumulative[-1])
+
+
+def populate(store, users: int):
+    ops = []
+    for u in range(users):
+        user = f"user-{u}"
+        ops.append(PutOp(("profile", CATEGORY, user), "user_profile", {"name": user, "location": "Lisbon"}))
+        ops.append(PutOp(("instructions", CATEGORY, user), "user_instructions", {"memory": "Add deadlines"}))
+        for t in range(3):
+            ops.append(PutOp(("todo", CATEGORY, user), f"todo-{t}", {"task": f"Task {t}", "status": "not started"}))
+    store.batch(ops)
+
+
+def run(name: str, store, users: int, turns: int, s: float):
+    sample = zipf_sampler(users, s)
+    rng = random.Random(9)
+    start = time.perf_counter()
+    for turn in range(turns):
+        user = f"user-{sample()}"
+        load_memories(store, user, CATEGORY)
+        if rng.random() < WRITE_RATIO:
+            store.put(("todo", CATEGORY, user), f"todo-new-{turn}", {"task": "New task", "status": "not started"})
+    rate = turns / (time.perf_counter() - start)
+    hit_rate = f"{store.stats()['hit_rate']:.1%}" if isinstance(store, CachedStore) else "-"
+    print(f"{name:<18}{rate:>14,.0f}{hit_rate:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=20_000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    args = parser.parse_args()
+
+    print(f"{args.users:,} users, {args.turns:,} turns, Zipf s={args.zipf}, {WRITE_RATIO:.0%} of turns write")
+    print(f"{'store':<18}{'loads/s':>14}{'hit rate':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cached in (("sqlite", False), ("sqlite + cache", True)):
+            store = SqliteStore(os.path.join(tmp, f"{name}.db"))
+            populate(store, args.users)
+            run(name, CachedStore(store) if cached else store, args.users, args.turns, args.zipf)
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
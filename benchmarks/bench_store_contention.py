@@ -0,0 +1,82 @@
+"""Concurrent memory updates: blind overwrites vs a global lock vs versioned writes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_store_contention [--writers 8] [--updates 25] [--latency-ms 20]
+
+Each writer repeatedly reads a user's profile, "extracts" for `latency-ms`
+(standing in for the model call), and writes back the document with its own
+field changed. Blind overwrites are fast but lose other writers' changes; a
+global lock loses nothing but runs one extraction at a time; versioned
+compare-and-set writes run concurrently and merge on conflict.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from storage.unit_of_work import StoreWriter, UnitOfWork  # noqa: E402
+from storage.versioning import VersionedInMemoryStore, without_version  # noqa: E402
+
+NAMESPACE = ("profile", "general", "bench-user")
+KEY = "user_profile"
+
+
+async def blind(store, writer, lock, field, latency):
+    item = await store.aget(NAMESPACE, KEY)
+    value = without_version(item.value) if item else {}
+    await asyncio.sleep(latency)
+    await store.aput(NAMESPACE, KEY, {**value, field: value.get(field, 0) + 1})
+
+
+async def locked(store, writer, lock, field, latency):
+    async with lock:
+        await blind(store, writer, lock, field, latency)
+
+
+async def versioned(store, writer, lock, field, latency):
+    item = await store.aget(NAMESPACE, KEY)
+    value = without_version(item.value) if item else {}
+    await asyncio.sleep(latency)
+    work = UnitOfWork(store, "bench-user", writer)
+    work.read([item])
+    work.put(NAMESPACE, KEY, {**value, field: value.get(field, 0) + 1})
+    await work.acommit()
+
+
+async def run(update, writers: int, updates: int, latency: float):
+    store = VersionedInMemoryStore()
+    writer = StoreWriter(max_conflict_attempts=1_000)
+    lock = asyncio.Lock()
+
+    async def worker(i):
+        for _ in range(updates):
+            await update(store, writer, lock, f"field_{i}", latency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(writers)))
+    elapsed = time.perf_counter() - started
+    value = without_version((await store.aget(NAMESPACE, KEY)).value)
+    lost = writers * updates - sum(value.values())
+    return elapsed, lost, writer.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--updates", type=int, default=25)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    total = args.writers * args.updates
+    print(f"{args.writers} writers x {args.updates} updates of one document, {args.latency_ms:.0f} ms extraction\n")
+    print(f"{'mode':<12}{'seconds':>9}{'updates/s':>11}{'lost':>7}{'conflicts':>11}{'merges':>8}")
+    for name, update in (("blind", blind), ("global lock", locked), ("versioned", versioned)):
+        elapsed, lost, stats = asyncio.run(run(update, args.writers, args.updates, args.latency_ms / 1000))
+        print(f"{name:<12}{elapsed:>9.2f}{total / elapsed:>11.0f}{lost:>7}{stats['conflicts']:>11}{stats['merges']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Cold-start restore time of JournaledStore: journal replay vs snapshot.
+
+Writes `--items` memory items (profiles, instructions and todos for
+`--items / 10` users) through a `JournaledStore` and rewrites each of them
+`--rewrites` more times, as todo status updates do. Then measures how long a
+fresh process takes to rebuild the store from the journal alone, from a
+snapshot, and from a snapshot plus a journal tail. Run from the repository
+root:
+
+    python -m benchmarks.bench_store_restore [--items 1000000] [--rewrites 2] [--tail 50000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from langgraph.store.base import PutOp  # noqa: E402
+
+from storage.journaled_store import SNAPSHOT_NAME, JournaledStore  # noqa: E402
+
+CATEGORY = "general"
+BATCH = 1000
+
+
+def items(count: int, start: int = 0, status: str = "not started"):
+    for i in range(start, start + count):
+        user, slot = f"user-{i // 10}", i % 10
+        if slot == 0:
+            yield PutOp(("profile", CATEGORY, user), "user_profile", {"name": user, "location": "Lisbon"})
+        elif slot == 1:
+            yield PutOp(("instructions", CATEGORY, user), "user_instructions", {"memory": "Add deadlines"})
+        else:
+            yield PutOp(("todo", CATEGORY, user), f"todo-{slot}",
+                        {"task": f"Task {slot}", "status": status, "solutions": ["call", "email"]})
+
+
+def write(directory: str, count: int, start: int = 0, status: str = "not started") -> float:
+    store = JournaledStore(directory, snapshot_every=0)
+    ops, started = [], time.perf_counter()
+    for op in items(count, start, status):
+        ops.append(op)
+        if len(ops) == BATCH:
+            store.batch(ops)
+            ops = []
+    if ops:
+        store.batch(ops)
+    store.close()
+    return count / (time.perf_counter() - started)
+
+
+def restore(name: str, directory: str):
+    gc.collect()
+    store = JournaledStore(directory, snapshot_every=0)
+    stats = store.stats()
+    count = sum(len(bucket) for bucket in store._data.values())
+    print(f"{name:<26}{stats['restore_ms'] / 1000:>10.2f}{count:>12,}{stats['replayed_records']:>12,}")
+    return store
+
+
+def size_mb(directory: str, prefix: str) -> float:
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for name in os.listdir(directory) if name.startswith(prefix)) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--rewrites", type=int, default=2)
+    parser.add_argument("--tail", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rate = write(tmp, args.items)
+        for rewrite in range(args.rewrites):
+            write(tmp, args.items, status=f"in progress {rewrite}")
+        records = args.items * (1 + args.rewrites)
+        print(f"{records:,} writes of {args.items:,} items journaled at {rate:,.0f} writes/s "
+              f"({size_mb(tmp, 'journal-'):.0f} MB of journal)")
+        print(f"{'restore from':<26}{'seconds':>10}{'items':>12}{'replayed':>12}")
+        store = restore("journal only", tmp)
+        started = time.perf_counter()
+        store.snapshot()
+        snapshot_s = time.perf_counter() - started
+        store.close()
+        del store
+        restore("snapshot", tmp).close()
+        write(tmp, args.tail, start=args.items)
+        restore(f"snapshot + {args.tail:,} tail", tmp).close()
+        print(f"snapshot written in {snapshot_s:.2f} s, {size_mb(tmp, SNAPSHOT_NAME):.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Update-node write latency on SqliteStore: one put per document vs one batch.
+
+Each simulated update node writes `--todos` extracted todos for a user,
+either with a `store.put` per todo (the old loop) or through `UnitOfWork`,
+which commits them as a single `store.batch`. Run from the repository root:
+
+    python -m benchmarks.bench_store_writes [--nodes 500] [--todos 10]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from storage.sqlite_store import SqliteStore  # noqa: E402
+from storage.unit_of_work import StoreWriter, UnitOfWork  # noqa: E402
+
+
+def todos(node: int, count: int):
+    for t in range(count):
+        yield f"todo-{t}", {"task": f"Task {t} of node {node}", "status": "not started"}
+
+
+def per_put(store, user: str, node: int, count: int):
+    for key, value in todos(node, count):
+        store.put(("todo", "general", user), key, value)
+
+
+def batched(store, user: str, node: int, count: int, writer=StoreWriter()):
+    work = UnitOfWork(store, user, writer)
+    for key, value in todos(node, count):
+        work.put(("todo", "general", user), key, value)
+    work.commit()
+
+
+def run(name: str, write, path: str, nodes: int, count: int):
+    store = SqliteStore(path)
+    latencies = []
+    for node in range(nodes):
+        start = time.perf_counter()
+        write(store, f"user-{node % 50}", node, count)
+        latencies.append((time.perf_counter() - start) * 1000)
+    store.close()
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f"{name:<12}{statistics.mean(latencies):>12.2f}{p95:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--todos", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.nodes:,} update nodes writing {args.todos} todos each")
+    print(f"{'writes':<12}{'mean ms':>12}{'p95 ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run("per put", per_put, os.path.join(tmp, "per_put.db"), args.nodes, args.todos)
+        run("one batch", batched, os.path.join(tmp, "batched.db"), args.nodes, args.todos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Filtered todo lookups: store search + filter vs the todo secondary indexes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_todo_queries
+
+For each list size, measures one page (20 items) of a user's open todos
+newest first, and of open todos due within the next week soonest first.
+The baseline is what `GET /memories/todos` did before: search the whole
+namespace, then filter and sort in Python.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from langgraph.store.memory import InMemoryStore
+
+from benchmarks.bench_todo_retrieval import NAMESPACE, make_todos
+from storage.todo_retrieval import OPEN_STATUSES, IndexedStore, _deadline, todo_status
+
+PAGE = 20
+REPEATS = 200
+
+
+def scan_open(store: InMemoryStore, _now: datetime) -> list:
+    items = [item for item in store.search(NAMESPACE, limit=100_000) if todo_status(item.value) in OPEN_STATUSES]
+    items.sort(key=lambda item: item.updated_at, reverse=True)
+    return items[:PAGE]
+
+
+def scan_due(store: InMemoryStore, now: datetime) -> list:
+    horizon = now + timedelta(days=7)
+    items = [
+        item for item in store.search(NAMESPACE, limit=100_000)
+        if todo_status(item.value) in OPEN_STATUSES and (_deadline(item.value) or horizon) < horizon
+    ]
+    items.sort(key=lambda item: _deadline(item.value))
+    return items[:PAGE]
+
+
+def indexed_open(store: IndexedStore, _now: datetime) -> list:
+    return store.query_todos(NAMESPACE, statuses=OPEN_STATUSES, limit=PAGE)[0]
+
+
+def indexed_due(store: IndexedStore, now: datetime) -> list:
+    return store.query_todos(NAMESPACE, statuses=OPEN_STATUSES, due_before=now + timedelta(days=7), limit=PAGE)[0]
+
+
+def measure(fn, store, now: datetime) -> float:
+    fn(store, now)  # warm up (hydrates the index on first call)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(store, now)
+    return (time.perf_counter() - start) / REPEATS * 1e6
+
+
+def main():
+    now = datetime.now(timezone.utc)
+    print(f"{'todos':>6}{'scan open us':>15}{'index open us':>16}{'scan due us':>14}{'index due us':>15}")
+    for count in (100, 1000, 5000, 10_000):
+        inner = InMemoryStore()
+        store = IndexedStore(inner)
+        for i, todo in enumerate(make_todos(count)):
+            store.put(NAMESPACE, str(i), todo)
+        print(
+            f"{count:>6}{measure(scan_open, inner, now):>15.1f}{measure(indexed_open, store, now):>16.1f}"
+            f"{measure(scan_due, inner, now):>14.1f}{measure(indexed_due, store, now):>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
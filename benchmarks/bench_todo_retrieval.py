@@ -0,0 +1,69 @@
+"""Prompt size and build time: full todo dump vs relevance-ranked retrieval.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_todo_retrieval
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from langgraph.store.memory import InMemoryStore
+
+from storage.todo_retrieval import IndexedStore
+from utils.helpers import estimate_tokens
+
+VERBS = ["buy", "renew", "book", "call", "schedule", "fix", "pay", "prepare", "review", "clean"]
+OBJECTS = ["passport", "car insurance", "dentist appointment", "marathon training plan", "bike service",
+           "tax return", "birthday gift", "kitchen sink", "flight to Kyiv", "quarterly report"]
+QUERY = "Can you remind me what I need for the passport renewal?"
+NAMESPACE = ("todo", "general", "power-user")
+REPEATS = 20
+
+
+def make_todos(count: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    todos = []
+    for i in range(count):
+        todos.append({
+            "task": f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} #{i}",
+            "time_to_complete": rng.choice([15, 30, 60, 120]),
+            "deadline": (now + timedelta(days=rng.randint(-5, 90))).isoformat() if rng.random() < 0.3 else None,
+            "solutions": [f"option {j} for item {i}" for j in range(rng.randint(1, 3))],
+            "status": rng.choice(["not started", "not started", "in progress", "done", "archived"]),
+        })
+    return todos
+
+
+def full_dump(store: InMemoryStore) -> str:
+    """What task_asis rendered before retrieval: every todo the store returns."""
+    return "\n".join(f"{mem.value}" for mem in store.search(NAMESPACE, limit=100_000))
+
+
+def retrieved(store: IndexedStore) -> str:
+    return "\n".join(f"{mem.value}" for mem in store.relevant_todos(NAMESPACE, QUERY))
+
+
+def measure(fn, store) -> tuple[int, float]:
+    fn(store)  # warm up (hydrates the index on first call)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        text = fn(store)
+    return estimate_tokens(text), (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    print(f"{'todos':>6}{'dump tokens':>14}{'dump ms':>10}{'ranked tokens':>16}{'ranked ms':>12}")
+    for count in (50, 200, 1000, 3000):
+        inner = InMemoryStore()
+        store = IndexedStore(inner)
+        for i, todo in enumerate(make_todos(count)):
+            store.put(NAMESPACE, str(i), todo)
+        dump_tokens, dump_ms = measure(full_dump, inner)
+        ranked_tokens, ranked_ms = measure(retrieved, store)
+        print(f"{count:>6}{dump_tokens:>14}{dump_ms:>10.2f}{ranked_tokens:>16}{ranked_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
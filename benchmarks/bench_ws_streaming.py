@@ -0,0 +1,93 @@
+"""WebSocket streaming: full-state snapshots vs delta events, over a growing conversation.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ws_streaming [--turns 50] [--words 60] [--latency-ms 300] [--token-ms 15]
+
+Each turn is answered by a stand-in model that waits `latency-ms` before its
+first word and `token-ms` between words. For both `/ws/chat` formats the
+benchmark encodes every frame the endpoint would send and reports the bytes
+per turn and the time until the client sees the first word of the reply.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from unittest.mock import patch
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import MemorySaver  # noqa: E402
+from langgraph.store.memory import InMemoryStore  # noqa: E402
+
+from app.api.streaming import stream_deltas  # noqa: E402
+from benchmarks.fake_model import FakeChatModel  # noqa: E402
+from graph import nodes  # noqa: E402
+from graph.builder import builder  # noqa: E402
+
+
+def frame_size(payload: dict) -> int:
+    # Starlette's send_json encoding
+    return len(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode())
+
+
+async def values_turn(graph, inputs, config):
+    """Bytes and time to the first frame carrying the reply, with stream_mode="values"."""
+    sent, first = 0, None
+    started = time.perf_counter()
+    async for chunk in graph.astream(inputs, config, stream_mode="values"):
+        sent += frame_size({"type": "chunk", "data": jsonable_encoder(chunk), "session_id": "s", "user_id": "u"})
+        if first is None and chunk["messages"][-1].type == "ai":
+            first = time.perf_counter() - started
+    return sent, first
+
+
+async def deltas_turn(graph, inputs, config):
+    """Bytes and time to the first token event, with the delta protocol."""
+    sent, first = 0, None
+    started = time.perf_counter()
+    async for event in stream_deltas(graph, inputs, config):
+        sent += frame_size(event)
+        if first is None and event["type"] in ("token", "message"):
+            first = time.perf_counter() - started
+    return sent, first
+
+
+async def run(turn, args):
+    reply = " ".join(f"word{i}" for i in range(args.words))
+    model = FakeChatModel(responses=[reply], latency=args.latency_ms / 1000, token_latency=args.token_ms / 1000)
+    graph = builder.compile(checkpointer=MemorySaver(), store=InMemoryStore())
+    config = {"configurable": {"thread_id": "bench", "user_id": "bench-user"}}
+    rows = []
+    with patch.object(nodes, "model", model):
+        for i in range(args.turns):
+            inputs = {"messages": [HumanMessage(content=f"Message number {i}, tell me more")]}
+            sent, first = await turn(graph, inputs, config)
+            rows.append((sent, first))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=15)
+    args = parser.parse_args()
+
+    values = asyncio.run(run(values_turn, args))
+    deltas = asyncio.run(run(deltas_turn, args))
+    print(f"{args.words}-word replies, {args.latency_ms:.0f} ms to first word, {args.token_ms:.0f} ms per word\n")
+    print(f"{'turn':>5}{'values KB':>11}{'deltas KB':>11}{'values first ms':>17}{'deltas first ms':>17}")
+    for i in sorted({0, 9, 24, args.turns - 1} & set(range(args.turns))):
+        (v_sent, v_first), (d_sent, d_first) = values[i], deltas[i]
+        print(f"{i + 1:>5}{v_sent / 1024:>11.1f}{d_sent / 1024:>11.1f}{v_first * 1000:>17.0f}{d_first * 1000:>17.0f}")
+    v_total, d_total = sum(sent for sent, _ in values), sum(sent for sent, _ in deltas)
+    print(f"\ntotal over {args.turns} turns: values {v_total / 1024:.0f} KB, deltas {d_total / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
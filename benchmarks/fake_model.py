@@ -0,0 +1,133 @@
+"""Local stand-in for the Gemini chat model, for tests and benchmarks.
+
+`FakeChatModel` replays scripted replies and can inject latency and errors,
+so retry, circuit-breaker and hedging behaviour can be exercised without a
+network connection or an API key. Under a streaming caller (LangGraph's
+`stream_mode="messages"`) text replies arrive word by word.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Union
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers from a script.
+
+    Each call takes the next entry of `errors` (if any) and raises it when it
+    is an exception; otherwise it returns the next entry of `responses`,
+    cycling when the script runs out. `latency` is either a fixed delay in
+    seconds or a list of per-call delays; replies then take `token_latency`
+    seconds per further word, delivered one by one when streamed.
+    """
+
+    responses: List[Union[str, AIMessage]] = Field(default_factory=lambda: ["ok"])
+    errors: List[Optional[BaseException]] = Field(default_factory=list)
+    latency: Union[float, List[float]] = 0.0
+    token_latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _next(self) -> tuple[float, ChatResult]:
+        call = self.calls
+        self.calls += 1
+        delay = self.latency[call % len(self.latency)] if isinstance(self.latency, list) else self.latency
+        error = self.errors[call] if call < len(self.errors) else None
+        if error is not None:
+            return delay, error
+        response = self.responses[call % len(self.responses)]
+        message = response if isinstance(response, AIMessage) else AIMessage(content=response)
+        return delay, ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        delay, result = self._next()
+        time.sleep(delay + self._generation_time(result))
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        delay, result = self._next()
+        await asyncio.sleep(delay + self._generation_time(result))
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def _generation_time(self, result) -> float:
+        """How long streaming `result` would take after its first word (a non-streamed call waits for all of it)."""
+        if isinstance(result, BaseException) or not self.token_latency:
+            return 0.0
+        return self.token_latency * (len(self._chunks(result)) - 1)
+
+    @staticmethod
+    def _chunks(result: ChatResult) -> List[ChatGenerationChunk]:
+        """Split a scripted reply into word chunks; tool calls arrive whole in the first one."""
+        message = result.generations[0].message
+        content = message.content
+        words = re.findall(r"\s*\S+\s*", content) if isinstance(content, str) else [content]
+        tool_call_chunks = [
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+            for index, call in enumerate(message.tool_calls)
+        ]
+        chunks = [AIMessageChunk(content=word) for word in words or [""]]
+        chunks[0] = AIMessageChunk(content=chunks[0].content, tool_call_chunks=tool_call_chunks)
+        return [ChatGenerationChunk(message=chunk) for chunk in chunks]
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        delay, result = self._next()
+        time.sleep(delay)
+        if isinstance(result, BaseException):
+            raise result
+        for i, chunk in enumerate(self._chunks(result)):
+            if i:
+                time.sleep(self.token_latency)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        delay, result = self._next()
+        await asyncio.sleep(delay)
+        if isinstance(result, BaseException):
+            raise result
+        for i, chunk in enumerate(self._chunks(result)):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield chunk
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        """Bind tool schemas like a real chat model (the script decides any tool calls)."""
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
@@ -1,6 +1,10 @@
 """Trustcall extractors for the memory agent."""
+import threading
+from typing import Any, Callable, Dict, Hashable, Sequence
+
 from langchain_google_genai import ChatGoogleGenerativeAI
 from trustcall import create_extractor
+from schemas.memory import UpdateMemory
 from schemas.profile import Profile
 from schemas.todo import ToDo
 from config import app_config
@@ -25,3 +29,83 @@ def create_todo_extractor(model, tool_name="ToDo"):
         tool_choice=tool_name,
         enable_inserts=True
     )
+
+
+class RunnableRegistry:
+    """Build-once cache of Trustcall extractors and tool-bound models.
+
+    Building an extractor compiles a Trustcall graph and converts every schema
+    to tool JSON, so each runnable is built the first time its key is requested
+    and reused afterwards. Keys combine the model identity, the schemas and the
+    options the runnable was built with.
+    """
+
+    def __init__(self):
+        self._runnables: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the runnable registered under `key`, building it on first use."""
+        with self._lock:
+            entry = self._runnables.get(key)
+            if entry is None:
+                # Keep the factory result (and so the model) alive: keys use id(model)
+                entry = factory()
+                self._runnables[key] = entry
+                self.builds += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def clear(self):
+        """Drop every registered runnable."""
+        with self._lock:
+            self._runnables.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Registry counters for monitoring."""
+        return {"size": len(self._runnables), "builds": self.builds, "hits": self.hits}
+
+
+# Global registry instance
+registry = RunnableRegistry()
+
+
+def _schema_names(tools: Sequence[Any]) -> tuple:
+    return tuple(getattr(tool, "__name__", repr(tool)) for tool in tools)
+
+
+def get_bound_model(model, tools: Sequence[Any], **bind_kwargs):
+    """Return `model.bind_tools(tools, **bind_kwargs)`, built once per model, tools and options."""
+    key = ("bound", id(model), _schema_names(tools), tuple(sorted(bind_kwargs.items())))
+    return registry.get(key, lambda: model.bind_tools(list(tools), **bind_kwargs))
+
+
+def get_profile_extractor(model):
+    """Return the shared profile extractor for `model`."""
+    key = ("extractor", id(model), _schema_names([Profile]), "Profile", False)
+    return registry.get(key, lambda: create_profile_extractor(model))
+
+
+def get_todo_extractor(model, tool_name="ToDo"):
+    """Return the shared todo extractor for `model`.
+
+    Attach per-call listeners with `.with_listeners(...)`; that wraps the
+    shared extractor without rebuilding it.
+    """
+    key = ("extractor", id(model), _schema_names([ToDo]), tool_name, True)
+    return registry.get(key, lambda: create_todo_extractor(model, tool_name))
+
+
+def get_memory_router(model):
+    """Return `model` bound to the UpdateMemory tool used by task_asis."""
+    return get_bound_model(model, [UpdateMemory])
+
+
+def warm_up(model):
+    """Build every runnable the graph nodes use so the first turn pays no construction cost."""
+    get_profile_extractor(model)
+    get_todo_extractor(model)
+    get_memory_router(model)
@@ -0,0 +1,221 @@
+"""Exact-match response cache for the task_asis chat model.
+
+Retries, repeated questions and probes often send the model a request it has
+already answered. `ResponseCache` stores replies under a hash of everything
+that determines them: the model, the bound tools, the rendered prompt and
+history, and the user's memory version. Update nodes bump the version after
+every store write, so a reply computed against older memories is never
+served again.
+
+Entries live in an in-process LRU with a TTL and, when `LLM_CACHE_PATH` is
+set, in a SQLite file shared across restarts. Memory versions are then read
+from and bumped in that file, so workers sharing it see each other's writes;
+without it they are process-local, and `AppConfig` turns the cache off for
+stores shared between processes (see `llm_cache` in config.py).
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple, TypeVar
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+
+from config import app_config
+
+T = TypeVar("T")
+
+
+def normalize_messages(messages: Sequence[BaseMessage]) -> list:
+    """The parts of `messages` the model sees, without per-run IDs."""
+    normalized = []
+    for message in messages:
+        entry = {"type": message.type, "content": message.content}
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            entry["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in tool_calls]
+        normalized.append(entry)
+    return normalized
+
+
+def bound_tools(runnable: Any) -> list:
+    """Tool schemas bound to `runnable` (empty for a plain chat model)."""
+    return list(getattr(runnable, "kwargs", {}).get("tools", []))
+
+
+def _fresh_copy(message: AIMessage) -> AIMessage:
+    """A cached reply with new message and tool call IDs, so replays never collide in a thread."""
+    tool_calls = [{**call, "id": f"cached-{uuid.uuid4()}"} for call in message.tool_calls]
+    return message.model_copy(update={"id": None, "tool_calls": tool_calls})
+
+
+class ResponseCache:
+    """LRU + TTL cache of model replies, with an optional SQLite tier."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, message TEXT);"
+                "CREATE TABLE IF NOT EXISTS memory_versions (user_id TEXT PRIMARY KEY, version INTEGER);"
+            )
+
+    @classmethod
+    def from_app_config(cls) -> "ResponseCache":
+        """Build the cache from the LLM_CACHE_* settings."""
+        return cls(
+            max_entries=app_config.llm_cache_max_entries,
+            ttl_seconds=app_config.llm_cache_ttl,
+            path=app_config.llm_cache_path or None,
+        )
+
+    @property
+    def persistent(self) -> bool:
+        """Whether a SQLite tier is attached (its calls block on file I/O)."""
+        return self._db is not None
+
+    def memory_version(self, user_id: str) -> int:
+        """Current memory version of `user_id` (read through the SQLite tier, which other workers may bump)."""
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute("SELECT version FROM memory_versions WHERE user_id = ?", (user_id,)).fetchone()
+                return row[0] if row else 0
+            return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: str) -> int:
+        """Invalidate every cached reply computed against `user_id`'s current memories."""
+        with self._lock:
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT INTO memory_versions (user_id, version) VALUES (?, 1) "
+                        "ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+                        (user_id,),
+                    )
+                    return self._db.execute(
+                        "SELECT version FROM memory_versions WHERE user_id = ?", (user_id,)
+                    ).fetchone()[0]
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            return version
+
+    def key(self, user_id: str, messages: Sequence[BaseMessage], tools: Sequence[Any] = ()) -> str:
+        """Cache key of a model request for `user_id`."""
+        payload = {
+            "model": app_config.model_name,
+            "user_id": user_id,
+            "memory_version": self.memory_version(user_id),
+            "tools": list(tools),
+            "messages": normalize_messages(messages),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        """The cached reply for `key`, if present and not expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT created, message FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]))
+                    self._entries[key] = entry
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                # An expired entry must not keep holding an LRU slot
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._evict()
+            self.hits += 1
+        return _fresh_copy(messages_from_dict([entry[1]])[0])
+
+    def put(self, key: str, message: AIMessage):
+        """Cache `message` as the reply for `key`."""
+        entry = (time.time(), message_to_dict(message))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, created, message) VALUES (?, ?, ?)",
+                        (key, entry[0], json.dumps(entry[1])),
+                    )
+                    self._db.execute("DELETE FROM responses WHERE created < ?", (entry[0] - self.ttl_seconds,))
+
+    def _evict(self):
+        """Drop least recently used entries beyond `max_entries` (caller holds the lock)."""
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached reply (memory versions are kept)."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters for monitoring."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+# Global cache instance
+response_cache = ResponseCache.from_app_config()
+
+
+def _invoke(runnable, messages: list) -> AIMessage:
+    return runnable.invoke(messages)
+
+
+async def _ainvoke(runnable, messages: list) -> AIMessage:
+    return await runnable.ainvoke(messages)
+
+
+def cached_invoke(runnable, messages: list, user_id: str,
+                  invoke: Callable[[Any, list], AIMessage] = _invoke) -> AIMessage:
+    """`invoke(runnable, messages)`, served from `response_cache` when LLM_CACHE is enabled."""
+    if not app_config.llm_cache:
+        return invoke(runnable, messages)
+    key = response_cache.key(user_id, messages, bound_tools(runnable))
+    response = response_cache.get(key)
+    if response is None:
+        response = invoke(runnable, messages)
+        response_cache.put(key, response)
+    return response
+
+
+async def _off_loop(fn: Callable[..., T], *args) -> T:
+    """Call `fn` in a worker thread when it may touch the SQLite tier, so the event loop never blocks on it."""
+    if response_cache.persistent:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+async def acached_invoke(runnable, messages: list, user_id: str,
+                         invoke: Callable[[Any, list], Awaitable[AIMessage]] = _ainvoke) -> AIMessage:
+    """Async variant of `cached_invoke`."""
+    if not app_config.llm_cache:
+        return await invoke(runnable, messages)
+    key = await _off_loop(response_cache.key, user_id, messages, bound_tools(runnable))
+    response = await _off_loop(response_cache.get, key)
+    if response is None:
+        response = await invoke(runnable, messages)
+        await _off_loop(response_cache.put, key, response)
+    return response
@@ -1,4 +1,7 @@
 """Prompt templates for the memory agent."""
+from typing import Any, Optional
+
+from utils.helpers import estimate_tokens
 
 MODEL_SYSTEM_MESSAGE = """{task_asis_role} 
         You have a long term memory which keeps track of three things:
@@ -17,6 +20,7 @@ MODEL_SYSTEM_MESSAGE = """{task_asis_role}
         - If personal information was provided about the user, update the user's profile by calling UpdateMemory tool with type `user`
         - If tasks are mentioned, update the ToDo list by calling UpdateMemory tool with type `todo`
         - If the user has specified preferences for how to update the ToDo list, update the instructions by calling UpdateMemory tool with type `instructions`
+        - If several of these apply, make one UpdateMemory call per type in the same response
         3. Tell the user that you have updated your memory, if appropriate:
         - Do not tell the user you have updated the user's profile
         - Tell the user them when you update the todo list
@@ -33,3 +37,133 @@ CREATE_INSTRUCTIONS = """Reflect on the following interaction.
         Based on this interaction, update your instructions for how to update ToDo list items. Use any feedback from the user to update how they like to have items added, etc.
         Your current instructions are:
         <current_instructions> {current_instructions} </current_instructions>"""
+
+DEFERRED_MEMORY_NOTE = """Memory updates are handled automatically in the background after you reply, so do not call any tools.
+        Respond naturally to the user. If they mentioned new tasks, tell them you are adding them to their ToDo list."""
+
+CONVERSATION_SUMMARY = """Here is a summary of the earlier part of the conversation (older messages are not shown):
+        <conversation_summary> {summary} </conversation_summary>"""
+
+SUMMARIZE_CONVERSATION = """Summarize the conversation below for your own future reference.
+        Keep facts about the user, decisions, open questions and anything you promised to do. Be concise.
+        Your current summary of even earlier conversation (may be empty):
+        <current_summary> {summary} </current_summary>
+        Conversation to add to the summary:
+        <conversation> {conversation} </conversation>
+        Reply with the updated summary only."""
+
+
+# Compact memory rendering for system prompts
+#
+# Memories used to be inserted as raw dict reprs, repeating every key, None
+# and empty list on every turn. These renderers print one line per document,
+# omit empty and default fields, and abbreviate the rest.
+
+TODO_STATUS_ORDER = {"in progress": 0, "not started": 1, "done": 2, "archived": 3}
+
+
+def render_profile(profile: Optional[dict[str, Any]]) -> str:
+    """Render a Profile document as `field: value` pairs, skipping empty fields."""
+    if not profile:
+        return ""
+    parts = []
+    for field, value in profile.items():
+        if value in (None, "", [], {}):
+            continue
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        parts.append(f"{field}: {value}")
+    return "; ".join(parts)
+
+
+def render_todo(todo: dict[str, Any]) -> str:
+    """Render a ToDo document as a single line.
+
+    `[status]` is omitted for the default "not started"; deadlines are shown
+    as `due YYYY-MM-DD HH:MM`, estimates as `~Nm`, solutions after `|`.
+    """
+    line = str(todo.get("task", "")).strip()
+    status = todo.get("status") or "not started"
+    if status != "not started":
+        line = f"[{status}] {line}"
+    details = []
+    deadline = todo.get("deadline")
+    if deadline:
+        details.append(f"due {str(deadline)[:16].replace('T', ' ')}")
+    if todo.get("time_to_complete"):
+        details.append(f"~{todo['time_to_complete']}m")
+    if details:
+        line = f"{line} ({', '.join(details)})"
+    solutions = [str(s) for s in todo.get("solutions") or []]
+    if solutions:
+        line = f"{line} | {'; '.join(solutions)}"
+    return f"- {line}"
+
+
+def _todo_sort_key(todo: dict[str, Any]) -> tuple:
+    deadline = str(todo.get("deadline") or "")
+    # Open work first, then soonest deadline; undated items last within a status
+    return (TODO_STATUS_ORDER.get(todo.get("status") or "not started", 4), deadline == "", deadline)
+
+
+def render_todos(todos: list[dict[str, Any]], max_tokens: Optional[int] = None) -> str:
+    """Render ToDo documents sorted by status and deadline, cut off at `max_tokens`."""
+    lines, used = [], 0
+    ordered = sorted(todos, key=_todo_sort_key)
+    for i, todo in enumerate(ordered):
+        line = render_todo(todo)
+        cost = estimate_tokens(line)
+        if max_tokens is not None and lines and used + cost > max_tokens:
+            lines.append(f"- ... {len(ordered) - i} more not shown")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def render_instructions(instructions: Optional[dict[str, Any]]) -> str:
+    """Render the stored ToDo instructions document as plain text."""
+    if not instructions:
+        return ""
+    return str(instructions.get("memory", "")).strip()
+
+
+# Templated confirmations for the post-update turn (TEMPLATED_ACKNOWLEDGEMENT)
+
+TODO_ADDED_ACKNOWLEDGEMENT = "I've added {tasks} to your ToDo list."
+TODO_UPDATED_ACKNOWLEDGEMENT = "I've updated {tasks} on your ToDo list."
+TODO_DONE_ACKNOWLEDGEMENT = "I've marked {tasks} as done."
+
+
+def _join_tasks(tasks: list[str]) -> str:
+    quoted = [f'"{task}"' for task in dict.fromkeys(tasks)]
+    if len(quoted) == 1:
+        return quoted[0]
+    return f"{', '.join(quoted[:-1])} and {quoted[-1]}"
+
+
+def render_todo_acknowledgement(changes: list[dict[str, Any]], documents: dict[str, dict[str, Any]]) -> str:
+    """Confirm a ToDo update to the user from the Trustcall diff.
+
+    `changes` comes from `utils.helpers.collect_tool_changes`; `documents`
+    maps the keys of updated ToDo documents to their new value. Returns an
+    empty string when nothing changed.
+    """
+    added, updated, done = [], [], []
+    for change in changes:
+        if change["type"] == "new":
+            added.append(change["value"].get("task", "a new task"))
+        elif change["type"] == "update":
+            document = documents.get(change["doc_id"], {})
+            task = document.get("task", "a task")
+            (done if document.get("status") == "done" else updated).append(task)
+    sentences = [
+        template.format(tasks=_join_tasks(tasks))
+        for template, tasks in (
+            (TODO_ADDED_ACKNOWLEDGEMENT, added),
+            (TODO_UPDATED_ACKNOWLEDGEMENT, updated),
+            (TODO_DONE_ACKNOWLEDGEMENT, done),
+        )
+        if tasks
+    ]
+    return " ".join(sentences)
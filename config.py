@@ -48,6 +48,93 @@ class AppConfig:
         self.cors_origins = os.getenv("CORS_ORIGINS", "*").split(",")
         self.enable_docs = os.getenv("ENABLE_DOCS", "true").lower() == "true"
         self.websocket_max_connections = int(os.getenv("WEBSOCKET_MAX_CONNECTIONS", "100"))
+        # Messages queued behind a running turn are merged once the session is quiet this long (seconds)
+        self.chat_coalesce_window = float(os.getenv("CHAT_COALESCE_WINDOW", "0.3"))
+        # /chat/stream sends an SSE comment after this many seconds without an event
+        self.sse_heartbeat_seconds = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+        
+        # Long-term memory store: "memory" (lost on restart), "sqlite" or "redis" (shared by replicas)
+        self.store_backend = os.getenv("STORE_BACKEND", "memory").lower()
+        self.store_path = os.getenv("STORE_PATH", "asis_store.db")
+        # Journal directory that makes the memory backend durable (empty keeps it volatile)
+        self.store_journal_dir = os.getenv("STORE_JOURNAL_DIR", "")
+        self.store_journal_fsync_ms = float(os.getenv("STORE_JOURNAL_FSYNC_MS", "50"))
+        self.store_snapshot_every = int(os.getenv("STORE_SNAPSHOT_EVERY", "100000"))
+        # Read-through cache of hot users' namespaces in front of the store (0 MB disables)
+        self.store_cache_mb = float(os.getenv("STORE_CACHE_MB", "64"))
+        self.store_cache_ttl = float(os.getenv("STORE_CACHE_TTL", "60"))
+        # Update nodes commit their writes as one batch; write-behind flushes them in the background
+        self.store_write_behind = os.getenv("STORE_WRITE_BEHIND", "false").lower() == "true"
+        self.store_write_max_attempts = int(os.getenv("STORE_WRITE_MAX_ATTEMPTS", "3"))
+        # Merges or re-extractions tried when a versioned write loses a race
+        self.store_cas_max_attempts = int(os.getenv("STORE_CAS_MAX_ATTEMPTS", "3"))
+        
+        # Redis server used by the "redis" store and checkpoint backends
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.redis_max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "10"))
+        self.redis_key_prefix = os.getenv("REDIS_KEY_PREFIX", "asis:")
+        
+        # Conversation checkpoints: "memory" (MemorySaver), "sqlite" (compressed, delta-encoded) or "redis"
+        self.checkpoint_backend = os.getenv("CHECKPOINT_BACKEND", "memory").lower()
+        self.checkpoint_path = os.getenv("CHECKPOINT_PATH", "asis_checkpoints.db")
+        self.checkpoint_compression = os.getenv("CHECKPOINT_COMPRESSION", "zstd").lower()
+        self.checkpoint_snapshot_every = int(os.getenv("CHECKPOINT_SNAPSHOT_EVERY", "20"))
+        # Checkpoint retention (0 disables each rule): newest K per thread, idle-thread TTL (seconds), size cap
+        self.checkpoint_keep_last = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+        self.checkpoint_thread_ttl = float(os.getenv("CHECKPOINT_THREAD_TTL", "604800"))
+        self.checkpoint_max_mb = float(os.getenv("CHECKPOINT_MAX_MB", "512"))
+        self.checkpoint_gc_interval = float(os.getenv("CHECKPOINT_GC_INTERVAL", "60"))
+        
+        # Background (deferred) memory extraction
+        self.deferred_extraction = os.getenv("DEFERRED_EXTRACTION", "false").lower() == "true"
+        self.extraction_concurrency = int(os.getenv("EXTRACTION_CONCURRENCY", "4"))
+        self.extraction_drain_timeout = float(os.getenv("EXTRACTION_DRAIN_TIMEOUT", "30"))
+        
+        # Templated confirmation after memory updates instead of a second task_asis call
+        self.templated_acknowledgement = os.getenv("TEMPLATED_ACKNOWLEDGEMENT", "false").lower() == "true"
+        
+        # Model call resilience: retries with jittered backoff, circuit breaker, hedging
+        self.model_max_attempts = int(os.getenv("MODEL_MAX_ATTEMPTS", "3"))
+        self.model_retry_base_delay = float(os.getenv("MODEL_RETRY_BASE_DELAY", "0.5"))
+        self.model_retry_max_delay = float(os.getenv("MODEL_RETRY_MAX_DELAY", "8"))
+        self.model_call_deadline = float(os.getenv("MODEL_CALL_DEADLINE", "60"))
+        self.circuit_failure_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+        self.circuit_reset_timeout = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+        self.hedge_requests = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+        self.hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+        
+        # Outbound model call scheduler (0 disables a rate limit)
+        self.llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.llm_rpm = float(os.getenv("LLM_RPM", "0"))
+        self.llm_tpm = float(os.getenv("LLM_TPM", "0"))
+        self.llm_queue_max_depth = int(os.getenv("LLM_QUEUE_MAX_DEPTH", "100"))
+        
+        # Exact-match cache of task_asis replies (LLM_CACHE_PATH adds a SQLite tier)
+        self.llm_cache = os.getenv("LLM_CACHE", "false").lower() == "true"
+        self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+        self.llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "300"))
+        self.llm_cache_path = os.getenv("LLM_CACHE_PATH", "")
+        # Memory versions are shared only through LLM_CACHE_PATH, so a store other processes write
+        # to (redis, or sqlite without that file) would serve replies against stale memories
+        if self.store_backend == "redis" or (self.store_backend == "sqlite" and not self.llm_cache_path):
+            self.llm_cache = False
+        
+        # Conversation window: recent turns verbatim, older turns summarized
+        self.context_keep_turns = int(os.getenv("CONTEXT_KEEP_TURNS", "10"))
+        self.context_summarize_after = int(os.getenv("CONTEXT_SUMMARIZE_AFTER", "5"))
+        self.context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+        
+        # Relevance-ranked todo retrieval for the task_asis prompt
+        self.todo_retrieval = os.getenv("TODO_RETRIEVAL", "true").lower() == "true"
+        self.todo_retrieval_top_k = int(os.getenv("TODO_RETRIEVAL_TOP_K", "10"))
+        self.todo_prompt_token_budget = int(os.getenv("TODO_PROMPT_TOKEN_BUDGET", "800"))
+        self.todo_deadline_horizon_days = float(os.getenv("TODO_DEADLINE_HORIZON_DAYS", "3"))
+        # Seconds before a todo namespace is re-read from a store other replicas also write (sqlite, redis)
+        self.todo_index_max_age = float(os.getenv("TODO_INDEX_MAX_AGE", "5"))
+        # Statuses of the todos task_asis may see, comma-separated (empty: all)
+        self.todo_prompt_statuses = [
+            status.strip() for status in os.getenv("TODO_PROMPT_STATUSES", "").split(",") if status.strip()
+        ]
         
         # Validate required environment variables
         if not self.google_api_key:
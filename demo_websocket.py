@@ -21,7 +21,8 @@ async def websocket_conversation():
             message = {
                 "message": "Hello! I'm Asis and I need help with my marathon training.",
                 "user_id": "Asis",
-                "session_id": "ws-demo-123"
+                "session_id": "ws-demo-123",
+                "stream": "deltas"
             }
             
             print(f'\nSending: {message["message"]}')
@@ -32,10 +33,14 @@ async def websocket_conversation():
             async for response in websocket:
                 try:
                     data = json.loads(response)
-                    if data.get("type") == "chunk":
-                        print(f'Chunk: {str(data.get("data", ""))[:100]}...')
+                    if data.get("type") == "token":
+                        print(data["text"], end="", flush=True)
+                    elif data.get("type") == "message":
+                        print(f'\n{data["text"]}')
+                    elif data.get("type") == "memory":
+                        print(f'\n[{data["kind"]} updated: {data["summary"]}]')
                     elif data.get("type") == "done":
-                        print('Conversation complete!')
+                        print('\nConversation complete!')
                         break
                     elif data.get("type") == "error":
                         print(f'Error: {data.get("message", "Unknown error")}')
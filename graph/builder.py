@@ -1,35 +1,139 @@
 """Graph builder for the memory agent."""
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from langgraph.graph import StateGraph, MessagesState, START, END
+from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.store.base import BaseStore
 from langgraph.store.memory import InMemoryStore
+from langgraph.utils.runnable import RunnableCallable
 
-from config import Configuration
+from chains.llm_cache import response_cache
+from config import Configuration, app_config
+from storage.cached_store import CachedStore
+from storage.journaled_store import JournaledStore
+from storage.checkpoint_retention import CheckpointRetention
+from storage.redis_checkpointer import RedisSaver
+from storage.redis_client import RedisClient
+from storage.redis_store import RedisStore
+from storage.sqlite_checkpointer import SqliteSaver
+from storage.sqlite_store import SqliteStore
+from storage.todo_retrieval import IndexedStore
+from storage.unit_of_work import store_writer
+from storage.versioning import VersionedInMemoryStore
 from utils.metrics import metrics
-from .nodes import task_asis, update_profile, update_todos, update_instructions
-from .edges import route_message
+from utils.resilience import model_resilience
+from utils.llm_scheduler import llm_scheduler
+from .nodes import (
+    task_asis, update_profile, update_todos, update_instructions, schedule_memory_update, summarize_conversation,
+    acknowledge_update, extraction_queue,
+    atask_asis, aupdate_profile, aupdate_todos, aupdate_instructions, aschedule_memory_update, asummarize_conversation,
+)
+from .edges import route_message, route_summary, route_update, route_acknowledgement
+from .state import AgentState
 
 # Create the graph + all nodes
-builder = StateGraph(MessagesState, context_schema=Configuration)
+builder = StateGraph(AgentState, context_schema=Configuration)
 
 # Define the flow of the memory extraction process
-builder.add_node(task_asis)
-builder.add_node(update_todos)
-builder.add_node(update_profile)
-builder.add_node(update_instructions)
+# Each node pairs a sync and an async implementation, so graph.invoke/stream
+# keep working while graph.ainvoke/astream never block the event loop
+builder.add_node("task_asis", RunnableCallable(task_asis, atask_asis))
+builder.add_node("update_todos", RunnableCallable(update_todos, aupdate_todos))
+builder.add_node("update_profile", RunnableCallable(update_profile, aupdate_profile))
+builder.add_node("update_instructions", RunnableCallable(update_instructions, aupdate_instructions))
+builder.add_node("schedule_memory_update", RunnableCallable(schedule_memory_update, aschedule_memory_update))
+builder.add_node("summarize_conversation", RunnableCallable(summarize_conversation, asummarize_conversation))
+builder.add_node("acknowledge_update", acknowledge_update)
 
 # Define the flow 
 builder.add_edge(START, "task_asis")
-builder.add_conditional_edges("task_asis", route_message)
-builder.add_edge("update_todos", "task_asis")
-builder.add_edge("update_profile", "task_asis")
-builder.add_edge("update_instructions", "task_asis")
+builder.add_conditional_edges(
+    "task_asis",
+    route_message,
+    ["update_todos", "update_profile", "update_instructions", "schedule_memory_update", "summarize_conversation", END]
+)
+for update_node in ("update_todos", "update_profile", "update_instructions"):
+    builder.add_conditional_edges(update_node, route_update, ["task_asis", "acknowledge_update"])
+builder.add_conditional_edges("acknowledge_update", route_acknowledgement, ["task_asis", "summarize_conversation", END])
+builder.add_conditional_edges("schedule_memory_update", route_summary, ["summarize_conversation", END])
+builder.add_edge("summarize_conversation", END)
+
+_redis_client: Optional[RedisClient] = None
+
+
+def get_redis_client() -> RedisClient:
+    """The pooled Redis client shared by the Redis store and checkpointer, created on first use."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = RedisClient(app_config.redis_url, max_connections=app_config.redis_max_connections)
+    return _redis_client
+
+
+def create_store() -> BaseStore:
+    """The long-term memory store selected by STORE_BACKEND."""
+    if app_config.store_backend == "sqlite":
+        return SqliteStore(app_config.store_path)
+    if app_config.store_backend == "redis":
+        return RedisStore(get_redis_client(), prefix=app_config.redis_key_prefix)
+    if app_config.store_backend != "memory":
+        raise ValueError(f"Unknown STORE_BACKEND: {app_config.store_backend}")
+    if app_config.store_journal_dir:
+        return JournaledStore(
+            app_config.store_journal_dir,
+            fsync_interval=app_config.store_journal_fsync_ms / 1000,
+            snapshot_every=app_config.store_snapshot_every,
+        )
+    return VersionedInMemoryStore()
+
+
+def is_shared_store() -> bool:
+    """Whether other processes may write to the store, unseen by this one's in-memory caches."""
+    return app_config.store_backend in ("sqlite", "redis")
+
+
+def create_store_cache(store: BaseStore) -> Optional[CachedStore]:
+    """The read-through cache in front of `store` (None when STORE_CACHE_MB is 0).
+
+    With a shared store, entries live no longer than the todo index's max age.
+    """
+    if app_config.store_cache_mb <= 0:
+        return None
+    ttl = app_config.store_cache_ttl
+    if is_shared_store():
+        ttl = min(ttl, app_config.todo_index_max_age)
+    return CachedStore(store, max_bytes=int(app_config.store_cache_mb * 1024 * 1024), ttl_seconds=ttl)
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """The conversation checkpointer selected by CHECKPOINT_BACKEND."""
+    if app_config.checkpoint_backend == "sqlite":
+        return SqliteSaver(
+            app_config.checkpoint_path,
+            compression=app_config.checkpoint_compression,
+            snapshot_every=app_config.checkpoint_snapshot_every,
+        )
+    if app_config.checkpoint_backend == "redis":
+        return RedisSaver(get_redis_client(), prefix=app_config.redis_key_prefix)
+    if app_config.checkpoint_backend != "memory":
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND: {app_config.checkpoint_backend}")
+    return MemorySaver()
+
 
 # Compile the graph
-mem_checkpointer = MemorySaver()
-mem_store = InMemoryStore()
+mem_checkpointer = create_checkpointer()
+# Started from the API lifespan; prunes old checkpoints and idle threads
+checkpoint_retention = CheckpointRetention.from_app_config(mem_checkpointer)
+base_store = create_store()
+# Hot users' namespaces are served from memory; writes through the graph or the API invalidate them
+store_cache = create_store_cache(base_store)
+# The todo index keeps relevance ranking in sync with every todo write; with a store
+# shared by several replicas it re-reads namespaces to pick up the others' writes
+mem_store = IndexedStore(
+    store_cache or base_store,
+    max_age=app_config.todo_index_max_age if is_shared_store() else None,
+)
 graph = builder.compile(checkpointer=mem_checkpointer, store=mem_store)
 
 # Generate graph visualization
@@ -68,4 +172,17 @@ def health_check() -> Dict[str, Any]:
 
 def get_metrics() -> Dict[str, Any]:
     """Get current metrics"""
-    return metrics.get_stats()
+    cache_stats = {f"llm_cache_{name}": value for name, value in response_cache.stats().items()}
+    resilience_stats = {f"model_{name}": value for name, value in model_resilience.stats().items()}
+    scheduler_stats = {f"llm_{name}": value for name, value in llm_scheduler.stats().items()}
+    retention_stats = {f"checkpoint_{name}": value for name, value in checkpoint_retention.stats().items()}
+    store_cache_stats = {f"store_cache_{name}": value for name, value in (store_cache.stats() if store_cache else {}).items()}
+    store_write_stats = {f"store_write_{name}": value for name, value in store_writer.stats().items()}
+    extraction_stats = {f"extraction_{name}": value for name, value in extraction_queue.stats().items()}
+    journal_stats = {
+        f"store_journal_{name}": value
+        for name, value in (base_store.stats() if isinstance(base_store, JournaledStore) else {}).items()
+    }
+    redis_stats = {f"redis_{name}": value for name, value in (_redis_client.stats() if _redis_client else {}).items()}
+    return {**metrics.get_stats(), **cache_stats, **resilience_stats, **scheduler_stats, **retention_stats,
+            **store_cache_stats, **store_write_stats, **extraction_stats, **journal_stats, **redis_stats}
@@ -0,0 +1,104 @@
+"""Conversation window management for the memory agent graph."""
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from config import app_config
+from chains.prompts import CONVERSATION_SUMMARY
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """Split a chat history into turns, each starting at a user message.
+
+    Tool calls and their tool results always stay inside one turn, so cutting
+    on turn boundaries never orphans a ToolMessage.
+    """
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def messages_since(messages: Sequence[BaseMessage], message_id: Optional[str]) -> list[BaseMessage]:
+    """Whole turns that started after the message with `message_id`.
+
+    Returns every message when the ID is unknown (e.g. never set, or the
+    message has since been summarized away), and an empty list when no new
+    turn has started.
+    """
+    if message_id is None:
+        return list(messages)
+    for i, message in enumerate(messages):
+        if message.id == message_id:
+            rest = messages[i + 1:]
+            break
+    else:
+        return list(messages)
+    # Skip the tail (tool calls, reply) of the turn that was already extracted
+    for j, message in enumerate(rest):
+        if isinstance(message, HumanMessage):
+            return list(rest[j:])
+    return []
+
+
+@dataclass
+class ContextWindow:
+    """How much conversation history the graph nodes send to the model.
+
+    The last `keep_turns` turns stay in state verbatim. Once `summarize_after`
+    more turns have piled up, the older ones are folded into a running summary
+    and removed from state. Every node additionally sends at most
+    `token_budget` tokens of history (whole turns, newest first; the latest
+    turn is always kept). A value of 0 disables the respective limit.
+    """
+    keep_turns: int = 10
+    summarize_after: int = 5
+    token_budget: int = 6000
+
+    @classmethod
+    def from_app_config(cls, config) -> "ContextWindow":
+        """Create a ContextWindow from the application configuration."""
+        return cls(
+            keep_turns=config.context_keep_turns,
+            summarize_after=config.context_summarize_after,
+            token_budget=config.context_token_budget,
+        )
+
+    def window(self, messages: Sequence[BaseMessage]) -> list[BaseMessage]:
+        """The most recent whole turns that fit in the token budget."""
+        if self.token_budget <= 0:
+            return list(messages)
+        kept: list[list[BaseMessage]] = []
+        used = 0
+        for turn in reversed(split_turns(messages)):
+            cost = count_tokens_approximately(turn)
+            if kept and used + cost > self.token_budget:
+                break
+            kept.append(turn)
+            used += cost
+        return [message for turn in reversed(kept) for message in turn]
+
+    def overflow(self, messages: Sequence[BaseMessage]) -> list[BaseMessage]:
+        """Messages of the turns that should be folded into the summary now (empty if none)."""
+        if self.keep_turns <= 0:
+            return []
+        turns = split_turns(messages)
+        if len(turns) <= self.keep_turns + self.summarize_after:
+            return []
+        return [message for turn in turns[:-self.keep_turns] for message in turn]
+
+
+def with_summary(system_msg: str, summary: str) -> str:
+    """Append the running conversation summary (if any) to a system prompt."""
+    if not summary:
+        return system_msg
+    return f"{system_msg}\n        {CONVERSATION_SUMMARY.format(summary=summary)}"
+
+
+# Global context window instance
+context_window = ContextWindow.from_app_config(app_config)
@@ -1,22 +1,71 @@
 """Edge functions for the memory agent graph."""
-from typing import Literal
+from typing import Literal, Union
+from langchain_core.messages import AIMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import MessagesState, END
 from langgraph.store.base import BaseStore
+from langgraph.types import Send
 
-def route_message(state: MessagesState, config: RunnableConfig, store: BaseStore) -> Literal[END, "update_todos", "update_instructions", "update_profile"]:
+from config import app_config
+from .context import context_window
+
+# Update node handling each UpdateMemory.update_type
+UPDATE_NODE_NAMES = {
+    "user": "update_profile",
+    "todo": "update_todos",
+    "instructions": "update_instructions",
+}
+
+def group_tool_calls(tool_calls: list) -> dict[str, list]:
+    """Group UpdateMemory tool calls by the update node that handles them, preserving order."""
+    groups: dict[str, list] = {}
+    for tool_call in tool_calls:
+        node = UPDATE_NODE_NAMES.get(tool_call['args']['update_type'])
+        if node is None:
+            raise ValueError
+        groups.setdefault(node, []).append(tool_call)
+    return groups
+
+def route_summary(state: MessagesState, config: RunnableConfig, store: BaseStore) -> Literal[END, "summarize_conversation"]:
+    """Summarize older turns once the conversation outgrows the context window."""
+    if context_window.overflow(state['messages']):
+        return "summarize_conversation"
+    return END
+
+def route_update(state: MessagesState, config: RunnableConfig, store: BaseStore) -> Literal["task_asis", "acknowledge_update"]:
+    """After a memory update, reply with a templated confirmation or go back to task_asis."""
+    if app_config.templated_acknowledgement:
+        return "acknowledge_update"
+    return "task_asis"
+
+def route_acknowledgement(state: MessagesState, config: RunnableConfig, store: BaseStore) -> Literal[END, "task_asis", "summarize_conversation"]:
+    """Finish the turn once acknowledge_update has replied; otherwise let task_asis reply."""
+    if isinstance(state['messages'][-1], AIMessage):
+        return route_summary(state, config, store)
+    return "task_asis"
+
+def route_message(state: MessagesState, config: RunnableConfig, store: BaseStore) -> Union[Literal[END, "update_todos", "update_instructions", "update_profile", "schedule_memory_update", "summarize_conversation"], list[Send]]:
     """Reflect on the memories and chat history to decide whether to update the memory collection."""
     
     message = state['messages'][-1]
     if len(message.tool_calls) == 0:
-        return END
+        # In deferred mode the reply is final and extraction runs in the background
+        if app_config.deferred_extraction:
+            return "schedule_memory_update"
+        return route_summary(state, config, store)
     else:
-        tool_call = message.tool_calls[0]
-        if tool_call['args']['update_type'] == "user":
-            return "update_profile"
-        elif tool_call['args']['update_type'] == "todo":
-            return "update_todos"
-        elif tool_call['args']['update_type'] == "instructions":
-            return "update_instructions"
-        else:
-            raise ValueError
+        groups = group_tool_calls(message.tool_calls)
+        if len(groups) == 1:
+            return next(iter(groups))
+        # Several memory types in one turn: run their update nodes concurrently,
+        # each answering only its own tool calls, then rejoin at task_asis
+        # (or acknowledge_update)
+        return [
+            Send(node, {
+                "messages": state['messages'],
+                "summary": state.get('summary', ""),
+                "extraction_watermarks": state.get('extraction_watermarks', {}),
+                "tool_calls": tool_calls,
+            })
+            for node, tool_calls in groups.items()
+        ]
@@ -0,0 +1,124 @@
+"""Batched long-term memory loading for the memory agent graph."""
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Any, Optional, Sequence
+
+from langgraph.store.base import BaseStore, Item, SearchOp
+
+from config import app_config
+from storage.todo_retrieval import HYDRATE_LIMIT, IndexedStore, TodoRetrievalIndex
+from storage.unit_of_work import store_writer
+from storage.versioning import without_version
+
+MEMORY_KINDS = ("profile", "todo", "instructions")
+
+
+def memory_namespace(kind: str, todo_category: str, user_id: str) -> tuple[str, str, str]:
+    """Return the store namespace holding one kind of memory for a user."""
+    return (kind, todo_category, user_id)
+
+
+@dataclass
+class MemorySnapshot:
+    """All long-term memories task_asis needs for a single turn."""
+    profile: list[Item] = field(default_factory=list)
+    todos: list[Item] = field(default_factory=list)
+    instructions: list[Item] = field(default_factory=list)
+
+    @property
+    def user_profile(self) -> Optional[dict[str, Any]]:
+        """The stored profile document, if one has been collected."""
+        return without_version(self.profile[0].value) if self.profile else None
+
+    @property
+    def user_instructions(self) -> Optional[dict[str, Any]]:
+        """The stored ToDo instructions document, if any."""
+        return without_version(self.instructions[0].value) if self.instructions else None
+
+
+def _memory_search_ops(user_id: str, todo_category: str) -> list[SearchOp]:
+    """One search per memory namespace, in MEMORY_KINDS order."""
+    return [SearchOp(memory_namespace(kind, todo_category, user_id)) for kind in MEMORY_KINDS]
+
+
+def load_memories(store: BaseStore, user_id: str, todo_category: str) -> MemorySnapshot:
+    """Fetch the profile, todo and instructions namespaces in one store batch (after pending flushes)."""
+    store_writer.wait_blocking(user_id)
+    profile, todos, instructions = store.batch(_memory_search_ops(user_id, todo_category))
+    return MemorySnapshot(profile=profile, todos=todos, instructions=instructions)
+
+
+async def aload_memories(store: BaseStore, user_id: str, todo_category: str) -> MemorySnapshot:
+    """Async variant of `load_memories` using a single `abatch` round-trip.
+
+    Waits for the user's pending write-behind flushes first, so a turn always
+    sees the memories written by the previous one.
+    """
+    await store_writer.wait(user_id)
+    profile, todos, instructions = await store.abatch(_memory_search_ops(user_id, todo_category))
+    return MemorySnapshot(profile=profile, todos=todos, instructions=instructions)
+
+
+def _retrieval_options() -> dict[str, Any]:
+    return {
+        "top_k": app_config.todo_retrieval_top_k,
+        "max_tokens": app_config.todo_prompt_token_budget,
+        "deadline_horizon": timedelta(days=app_config.todo_deadline_horizon_days),
+        "statuses": app_config.todo_prompt_statuses or None,
+    }
+
+
+def _prompt_todos_query() -> dict[str, Any]:
+    return {"statuses": app_config.todo_prompt_statuses, "limit": HYDRATE_LIMIT}
+
+
+def select_todos(store: BaseStore, memories: MemorySnapshot, user_id: str, todo_category: str, query: str) -> MemorySnapshot:
+    """Replace the snapshot's todos with the ones relevant to `query`.
+
+    Only applies when the store maintains a todo index (see
+    `storage.todo_retrieval.IndexedStore`) and either retrieval is enabled
+    or TODO_PROMPT_STATUSES restricts which todos task_asis sees.
+    """
+    if not isinstance(store, IndexedStore):
+        return memories
+    namespace = memory_namespace("todo", todo_category, user_id)
+    if app_config.todo_retrieval:
+        return replace(memories, todos=store.relevant_todos(namespace, query, **_retrieval_options()))
+    if app_config.todo_prompt_statuses:
+        return replace(memories, todos=store.query_todos(namespace, **_prompt_todos_query())[0])
+    return memories
+
+
+async def aselect_todos(store: BaseStore, memories: MemorySnapshot, user_id: str, todo_category: str, query: str) -> MemorySnapshot:
+    """Async variant of `select_todos`."""
+    if not isinstance(store, IndexedStore):
+        return memories
+    namespace = memory_namespace("todo", todo_category, user_id)
+    if app_config.todo_retrieval:
+        return replace(memories, todos=await store.arelevant_todos(namespace, query, **_retrieval_options()))
+    if app_config.todo_prompt_statuses:
+        return replace(memories, todos=(await store.aquery_todos(namespace, **_prompt_todos_query()))[0])
+    return memories
+
+
+async def aquery_todos(
+    store: BaseStore,
+    user_id: str,
+    todo_category: str,
+    statuses: Optional[Sequence[str]] = None,
+    due_before: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> tuple[list[Item], Optional[str]]:
+    """One page of a user's todos and the cursor of the next page (see `TodoRetrievalIndex.query`).
+
+    Served from the todo index when the store keeps one; otherwise the
+    namespace is searched and indexed for this call only.
+    """
+    namespace = memory_namespace("todo", todo_category, user_id)
+    options = {"statuses": statuses, "due_before": due_before, "limit": limit, "cursor": cursor}
+    if isinstance(store, IndexedStore):
+        return await store.aquery_todos(namespace, **options)
+    index = TodoRetrievalIndex()
+    index.load(namespace, await store.asearch(namespace, limit=HYDRATE_LIMIT))
+    return index.query(namespace, **options)
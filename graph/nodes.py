@@ -2,103 +2,340 @@
 import asyncio
 import time
 import traceback
+import uuid
+from dataclasses import asdict
 from datetime import datetime
-from typing import Literal
+from typing import Awaitable, Callable, Literal, Optional, TypeVar
 
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages import merge_message_runs, SystemMessage, HumanMessage
-from langgraph.graph import MessagesState
+from langchain_core.messages import merge_message_runs, get_buffer_string, SystemMessage, HumanMessage, AIMessage, ToolMessage, RemoveMessage
 from langgraph.store.base import BaseStore
 
-from config import Configuration
+from config import Configuration, app_config
 from utils.logging_config import logger
 from utils.metrics import metrics
-from utils.helpers import Sniffer, extract_tool_info
-from chains.prompts import MODEL_SYSTEM_MESSAGE, TRUSTCALL_INSTRUCTION, CREATE_INSTRUCTIONS
-from chains.extractors import initialize_model, create_profile_extractor, create_todo_extractor
-from schemas.memory import UpdateMemory
+from utils.helpers import Sniffer, collect_tool_changes, estimate_tokens, extract_tool_info
+from utils.task_queue import KeyedTaskQueue
+from utils.resilience import model_resilience
+from utils.llm_scheduler import llm_scheduler, INTERACTIVE, BACKGROUND
+from chains.prompts import (
+    MODEL_SYSTEM_MESSAGE, TRUSTCALL_INSTRUCTION, CREATE_INSTRUCTIONS, DEFERRED_MEMORY_NOTE, SUMMARIZE_CONVERSATION,
+    render_profile, render_todos, render_instructions, render_todo_acknowledgement,
+)
+from chains.llm_cache import response_cache, cached_invoke, acached_invoke
+from chains.extractors import initialize_model, get_profile_extractor, get_todo_extractor, get_memory_router, warm_up
+from storage.unit_of_work import UnitOfWork, store_writer
+from storage.versioning import VersionConflictError, without_version
+from .memory import MemorySnapshot, load_memories, aload_memories, select_todos, aselect_todos
+from .edges import group_tool_calls
+from .context import context_window, messages_since, split_turns, with_summary
+from .state import AgentState
 
 # Initialize model and extractors
 model = initialize_model()
-profile_extractor = create_profile_extractor(model)
+warm_up(model)
 
+# Background queue for deferred memory extraction (drained on app shutdown)
+extraction_queue = KeyedTaskQueue(max_concurrency=app_config.extraction_concurrency)
 
-def task_asis(state: MessagesState, config: RunnableConfig, store: BaseStore):
+# Memory kinds with an extraction watermark of their own
+EXTRACTION_KINDS = ("profile", "todo", "instructions")
+
+T = TypeVar("T")
+
+
+def _build_system_message(configurable: Configuration, memories: MemorySnapshot) -> str:
+    """Render the task_asis system prompt from the retrieved memories."""
+    user_id = configurable.user_id
+
+    # Process profile memory
+    user_profile = render_profile(memories.user_profile)
+    if user_profile:
+        logger.info(f"Retrieved profile for user {user_id}")
+    else:
+        logger.info(f"No profile found for user {user_id}")
+
+    # Process todo memory
+    todo = render_todos([mem.value for mem in memories.todos], max_tokens=app_config.todo_prompt_token_budget)
+    logger.info(f"Retrieved {len(memories.todos)} todo items for user {user_id}")
+
+    # Process instructions memory
+    instructions = render_instructions(memories.user_instructions)
+    if instructions:
+        logger.info(f"Retrieved instructions for user {user_id}")
+    else:
+        logger.info(f"No instructions found for user {user_id}")
+
+    return MODEL_SYSTEM_MESSAGE.format(
+        task_asis_role=configurable.task_asis_role,
+        user_profile=user_profile,
+        todo=todo,
+        instructions=instructions
+    )
+
+
+def _reply_messages(configurable: Configuration, memories: MemorySnapshot, state: AgentState) -> list:
+    """Build the task_asis prompt, telling the model not to call tools when extraction is deferred."""
+    system_msg = with_summary(_build_system_message(configurable, memories), state.get("summary", ""))
+    if app_config.deferred_extraction:
+        system_msg = f"{system_msg}\n        {DEFERRED_MEMORY_NOTE}"
+    return [SystemMessage(content=system_msg)] + context_window.window(state["messages"])
+
+
+def _reply_model():
+    """The model used for the user-facing reply, bound to UpdateMemory unless extraction is deferred."""
+    if app_config.deferred_extraction:
+        return model
+    return get_memory_router(model)
+
+
+def _invoke(runnable, payload, priority: int = BACKGROUND):
+    """Call a model or extractor through the outbound scheduler, with retries and circuit breaking."""
+    tokens = estimate_tokens(payload)
+    return model_resilience.call(lambda: llm_scheduler.run(lambda: runnable.invoke(payload), priority, tokens))
+
+
+async def _ainvoke(runnable, payload, priority: int = BACKGROUND, hedge: bool = False):
+    """Async variant of `_invoke`."""
+    tokens = estimate_tokens(payload)
+    return await model_resilience.acall(
+        lambda: llm_scheduler.arun(lambda: runnable.ainvoke(payload), priority, tokens), hedge=hedge
+    )
+
+
+def _invoke_reply(runnable, payload):
+    """`_invoke` for the user-facing reply, which goes ahead of background extraction."""
+    return _invoke(runnable, payload, INTERACTIVE)
+
+
+async def _ainvoke_reply(runnable, payload):
+    """Async variant of `_invoke_reply`, hedged when HEDGE_REQUESTS is on."""
+    return await _ainvoke(runnable, payload, INTERACTIVE, hedge=True)
+
+
+def _latest_user_text(state: AgentState) -> str:
+    """Text of the most recent user message (used as the todo retrieval query)."""
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            if isinstance(message.content, str):
+                return message.content
+            return " ".join(part.get("text", "") for part in message.content if isinstance(part, dict))
+    return ""
+
+
+def _reflection_history(messages: list) -> list:
+    """Chat history up to and including the latest user message."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return list(messages[:i + 1])
+    return list(messages)
+
+
+def _unreflected_history(history: list, watermarks: dict) -> list:
+    """Turns of `history` some memory kind has not extracted yet (at least the latest turn)."""
+    new_messages = max((messages_since(history, watermarks.get(kind)) for kind in EXTRACTION_KINDS), key=len)
+    return new_messages or split_turns(history)[-1]
+
+
+def _reflected_watermarks(messages: list) -> dict:
+    """Advance every extraction watermark past the turn handed to reflection."""
+    history = _reflection_history(messages)
+    if not history or history[-1].id is None:
+        return {}
+    return {"extraction_watermarks": dict.fromkeys(EXTRACTION_KINDS, history[-1].id)}
+
+
+def _format_existing_memories(existing_items, tool_name: str):
+    """Format the existing memories for the Trustcall extractor."""
+    return ([(existing_item.key, tool_name, without_version(existing_item.value))
+             for existing_item in existing_items]
+            if existing_items
+            else None
+            )
+
+
+def _unextracted_messages(state: AgentState, kind: str) -> list:
+    """Chat history the `kind` extractor has not seen yet (at least the latest turn)."""
+    history = state["messages"][:-1]
+    if not history:
+        return []
+    watermark = state.get("extraction_watermarks", {}).get(kind)
+    new_messages = messages_since(history, watermark) or split_turns(history)[-1]
+    return context_window.window(new_messages)
+
+
+def _watermark_update(state: AgentState, kind: str) -> dict:
+    """Advance the `kind` extraction watermark past the history just extracted."""
+    history = state["messages"][:-1]
+    if not history or history[-1].id is None:
+        return {}
+    return {"extraction_watermarks": {kind: history[-1].id}}
+
+
+def _trustcall_messages(state: AgentState, kind: str) -> list:
+    """Merge the unextracted chat history and the Trustcall instruction."""
+    TRUSTCALL_INSTRUCTION_FORMATTED = with_summary(
+        TRUSTCALL_INSTRUCTION.format(time=datetime.now().isoformat()), state.get("summary", "")
+    )
+    return list(merge_message_runs(
+        messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + _unextracted_messages(state, kind)
+    ))
+
+
+def _instructions_messages(state: AgentState, existing_memory) -> list:
+    """Build the prompt used to rewrite the user's ToDo instructions."""
+    system_msg = with_summary(
+        CREATE_INSTRUCTIONS.format(current_instructions=without_version(existing_memory.value) if existing_memory else None),
+        state.get("summary", "")
+    )
+    return ([SystemMessage(content=system_msg)] + _unextracted_messages(state, "instructions")
+            + [HumanMessage(content="Please update the instructions based on the conversation")])
+
+
+def _extracted_documents(result) -> list[tuple[str, dict]]:
+    """Pair every Trustcall response with the document key it should be stored under."""
+    return [
+        (rmeta.get("json_doc_id", str(uuid.uuid4())), r.model_dump(mode="json"))
+        for r, rmeta in zip(result["responses"], result["response_metadata"])
+    ]
+
+
+def _log_reextraction(attempt: int, error: VersionConflictError) -> bool:
+    """Count a conflict no merge could resolve; returns whether to extract again."""
+    if attempt >= app_config.store_cas_max_attempts:
+        store_writer.record_conflict_failure(len(error.conflicts))
+        return False
+    store_writer.record_reextraction()
+    logger.warning(f"Extracting again from the stored documents after a concurrent update: {error}")
+    return True
+
+
+def _with_reextraction(update: Callable[[], T]) -> T:
+    """Run an update node's read-extract-commit step, starting over if a concurrent update changed the same fields."""
+    attempt = 1
+    while True:
+        try:
+            return update()
+        except VersionConflictError as e:
+            if not _log_reextraction(attempt, e):
+                raise
+            attempt += 1
+
+
+async def _awith_reextraction(update: Callable[[], Awaitable[T]]) -> T:
+    """Async variant of `_with_reextraction`."""
+    attempt = 1
+    while True:
+        try:
+            return await update()
+        except VersionConflictError as e:
+            if not _log_reextraction(attempt, e):
+                raise
+            attempt += 1
+
+
+def _pending_tool_calls(state: AgentState) -> list:
+    """The UpdateMemory tool calls this update node answers (a fan-out Send carries its own)."""
+    return state.get("tool_calls") or state['messages'][-1].tool_calls
+
+
+def _tool_message(state: AgentState, content: str, kind: str, acknowledgement: str = "") -> dict:
+    """Respond to the tool calls made in task_asis and record what was extracted.
+
+    `acknowledgement` is the user-facing confirmation `acknowledge_update`
+    replies with when templated acknowledgements are enabled.
+    """
+    return {
+        "messages": [
+            ToolMessage(content=content, tool_call_id=tool_call['id'], artifact=acknowledgement or None)
+            for tool_call in _pending_tool_calls(state)
+        ],
+        **_watermark_update(state, kind),
+    }
+
+
+def _todo_acknowledgement(sniffer: Sniffer, tool_name: str, documents: list[tuple[str, dict]]) -> str:
+    """Templated confirmation of the ToDo changes Trustcall just made."""
+    if not app_config.templated_acknowledgement:
+        return ""
+    return render_todo_acknowledgement(collect_tool_changes(sniffer.called_tools, tool_name), dict(documents))
+
+
+def task_asis(state: AgentState, config: RunnableConfig, store: BaseStore):
     """Load memories from the store and use them to personalize the chatbot's response."""
     start_time = time.time()
-    
+
     try:
         logger.info("Starting task_asis processing")
-        
+
         # Get the user ID from the config
         configurable = Configuration.from_runnable_config(config)
         user_id = configurable.user_id
         todo_category = configurable.todo_category
-        task_asis_role = configurable.task_asis_role
-
-        # Retrieve profile memory from the store
-        profile_namespace = ("profile", todo_category, user_id)
-        profile_memories = store.search(profile_namespace)
-        
-        # Retrieve todo memory from the store
-        todo_namespace = ("todo", todo_category, user_id)
-        todo_memories = store.search(todo_namespace)
-        
-        # Retrieve instructions memory from the store
-        instructions_namespace = ("instructions", todo_category, user_id)
-        instructions_memories = store.search(instructions_namespace)
-        
-        # Process profile memory
-        if profile_memories:
-            user_profile = profile_memories[0].value
-            logger.info(f"Retrieved profile for user {user_id}")
-        else:
-            user_profile = None
-            logger.info(f"No profile found for user {user_id}")
-
-        # Process todo memory
-        todo = "\n".join(f"{mem.value}" for mem in todo_memories)
-        logger.info(f"Retrieved {len(todo_memories)} todo items for user {user_id}")
-
-        # Process instructions memory
-        if instructions_memories:
-            instructions = instructions_memories[0].value
-            logger.info(f"Retrieved instructions for user {user_id}")
-        else:
-            instructions = ""
-            logger.info(f"No instructions found for user {user_id}")
-        
-        system_msg = MODEL_SYSTEM_MESSAGE.format(
-            task_asis_role=task_asis_role, 
-            user_profile=user_profile, 
-            todo=todo, 
-            instructions=instructions
-        )
+
+        # Retrieve profile, todo and instructions memory in one store round-trip
+        memories = load_memories(store, user_id, todo_category)
+
+        # Only show the todos relevant to the current message
+        memories = select_todos(store, memories, user_id, todo_category, _latest_user_text(state))
 
         # LLM invocation
-        response = model.bind_tools([UpdateMemory], parallel_tool_calls=False).invoke(
-            [SystemMessage(content=system_msg)] + state["messages"]
-        )
-        
+        response = cached_invoke(_reply_model(), _reply_messages(configurable, memories, state), user_id, _invoke_reply)
+
         response_time = time.time() - start_time
         metrics.record_request(response_time)
         logger.info(f"task_asis completed in {response_time:.2f}s")
-        
+
         return {"messages": [response]}
-        
+
     except Exception as e:
         logger.error(f"Error in task_asis: {e}")
         logger.error(traceback.format_exc())
         metrics.record_error()
         raise
 
-def update_profile(state: MessagesState, config: RunnableConfig, store: BaseStore):
+
+async def atask_asis(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Async variant of `task_asis` that never blocks the event loop."""
+    start_time = time.time()
+
+    try:
+        logger.info("Starting task_asis processing")
+
+        # Get the user ID from the config
+        configurable = Configuration.from_runnable_config(config)
+        user_id = configurable.user_id
+        todo_category = configurable.todo_category
+
+        # Retrieve profile, todo and instructions memory in one store round-trip
+        memories = await aload_memories(store, user_id, todo_category)
+
+        # Only show the todos relevant to the current message
+        memories = await aselect_todos(store, memories, user_id, todo_category, _latest_user_text(state))
+
+        # LLM invocation
+        response = await acached_invoke(_reply_model(), _reply_messages(configurable, memories, state), user_id, _ainvoke_reply)
+
+        response_time = time.time() - start_time
+        metrics.record_request(response_time)
+        logger.info(f"task_asis completed in {response_time:.2f}s")
+
+        return {"messages": [response]}
+
+    except Exception as e:
+        logger.error(f"Error in task_asis: {e}")
+        logger.error(traceback.format_exc())
+        metrics.record_error()
+        raise
+
+
+def update_profile(state: AgentState, config: RunnableConfig, store: BaseStore):
     """Reflect on the chat history and update the memory collection."""
     start_time = time.time()
-    
+
     try:
         logger.info("Starting profile update")
-        
+
         # Get the user ID from the config
         configurable = Configuration.from_runnable_config(config)
         user_id = configurable.user_id
@@ -107,55 +344,94 @@ def update_profile(state: MessagesState, config: RunnableConfig, store: BaseStor
         # Define the namespace for the memories
         namespace = ("profile", todo_category, user_id)
 
-        # Retrieve the most recent memories for context
-        existing_items = store.search(namespace)
-        logger.info(f"Found {len(existing_items)} existing profile items for user {user_id}")
-
-        # Format the existing memories for the Trustcall extractor
-        tool_name = "Profile"
-        existing_memories = ([(existing_item.key, tool_name, existing_item.value)
-                              for existing_item in existing_items]
-                              if existing_items
-                              else None
-                            )
-
-        # Merge the chat history and the instruction
-        TRUSTCALL_INSTRUCTION_FORMATTED = TRUSTCALL_INSTRUCTION.format(time=datetime.now().isoformat())
-        updated_messages = list(merge_message_runs(
-            messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + state["messages"][:-1]
-        ))
+        def extract_and_save():
+            # Retrieve the most recent memories for context (including writes still being flushed)
+            store_writer.wait_blocking(user_id)
+            existing_items = store.search(namespace)
+            logger.info(f"Found {len(existing_items)} existing profile items for user {user_id}")
 
-        # Invoke the extractor
-        result = profile_extractor.invoke({
-            "messages": updated_messages, 
-            "existing": existing_memories
-        })
+            # Invoke the extractor
+            result = _invoke(get_profile_extractor(model), {
+                "messages": _trustcall_messages(state, "profile"),
+                "existing": _format_existing_memories(existing_items, "Profile")
+            })
+
+            # Save the memories from Trustcall to the store in one batch, versioned against what was read
+            work = UnitOfWork(store, user_id)
+            work.read(existing_items)
+            for key, value in _extracted_documents(result):
+                work.put(namespace, key, value)
+            # Replies cached against the old profile are stale once the new one is written
+            work.commit(on_commit=lambda: response_cache.bump(user_id))
+
+        _with_reextraction(extract_and_save)
 
-        # Save the memories from Trustcall to the store
-        import uuid
-        for r, rmeta in zip(result["responses"], result["response_metadata"]):
-            store.put(
-                namespace,
-                rmeta.get("json_doc_id", str(uuid.uuid4())),
-                r.model_dump(mode="json"),
-            )
-        
         metrics.record_memory_update()
         response_time = time.time() - start_time
         logger.info(f"Profile update completed in {response_time:.2f}s")
-        
-        tool_calls = state['messages'][-1].tool_calls
-        return {"messages": [{"role": "tool", "content": "updated profile", "tool_call_id": tool_calls[0]['id']}]}
-        
+
+        return _tool_message(state, "updated profile", "profile")
+
     except Exception as e:
         logger.error(f"Error in update_profile: {e}")
         logger.error(traceback.format_exc())
         metrics.record_error()
         raise
 
-def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore):
+
+async def aupdate_profile(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Async variant of `update_profile`."""
+    start_time = time.time()
+
+    try:
+        logger.info("Starting profile update")
+
+        # Get the user ID from the config
+        configurable = Configuration.from_runnable_config(config)
+        user_id = configurable.user_id
+        todo_category = configurable.todo_category
+
+        # Define the namespace for the memories
+        namespace = ("profile", todo_category, user_id)
+
+        async def extract_and_save():
+            # Retrieve the most recent memories for context (including writes still being flushed)
+            await store_writer.wait(user_id)
+            existing_items = await store.asearch(namespace)
+            logger.info(f"Found {len(existing_items)} existing profile items for user {user_id}")
+
+            # Invoke the extractor
+            result = await _ainvoke(get_profile_extractor(model), {
+                "messages": _trustcall_messages(state, "profile"),
+                "existing": _format_existing_memories(existing_items, "Profile")
+            })
+
+            # Save the memories from Trustcall to the store in one batch, versioned against what was read
+            work = UnitOfWork(store, user_id)
+            work.read(existing_items)
+            for key, value in _extracted_documents(result):
+                work.put(namespace, key, value)
+            # Replies cached against the old profile are stale once the new one is written
+            await work.acommit(on_commit=lambda: response_cache.bump(user_id))
+
+        await _awith_reextraction(extract_and_save)
+
+        metrics.record_memory_update()
+        response_time = time.time() - start_time
+        logger.info(f"Profile update completed in {response_time:.2f}s")
+
+        return _tool_message(state, "updated profile", "profile")
+
+    except Exception as e:
+        logger.error(f"Error in update_profile: {e}")
+        logger.error(traceback.format_exc())
+        metrics.record_error()
+        raise
+
+
+def update_todos(state: AgentState, config: RunnableConfig, store: BaseStore):
     """Reflect on the chat history and update the memory collection."""
-    
+
     # Get the user ID from the config
     configurable = Configuration.from_runnable_config(config)
     user_id = configurable.user_id
@@ -163,71 +439,281 @@ def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore)
 
     # Define the namespace for the memories
     namespace = ("todo", todo_category, user_id)
+    tool_name = "ToDo"
 
-    # Retrieve the most recent memories for context
-    existing_items = store.search(namespace)
+    def extract_and_save():
+        # Retrieve the most recent memories for context (including writes still being flushed)
+        store_writer.wait_blocking(user_id)
+        existing_items = store.search(namespace)
+
+        # Initialize the sniffer for visibility into the tool calls made by Trustcall
+        sniffer = Sniffer()
+
+        # Attach the sniffer to the shared Trustcall extractor for the ToDo list
+        todo_extractor = get_todo_extractor(model, tool_name).with_listeners(on_end=sniffer)
+
+        # Invoke the extractor
+        result = _invoke(todo_extractor, {
+            "messages": _trustcall_messages(state, "todo"),
+            "existing": _format_existing_memories(existing_items, tool_name)
+        })
+
+        # Save the memories from Trustcall to the store in one batch, versioned against what was read
+        documents = _extracted_documents(result)
+        work = UnitOfWork(store, user_id)
+        work.read(existing_items)
+        for key, value in documents:
+            work.put(namespace, key, value)
+        work.commit(on_commit=lambda: response_cache.bump(user_id))
+        return sniffer, documents
+
+    sniffer, documents = _with_reextraction(extract_and_save)
+
+    # Extract the changes made by Trustcall and add the the ToolMessage returned to task_asis
+    todo_update_msg = extract_tool_info(sniffer.called_tools, tool_name)
+    return _tool_message(state, todo_update_msg, "todo", _todo_acknowledgement(sniffer, tool_name, documents))
+
+
+async def aupdate_todos(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Async variant of `update_todos`."""
 
-    # Format the existing memories for the Trustcall extractor
+    # Get the user ID from the config
+    configurable = Configuration.from_runnable_config(config)
+    user_id = configurable.user_id
+    todo_category = configurable.todo_category
+
+    # Define the namespace for the memories
+    namespace = ("todo", todo_category, user_id)
     tool_name = "ToDo"
-    existing_memories = ([(existing_item.key, tool_name, existing_item.value)
-                          for existing_item in existing_items]
-                          if existing_items
-                          else None
-                        )
-
-    # Merge the chat history and the instruction
-    TRUSTCALL_INSTRUCTION_FORMATTED = TRUSTCALL_INSTRUCTION.format(time=datetime.now().isoformat())
-    updated_messages = list(merge_message_runs(
-        messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + state["messages"][:-1]
-    ))
 
-    # Initialize the sniffer for visibility into the tool calls made by Trustcall
-    sniffer = Sniffer()
-    
-    # Create the Trustcall extractor for updating the ToDo list 
-    todo_extractor = create_todo_extractor(model, tool_name).with_listeners(on_end=sniffer)
-
-    # Invoke the extractor
-    result = todo_extractor.invoke({
-        "messages": updated_messages, 
-        "existing": existing_memories
-    })
-
-    # Save the memories from Trustcall to the store
-    import uuid
-    for r, rmeta in zip(result["responses"], result["response_metadata"]):
-        store.put(
-            namespace,
-            rmeta.get("json_doc_id", str(uuid.uuid4())),
-            r.model_dump(mode="json"),
-        )
-        
-    # Respond to the tool call made in task_asis, confirming the update    
-    tool_calls = state['messages'][-1].tool_calls
+    async def extract_and_save():
+        # Retrieve the most recent memories for context (including writes still being flushed)
+        await store_writer.wait(user_id)
+        existing_items = await store.asearch(namespace)
+
+        # Initialize the sniffer for visibility into the tool calls made by Trustcall
+        sniffer = Sniffer()
+
+        # Attach the sniffer to the shared Trustcall extractor for the ToDo list
+        todo_extractor = get_todo_extractor(model, tool_name).with_listeners(on_end=sniffer)
+
+        # Invoke the extractor
+        result = await _ainvoke(todo_extractor, {
+            "messages": _trustcall_messages(state, "todo"),
+            "existing": _format_existing_memories(existing_items, tool_name)
+        })
+
+        # Save the memories from Trustcall to the store in one batch, versioned against what was read
+        documents = _extracted_documents(result)
+        work = UnitOfWork(store, user_id)
+        work.read(existing_items)
+        for key, value in documents:
+            work.put(namespace, key, value)
+        await work.acommit(on_commit=lambda: response_cache.bump(user_id))
+        return sniffer, documents
+
+    sniffer, documents = await _awith_reextraction(extract_and_save)
 
     # Extract the changes made by Trustcall and add the the ToolMessage returned to task_asis
     todo_update_msg = extract_tool_info(sniffer.called_tools, tool_name)
-    return {"messages": [{"role": "tool", "content": todo_update_msg, "tool_call_id": tool_calls[0]['id']}]}
+    return _tool_message(state, todo_update_msg, "todo", _todo_acknowledgement(sniffer, tool_name, documents))
 
-def update_instructions(state: MessagesState, config: RunnableConfig, store: BaseStore):
+
+def update_instructions(state: AgentState, config: RunnableConfig, store: BaseStore):
     """Reflect on the chat history and update the memory collection."""
-    
+
     # Get the user ID from the config
     configurable = Configuration.from_runnable_config(config)
     user_id = configurable.user_id
     todo_category = configurable.todo_category
-    
+
     namespace = ("instructions", todo_category, user_id)
 
-    existing_memory = store.get(namespace, "user_instructions")
-        
-    # Format the memory in the system prompt
-    system_msg = CREATE_INSTRUCTIONS.format(current_instructions=existing_memory.value if existing_memory else None)
-    new_memory = model.invoke([SystemMessage(content=system_msg)] + state['messages'][:-1] + [HumanMessage(content="Please update the instructions based on the conversation")])
+    def extract_and_save():
+        store_writer.wait_blocking(user_id)
+        existing_memory = store.get(namespace, "user_instructions")
+
+        # Format the memory in the system prompt
+        new_memory = _invoke(model, _instructions_messages(state, existing_memory))
+
+        # Overwrite the existing memory in the store, unless it changed since it was read
+        work = UnitOfWork(store, user_id)
+        work.read([existing_memory])
+        work.put(namespace, "user_instructions", {"memory": new_memory.content})
+        work.commit(on_commit=lambda: response_cache.bump(user_id))
 
-    # Overwrite the existing memory in the store
-    key = "user_instructions"
-    store.put(namespace, key, {"memory": new_memory.content})
-    tool_calls = state['messages'][-1].tool_calls
+    _with_reextraction(extract_and_save)
     # Return tool message with update verification
-    return {"messages": [{"role": "tool", "content": "updated instructions", "tool_call_id": tool_calls[0]['id']}]}
+    return _tool_message(state, "updated instructions", "instructions")
+
+
+async def aupdate_instructions(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Async variant of `update_instructions`."""
+
+    # Get the user ID from the config
+    configurable = Configuration.from_runnable_config(config)
+    user_id = configurable.user_id
+    todo_category = configurable.todo_category
+
+    namespace = ("instructions", todo_category, user_id)
+
+    async def extract_and_save():
+        await store_writer.wait(user_id)
+        existing_memory = await store.aget(namespace, "user_instructions")
+
+        # Format the memory in the system prompt
+        new_memory = await _ainvoke(model, _instructions_messages(state, existing_memory))
+
+        # Overwrite the existing memory in the store, unless it changed since it was read
+        work = UnitOfWork(store, user_id)
+        work.read([existing_memory])
+        work.put(namespace, "user_instructions", {"memory": new_memory.content})
+        await work.acommit(on_commit=lambda: response_cache.bump(user_id))
+
+    await _awith_reextraction(extract_and_save)
+    # Return tool message with update verification
+    return _tool_message(state, "updated instructions", "instructions")
+
+
+def _turn_acknowledgements(state: AgentState) -> list[str]:
+    """Confirmations attached to the ToolMessages answering the latest UpdateMemory calls."""
+    acknowledgements = []
+    for message in reversed(state["messages"]):
+        if not isinstance(message, ToolMessage):
+            break
+        if message.artifact:
+            acknowledgements.insert(0, message.artifact)
+    return list(dict.fromkeys(acknowledgements))
+
+
+def acknowledge_update(state: AgentState):
+    """Confirm the memory update with a templated reply instead of another task_asis model call.
+
+    Returns no message when the update has nothing to tell the user (profile
+    and instruction updates are silent), in which case task_asis replies.
+    """
+    acknowledgements = _turn_acknowledgements(state)
+    if not acknowledgements:
+        return {}
+    metrics.record_llm_call_saved()
+    return {"messages": [AIMessage(content=" ".join(acknowledgements))]}
+
+
+# Sync and async implementation of every update node, by graph node name
+UPDATE_NODES = {
+    "update_profile": (update_profile, aupdate_profile),
+    "update_todos": (update_todos, aupdate_todos),
+    "update_instructions": (update_instructions, aupdate_instructions),
+}
+
+
+def reflect_and_update(messages: list, config: RunnableConfig, store: BaseStore,
+                       watermarks: Optional[dict] = None) -> int:
+    """Decide which memories a finished turn touches and run the matching update nodes.
+
+    Like the inline update nodes, only the turns after each kind's extraction
+    watermark in `watermarks` are extracted. Returns the number of memory
+    updates performed.
+    """
+    configurable = Configuration.from_runnable_config(config)
+    memories = load_memories(store, configurable.user_id, configurable.todo_category)
+    history = _reflection_history(messages)
+    watermarks = watermarks or {}
+
+    decision = _invoke(
+        get_memory_router(model),
+        [SystemMessage(content=_build_system_message(configurable, memories))]
+        + context_window.window(_unreflected_history(history, watermarks))
+    )
+    for node_name, tool_calls in group_tool_calls(decision.tool_calls).items():
+        update_node, _ = UPDATE_NODES[node_name]
+        update_node({
+            "messages": history + [AIMessage(content="", tool_calls=tool_calls)],
+            "extraction_watermarks": watermarks,
+        }, config, store)
+    return len(decision.tool_calls)
+
+
+async def areflect_and_update(messages: list, config: RunnableConfig, store: BaseStore,
+                              watermarks: Optional[dict] = None) -> int:
+    """Async variant of `reflect_and_update`."""
+    configurable = Configuration.from_runnable_config(config)
+    memories = await aload_memories(store, configurable.user_id, configurable.todo_category)
+    history = _reflection_history(messages)
+    watermarks = watermarks or {}
+
+    decision = await _ainvoke(
+        get_memory_router(model),
+        [SystemMessage(content=_build_system_message(configurable, memories))]
+        + context_window.window(_unreflected_history(history, watermarks))
+    )
+    # Different memory types are independent, so update them concurrently
+    await asyncio.gather(*(
+        UPDATE_NODES[node_name][1]({
+            "messages": history + [AIMessage(content="", tool_calls=tool_calls)],
+            "extraction_watermarks": watermarks,
+        }, config, store)
+        for node_name, tool_calls in group_tool_calls(decision.tool_calls).items()
+    ))
+    logger.info(f"Background extraction applied {len(decision.tool_calls)} memory updates for user {configurable.user_id}")
+    return len(decision.tool_calls)
+
+
+def schedule_memory_update(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Update memories for the finished turn (inline: sync graphs have no event loop to defer to)."""
+    reflect_and_update(state["messages"], config, store, dict(state.get("extraction_watermarks") or {}))
+    return _reflected_watermarks(state["messages"])
+
+
+async def aschedule_memory_update(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Hand memory extraction for the finished turn to the background queue."""
+    configurable = Configuration.from_runnable_config(config)
+    job_config = {"configurable": asdict(configurable)}
+    messages = list(state["messages"])
+    watermarks = dict(state.get("extraction_watermarks") or {})
+
+    if extraction_queue.closed:
+        # Shutting down: nothing will run queued jobs any more, so update inline
+        await areflect_and_update(messages, job_config, store, watermarks)
+        return _reflected_watermarks(messages)
+
+    # Jobs are keyed by user so one user's updates apply in order; the watermarks advance
+    # now, so the next turn's job only covers what this one did not
+    extraction_queue.submit(
+        configurable.user_id,
+        lambda: areflect_and_update(messages, job_config, store, watermarks)
+    )
+    logger.info(f"Queued background memory extraction for user {configurable.user_id}")
+    return _reflected_watermarks(messages)
+
+
+def _summary_prompt(state: AgentState, overflow: list) -> list:
+    """Ask the model to fold the overflowing turns into the running summary."""
+    return [HumanMessage(content=SUMMARIZE_CONVERSATION.format(
+        summary=state.get("summary", ""),
+        conversation=get_buffer_string(overflow)
+    ))]
+
+
+def _summary_update(summary: str, overflow: list) -> dict:
+    """Store the new summary and remove the summarized messages from state."""
+    logger.info(f"Summarized {len(overflow)} older messages into the conversation summary")
+    return {"summary": summary, "messages": [RemoveMessage(id=m.id) for m in overflow]}
+
+
+def summarize_conversation(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Fold turns older than the context window into the running summary."""
+    overflow = context_window.overflow(state["messages"])
+    if not overflow:
+        return {}
+    response = _invoke(model, _summary_prompt(state, overflow))
+    return _summary_update(response.content, overflow)
+
+
+async def asummarize_conversation(state: AgentState, config: RunnableConfig, store: BaseStore):
+    """Async variant of `summarize_conversation`."""
+    overflow = context_window.overflow(state["messages"])
+    if not overflow:
+        return {}
+    response = await _ainvoke(model, _summary_prompt(state, overflow))
+    return _summary_update(response.content, overflow)
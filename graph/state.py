@@ -1,5 +1,19 @@
 """State definitions for the memory agent graph."""
+from typing import Annotated
+
 from langgraph.graph import MessagesState
 
-# Re-export MessagesState for convenience
-__all__ = ["MessagesState"]
+
+def merge_watermarks(left: dict[str, str], right: dict[str, str]) -> dict[str, str]:
+    """Reducer for extraction watermarks: the latest write wins per memory kind."""
+    return {**(left or {}), **(right or {})}
+
+
+class AgentState(MessagesState):
+    """Messages of the recent turns plus a running summary of older ones."""
+    summary: str
+    # Per memory kind, the ID of the last message already fed to its extractor
+    extraction_watermarks: Annotated[dict[str, str], merge_watermarks]
+
+
+__all__ = ["MessagesState", "AgentState"]
@@ -0,0 +1 @@
+"""Storage components for the memory agent."""
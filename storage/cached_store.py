@@ -0,0 +1,186 @@
+"""Read-through cache of hot users' memory namespaces in front of a BaseStore.
+
+Every turn re-reads the same profile, todo and instruction namespaces, and so
+do the REST memory endpoints. `CachedStore` answers repeated `get` and
+`search` calls from memory. Results are grouped by namespace; namespaces are
+evicted least recently used first once their estimated size exceeds
+`max_bytes`. Every write that goes through the cache invalidates the
+namespace it touches (and the prefixes a search could have used), and
+entries expire after `ttl_seconds` so writes made by other processes sharing
+a persistent store show up too. A batch that fails with a version conflict
+proves another writer got there first, so the conflicting namespaces are
+invalidated at once and the writer's re-read sees the stored document.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore, GetOp, Op, PutOp, Result, SearchOp
+
+from storage.versioning import VersionConflictError
+
+
+class _NamespaceEntry:
+    __slots__ = ("results", "size", "expires")
+
+    def __init__(self, expires: float):
+        self.results: Dict[Hashable, Result] = {}
+        self.size = 0
+        self.expires = expires
+
+
+def _cache_key(op: Op) -> Optional[Tuple[Tuple[str, ...], Hashable]]:
+    """(namespace, key within the namespace) for cacheable reads; None for everything else."""
+    if isinstance(op, GetOp):
+        return op.namespace, ("get", op.key)
+    if isinstance(op, SearchOp) and op.query is None:
+        filter = json.dumps(op.filter, sort_keys=True, default=str) if op.filter else None
+        return op.namespace_prefix, ("search", filter, op.limit, op.offset)
+    return None
+
+
+def _result_size(result: Result) -> int:
+    """Rough in-memory footprint of a cached result, from its JSON size."""
+    items = result if isinstance(result, list) else [result] if result is not None else []
+    return 64 + sum(200 + len(json.dumps(item.value, default=str)) for item in items)
+
+
+class CachedStore(BaseStore):
+    """BaseStore decorator with a per-namespace LRU of read results."""
+
+    def __init__(self, store: BaseStore, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 60):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, ...], _NamespaceEntry]" = OrderedDict()
+        self._size = 0
+        # Bumped on every invalidation; a read only fills the cache if no write happened meanwhile
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, namespace: Tuple[str, ...], key: Hashable, now: float) -> Tuple[bool, Result]:
+        entry = self._entries.get(namespace)
+        if entry is None or key not in entry.results:
+            return False, None
+        if entry.expires <= now:
+            self._drop(namespace)
+            return False, None
+        self._entries.move_to_end(namespace)
+        return True, entry.results[key]
+
+    def _drop(self, namespace: Tuple[str, ...]):
+        entry = self._entries.pop(namespace, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _fill(self, namespace: Tuple[str, ...], key: Hashable, result: Result, now: float):
+        entry = self._entries.get(namespace)
+        if entry is None:
+            entry = self._entries[namespace] = _NamespaceEntry(now + self.ttl_seconds)
+        else:
+            self._entries.move_to_end(namespace)
+        size = _result_size(result)
+        if key in entry.results:
+            size -= _result_size(entry.results[key])
+        entry.results[key] = result
+        entry.size += size
+        self._size += size
+        while self._size > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, namespace: Tuple[str, ...]):
+        """Forget cached reads of `namespace` and of every search prefix covering it."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            for depth in range(len(namespace) + 1):
+                self._drop(tuple(namespace[:depth]))
+
+    def clear(self):
+        """Drop every cached result."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._size = 0
+
+    def _plan(self, ops: List[Op]) -> Tuple[List[Result], List[int], int]:
+        """Answer cached reads; returns the results so far, indexes still to run and the cache generation."""
+        results: List[Result] = [None] * len(ops)
+        if any(not isinstance(op, (GetOp, SearchOp)) for op in ops):
+            # Batches with writes (or namespace listings) pass through untouched
+            return results, list(range(len(ops))), -1
+        misses = []
+        now = time.monotonic()
+        with self._lock:
+            for i, op in enumerate(ops):
+                cache_key = _cache_key(op)
+                hit, result = self._lookup(*cache_key, now) if cache_key else (False, None)
+                if hit:
+                    results[i] = result
+                    self.hits += 1
+                else:
+                    misses.append(i)
+                    self.misses += 1
+            return results, misses, self._generation
+
+    def _complete(self, ops: List[Op], results: List[Result], misses: List[int], fetched: List[Result], generation: int):
+        for i, result in zip(misses, fetched):
+            results[i] = result
+        written = [op.namespace for op in ops if isinstance(op, PutOp)]
+        for namespace in written:
+            self.invalidate(namespace)
+        if generation < 0:
+            return results
+        now = time.monotonic()
+        with self._lock:
+            if generation == self._generation:
+                for i in misses:
+                    cache_key = _cache_key(ops[i])
+                    if cache_key:
+                        self._fill(*cache_key, results[i], now)
+        return results
+
+    def _conflicted(self, error: VersionConflictError):
+        for namespace in {conflict.namespace for conflict in error.conflicts}:
+            self.invalidate(namespace)
+
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        results, misses, generation = self._plan(ops)
+        try:
+            fetched = self.store.batch([ops[i] for i in misses]) if misses else []
+        except VersionConflictError as e:
+            self._conflicted(e)
+            raise
+        return self._complete(ops, results, misses, fetched, generation)
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        results, misses, generation = self._plan(ops)
+        try:
+            fetched = await self.store.abatch([ops[i] for i in misses]) if misses else []
+        except VersionConflictError as e:
+            self._conflicted(e)
+            raise
+        return self._complete(ops, results, misses, fetched, generation)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "namespaces": len(self._entries),
+                "size_bytes": self._size,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
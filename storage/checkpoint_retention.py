@@ -0,0 +1,245 @@
+"""Retention and garbage collection for conversation checkpoints.
+
+Neither checkpointer ever forgets anything on its own: every superstep of
+every thread is kept, and threads nobody will resume (anonymous WebSocket
+connections, one-off API sessions) stay forever. `CheckpointRetention`
+sweeps the checkpointer periodically and
+
+- keeps only the newest `keep_last` checkpoints of each thread,
+- deletes threads whose latest checkpoint is older than `idle_ttl` seconds,
+- deletes least-recently-active threads while the checkpoints take more
+  than `max_bytes` in total.
+
+Threads with a run in progress (`is_active`) are never deleted.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.base.id import UUID as CheckpointUUID
+from langgraph.checkpoint.memory import InMemorySaver
+
+from config import app_config
+from storage.redis_checkpointer import RedisSaver
+from storage.sqlite_checkpointer import SqliteSaver
+from utils.logging_config import logger
+
+# 100 ns intervals between the UUID epoch (1582-10-15) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+class ThreadUsage(NamedTuple):
+    last_active: float
+    checkpoints: int
+    bytes: int
+
+
+def checkpoint_time(checkpoint_id: str) -> float:
+    """Unix time at which a checkpoint was created, read from its UUIDv6 ID."""
+    return (CheckpointUUID(checkpoint_id).time - _UUID_EPOCH_OFFSET) / 1e7
+
+
+class _MemorySaverBackend:
+    """Usage accounting and pruning on `MemorySaver`'s dictionaries."""
+
+    def __init__(self, saver: InMemorySaver):
+        self.saver = saver
+        # Blob keys per thread as of the last `usage` scan, so pruning doesn't rescan every blob
+        self._blob_keys: Dict[str, List[tuple]] = {}
+
+    def usage(self) -> Dict[str, ThreadUsage]:
+        sizes: Dict[str, int] = {}
+        self._blob_keys = {}
+        for key, (_, data) in self.saver.blobs.items():
+            sizes[key[0]] = sizes.get(key[0], 0) + len(data)
+            self._blob_keys.setdefault(key[0], []).append(key)
+        for (thread_id, *_), writes in self.saver.writes.items():
+            sizes[thread_id] = sizes.get(thread_id, 0) + sum(len(write[2][1]) for write in writes.values())
+        usage = {}
+        for thread_id, namespaces in self.saver.storage.items():
+            checkpoints = {cid: saved for ns in namespaces.values() for cid, saved in ns.items()}
+            if not checkpoints:
+                continue
+            size = sum(len(checkpoint[1]) + len(metadata[1]) for checkpoint, metadata, _ in checkpoints.values())
+            usage[thread_id] = ThreadUsage(
+                checkpoint_time(max(checkpoints)), len(checkpoints), size + sizes.get(thread_id, 0),
+            )
+        return usage
+
+    def prune(self, thread_id: str, keep_last: int) -> Tuple[int, int]:
+        saver = self.saver
+        removed = freed = 0
+        for checkpoint_ns, checkpoints in saver.storage.get(thread_id, {}).items():
+            ids = sorted(checkpoints, reverse=True)
+            if len(ids) <= keep_last:
+                continue
+            referenced = set()
+            for checkpoint_id in ids[:keep_last]:
+                versions = saver.serde.loads_typed(checkpoints[checkpoint_id][0])["channel_versions"]
+                referenced.update(versions.items())
+            for checkpoint_id in ids[keep_last:]:
+                checkpoint, metadata, _ = checkpoints.pop(checkpoint_id)
+                freed += len(checkpoint[1]) + len(metadata[1])
+                writes = saver.writes.pop((thread_id, checkpoint_ns, checkpoint_id), {})
+                freed += sum(len(write[2][1]) for write in writes.values())
+                removed += 1
+            for key in self._blob_keys.get(thread_id, ()):
+                if key[1] == checkpoint_ns and (key[2], key[3]) not in referenced and key in saver.blobs:
+                    freed += len(saver.blobs.pop(key)[1])
+        return removed, freed
+
+    def delete(self, thread_id: str):
+        self.saver.delete_thread(thread_id)
+
+
+class _SaverBackend:
+    """Usage accounting and pruning through the saver's own `thread_usage` and `prune_thread` helpers."""
+
+    def __init__(self, saver: Union[SqliteSaver, RedisSaver]):
+        self.saver = saver
+
+    def usage(self) -> Dict[str, ThreadUsage]:
+        return {
+            thread_id: ThreadUsage(checkpoint_time(latest), count, size)
+            for thread_id, (latest, count, size) in self.saver.thread_usage().items()
+        }
+
+    def prune(self, thread_id: str, keep_last: int) -> Tuple[int, int]:
+        return self.saver.prune_thread(thread_id, keep_last)
+
+    def delete(self, thread_id: str):
+        self.saver.delete_thread(thread_id)
+
+
+class CheckpointRetention:
+    """Periodic checkpoint pruning, idle-thread expiry and a global size cap (0 disables each)."""
+
+    def __init__(
+        self,
+        checkpointer: BaseCheckpointSaver,
+        keep_last: int = 20,
+        idle_ttl: float = 86400,
+        max_bytes: int = 0,
+        interval: float = 60,
+    ):
+        if isinstance(checkpointer, (SqliteSaver, RedisSaver)):
+            self._backend = _SaverBackend(checkpointer)
+        elif isinstance(checkpointer, InMemorySaver):
+            self._backend = _MemorySaverBackend(checkpointer)
+        else:
+            raise ValueError(f"Checkpoint retention does not support {type(checkpointer).__name__}")
+        self.checkpointer = checkpointer
+        self.keep_last = keep_last
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.is_active: Callable[[str], bool] = lambda thread_id: False
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.pruned_checkpoints = 0
+        self.expired_threads = 0
+        self.evicted_threads = 0
+        self.bytes_reclaimed = 0
+        self.threads = 0
+        self.stored_bytes = 0
+
+    @classmethod
+    def from_app_config(cls, checkpointer: BaseCheckpointSaver) -> "CheckpointRetention":
+        """Build the retention policy from the CHECKPOINT_* settings."""
+        return cls(
+            checkpointer,
+            keep_last=app_config.checkpoint_keep_last,
+            idle_ttl=app_config.checkpoint_thread_ttl,
+            max_bytes=int(app_config.checkpoint_max_mb * 1024 * 1024),
+            interval=app_config.checkpoint_gc_interval,
+        )
+
+    def _delete(self, thread_id: str, usage: ThreadUsage):
+        self._backend.delete(thread_id)
+        self.bytes_reclaimed += usage.bytes
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Apply the retention policy once; returns what this sweep removed."""
+        now = time.time() if now is None else now
+        usage = self._backend.usage()
+        removed = {"pruned_checkpoints": 0, "expired_threads": 0, "evicted_threads": 0, "bytes_reclaimed": 0}
+        reclaimed_before = self.bytes_reclaimed
+
+        for thread_id, thread in list(usage.items()):
+            if self.is_active(thread_id):
+                continue
+            if self.idle_ttl and now - thread.last_active > self.idle_ttl:
+                self._delete(thread_id, thread)
+                del usage[thread_id]
+                removed["expired_threads"] += 1
+            elif self.keep_last and thread.checkpoints > self.keep_last:
+                pruned, freed = self._backend.prune(thread_id, self.keep_last)
+                self.bytes_reclaimed += freed
+                usage[thread_id] = thread._replace(checkpoints=thread.checkpoints - pruned, bytes=thread.bytes - freed)
+                removed["pruned_checkpoints"] += pruned
+
+        total = sum(thread.bytes for thread in usage.values())
+        if self.max_bytes and total > self.max_bytes:
+            # Least recently active threads go first
+            for thread_id, thread in sorted(usage.items(), key=lambda item: item[1].last_active):
+                if total <= self.max_bytes:
+                    break
+                if self.is_active(thread_id):
+                    continue
+                self._delete(thread_id, thread)
+                del usage[thread_id]
+                total -= thread.bytes
+                removed["evicted_threads"] += 1
+
+        removed["bytes_reclaimed"] = self.bytes_reclaimed - reclaimed_before
+        self.sweeps += 1
+        self.pruned_checkpoints += removed["pruned_checkpoints"]
+        self.expired_threads += removed["expired_threads"]
+        self.evicted_threads += removed["evicted_threads"]
+        self.threads = len(usage)
+        self.stored_bytes = total
+        if any(removed.values()):
+            logger.info(f"Checkpoint retention sweep: {removed}")
+        return removed
+
+    async def asweep(self) -> Dict[str, int]:
+        """Run `sweep` without blocking the event loop on disk or network I/O."""
+        if isinstance(self.checkpointer, (SqliteSaver, RedisSaver)):
+            return await asyncio.to_thread(self.sweep)
+        # MemorySaver's dictionaries are mutated on the event loop, so sweep there too
+        return self.sweep()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.asweep()
+            except Exception as e:
+                logger.error(f"Checkpoint retention sweep failed: {e}", exc_info=True)
+
+    def start(self, is_active: Optional[Callable[[str], bool]] = None):
+        """Start sweeping every `interval` seconds on the running event loop."""
+        if is_active is not None:
+            self.is_active = is_active
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background sweeps."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Retention counters and the checkpoint size seen by the last sweep."""
+        return {
+            "sweeps": self.sweeps,
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "expired_threads": self.expired_threads,
+            "evicted_threads": self.evicted_threads,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "threads": self.threads,
+            "stored_bytes": self.stored_bytes,
+        }
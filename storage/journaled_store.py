@@ -0,0 +1,350 @@
+"""Durable `InMemoryStore` backed by an append-only journal and snapshots.
+
+`JournaledStore` keeps every item in memory like `InMemoryStore`, so reads
+cost the same, but each batch of puts and deletes is first appended to a
+journal segment in `directory` as one checksummed frame. The journal is
+fsynced by a background thread every `fsync_interval` seconds (group
+commit), so a crash loses at most that window of writes; `fsync_interval=0`
+fsyncs every batch before it is applied.
+
+After `snapshot_every` journaled writes, the whole store is written to
+`snapshot.bin`: one msgpack frame per namespace, loaded at startup through
+`mmap`. Taking a snapshot starts a new journal segment, and the snapshot
+records the first segment it does not cover, so restore loads the snapshot
+and replays only the segments written after it. A torn frame at the end of
+the journal (a crash mid-write) is discarded. Vector indexes are not
+journaled. Versioned puts are checked before their frame is written, so a
+batch that fails with a version conflict never reaches the journal.
+
+An update keeps the item's `created_at`; each put record carries it, so
+replay restores it too.
+"""
+import gc
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import ormsgpack
+from langgraph.store.base import Item, PutOp
+
+from storage.versioning import VersionedInMemoryStore
+from utils.logging_config import logger
+
+SNAPSHOT_NAME = "snapshot.bin"
+SNAPSHOT_MAGIC = b"ASISSNP1"
+# Snapshot header after the magic: first journal segment to replay, item count
+_SNAPSHOT_HEADER = struct.Struct("<QQ")
+# Frame header: payload length, CRC32 of the payload
+_FRAME_HEADER = struct.Struct("<II")
+
+
+def _segment_name(segment: int) -> str:
+    return f"journal-{segment:08d}.log"
+
+
+def _frame(payload: Any) -> bytes:
+    data = ormsgpack.packb(payload)
+    return _FRAME_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+
+def _item(value: Dict[str, Any], key: str, namespace: Tuple[str, ...], created_at: datetime,
+          updated_at: datetime) -> Item:
+    """Build an `Item` without the per-field type checks of its constructor (restore hot path)."""
+    item = Item.__new__(Item)
+    item.value, item.key, item.namespace, item.created_at, item.updated_at = (
+        value, key, namespace, created_at, updated_at,
+    )
+    return item
+
+
+def _read_frames(buffer, offset: int = 0) -> Iterator[Tuple[int, Any]]:
+    """Yield (end offset, payload) for each intact frame; stops at the first torn one."""
+    view = memoryview(buffer)
+    try:
+        while offset + _FRAME_HEADER.size <= len(view):
+            length, crc = _FRAME_HEADER.unpack_from(view, offset)
+            start, end = offset + _FRAME_HEADER.size, offset + _FRAME_HEADER.size + length
+            if end > len(view):
+                return
+            payload = view[start:end]
+            try:
+                if zlib.crc32(payload) != crc:
+                    return
+                decoded = ormsgpack.unpackb(payload)
+            finally:
+                payload.release()
+            offset = end
+            yield offset, decoded
+    finally:
+        view.release()
+
+
+class JournaledStore(VersionedInMemoryStore):
+    """`InMemoryStore` whose writes survive restarts via a journal and snapshots."""
+
+    def __init__(self, directory: str, fsync_interval: float = 0.05, snapshot_every: int = 100_000):
+        super().__init__()
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._dirty = False
+        self._closed = False
+        self.since_snapshot = 0
+        self.journal_bytes = 0
+        self.fsyncs = 0
+        self.snapshots = 0
+        self.last_snapshot_ms = 0.0
+        self.torn_frames = 0
+        os.makedirs(directory, exist_ok=True)
+
+        started = time.perf_counter()
+        # Restore allocates millions of objects and no cycles; collecting meanwhile only slows it down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            first_segment = self._load_snapshot()
+            self.restored_items = sum(len(items) for items in self._data.values())
+            self.replayed_records, last_segment = self._replay(first_segment)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.since_snapshot = self.replayed_records
+        self.restore_ms = (time.perf_counter() - started) * 1000
+        if self.restored_items or self.replayed_records:
+            logger.info(
+                f"Restored {self.restored_items} items from snapshot and replayed "
+                f"{self.replayed_records} journal records in {self.restore_ms:.0f} ms"
+            )
+
+        self._segment = max(first_segment, last_segment + 1)
+        self._journal = open(os.path.join(directory, _segment_name(self._segment)), "ab")
+        self._stop = threading.Event()
+        self._flusher = None
+        if fsync_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="store-journal-fsync", daemon=True)
+            self._flusher.start()
+
+    # Restore
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[len("journal-"):-len(".log")]) for name in os.listdir(self.directory)
+            if name.startswith("journal-") and name.endswith(".log")
+        )
+
+    def _load_snapshot(self) -> int:
+        """Load `snapshot.bin` if present; returns the first journal segment it does not cover."""
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if not os.path.exists(path) or os.path.getsize(path) < len(SNAPSHOT_MAGIC) + _SNAPSHOT_HEADER.size:
+            return 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a store snapshot")
+            first_segment, count = _SNAPSHOT_HEADER.unpack_from(mapped, len(SNAPSHOT_MAGIC))
+            timestamps: Dict[float, datetime] = {}
+            loaded = 0
+            for _, (namespace, items) in _read_frames(mapped, len(SNAPSHOT_MAGIC) + _SNAPSHOT_HEADER.size):
+                namespace = tuple(namespace)
+                bucket = self._data[namespace]
+                for key, value, created, updated in items:
+                    bucket[key] = _item(
+                        value, key, namespace, self._timestamp(timestamps, created), self._timestamp(timestamps, updated),
+                    )
+                loaded += len(items)
+        if loaded != count:
+            raise ValueError(f"{path} is truncated: {loaded} of {count} items")
+        return first_segment
+
+    @staticmethod
+    def _timestamp(cache: Dict[float, datetime], ts: float) -> datetime:
+        # Items written in one batch share a timestamp, so most conversions are cache hits
+        moment = cache.get(ts)
+        if moment is None:
+            moment = cache[ts] = datetime.fromtimestamp(ts, timezone.utc)
+        return moment
+
+    def _replay(self, first_segment: int) -> Tuple[int, int]:
+        """Apply journal segments from `first_segment` on; returns (records, last segment)."""
+        replayed, last = 0, first_segment - 1
+        for segment in self._segments():
+            if segment < first_segment:
+                continue
+            path = os.path.join(self.directory, _segment_name(segment))
+            with open(path, "rb") as f:
+                data = f.read()
+            end = 0
+            for end, (ts, records) in _read_frames(data):
+                self._apply(ts, records)
+                replayed += len(records)
+            if end < len(data):
+                # Crash mid-append: drop the torn tail so new frames follow intact ones
+                self.torn_frames += 1
+                logger.warning(f"Discarding {len(data) - end} torn bytes at the end of {path}")
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+            last = segment
+        return replayed, last
+
+    def _apply(self, ts: float, records: List[list]):
+        moment = datetime.fromtimestamp(ts, timezone.utc)
+        timestamps = {ts: moment}
+        for namespace, key, value, *created in records:
+            namespace = tuple(namespace)
+            if value is None:
+                self._data[namespace].pop(key, None)
+                self._vectors[namespace].pop(key, None)
+                continue
+            if created:
+                created_at = self._timestamp(timestamps, created[0])
+            else:
+                # Records journaled before creation times were: keep whatever the item already had
+                existing = self._data[namespace].get(key)
+                created_at = existing.created_at if existing is not None else moment
+            self._data[namespace][key] = _item(value, key, namespace, created_at, moment)
+
+    # Writes
+
+    def _apply_put_ops(self, put_ops: Dict[Tuple[Tuple[str, ...], str], PutOp]) -> None:
+        if not put_ops:
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("JournaledStore is closed")
+            self._check_versions(put_ops)
+            ts = time.time()
+            records = [self._record(namespace, key, op, ts) for (namespace, key), op in put_ops.items()]
+            # Serialize first: a value msgpack cannot encode fails the batch before anything is applied
+            frame = _frame([ts, records])
+            self._journal.write(frame)
+            self._journal.flush()
+            if self.fsync_interval > 0:
+                self._dirty = True
+            else:
+                os.fsync(self._journal.fileno())
+                self.fsyncs += 1
+            self.journal_bytes += len(frame)
+            self.since_snapshot += len(records)
+            self._apply(ts, records)
+            if self.snapshot_every and self.since_snapshot >= self.snapshot_every:
+                self._snapshot_in_background()
+
+    def _record(self, namespace: Tuple[str, ...], key: str, op: PutOp, ts: float) -> list:
+        """Journal record of `op`: a delete, or the value with its creation time (kept on update)."""
+        if op.value is None:
+            return [list(namespace), key, None]
+        existing = self._data[namespace].get(key) if namespace in self._data else None
+        created = existing.created_at.timestamp() if existing is not None else ts
+        return [list(namespace), key, dict(op.value), created]
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """Fsync journal writes not yet on disk."""
+        with self._lock:
+            if not self._dirty or self._closed:
+                return
+            self._dirty = False
+            # A duplicate descriptor stays valid if a snapshot rotates the segment meanwhile
+            fd = os.dup(self._journal.fileno())
+        try:
+            os.fsync(fd)
+            self.fsyncs += 1
+        finally:
+            os.close(fd)
+
+    # Snapshots
+
+    def _snapshot_in_background(self):
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return
+        self._snapshot_thread = threading.Thread(target=self._snapshot_safely, name="store-snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def _snapshot_safely(self):
+        try:
+            self.snapshot()
+        except Exception as e:
+            logger.error(f"Store snapshot failed: {e}", exc_info=True)
+
+    def snapshot(self):
+        """Write every item to `snapshot.bin` and drop the journal segments it covers."""
+        with self._snapshot_lock:
+            started = time.perf_counter()
+            with self._lock:
+                # Rotate first: everything in older segments is also in the copy taken below
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._dirty = False
+                self._segment += 1
+                self._journal = open(os.path.join(self.directory, _segment_name(self._segment)), "ab")
+                first_segment = self._segment
+                self.since_snapshot = 0
+                # Items are replaced, never mutated, on write, so shallow copies are consistent
+                data = [(namespace, list(items.values())) for namespace, items in self._data.items() if items]
+
+            path = os.path.join(self.directory, SNAPSHOT_NAME)
+            count = sum(len(items) for _, items in data)
+            with open(path + ".tmp", "wb") as f:
+                f.write(SNAPSHOT_MAGIC + _SNAPSHOT_HEADER.pack(first_segment, count))
+                for namespace, items in data:
+                    f.write(_frame([list(namespace), [
+                        [item.key, item.value, item.created_at.timestamp(), item.updated_at.timestamp()]
+                        for item in items
+                    ]]))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            self._fsync_directory()
+            for segment in self._segments():
+                if segment < first_segment:
+                    os.remove(os.path.join(self.directory, _segment_name(segment)))
+            self.snapshots += 1
+            self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Stop the background fsync, fsync the journal and close it."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        with self._lock:
+            if self._closed:
+                return
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._closed = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Journal, snapshot and restore counters for monitoring."""
+        return {
+            "segment": self._segment,
+            "records_since_snapshot": self.since_snapshot,
+            "bytes": self.journal_bytes,
+            "fsyncs": self.fsyncs,
+            "snapshots": self.snapshots,
+            "last_snapshot_ms": round(self.last_snapshot_ms, 2),
+            "restored_items": self.restored_items,
+            "replayed_records": self.replayed_records,
+            "restore_ms": round(self.restore_ms, 2),
+            "torn_frames": self.torn_frames,
+        }
@@ -0,0 +1,358 @@
+"""Shared LangGraph checkpointer on Redis.
+
+`RedisSaver` lets any API replica resume any conversation. Per thread and
+checkpoint namespace it keeps three kinds of hashes:
+
+- `cp:{thread}:<ns>`: checkpoint ID -> serialized checkpoint, metadata and
+  parent ID,
+- `cp-blobs:{thread}:<ns>`: `channel NUL version` -> serialized channel value,
+  written only for the channels whose version changed,
+- `cp-writes:{thread}:<ns>:<checkpoint ID>`: pending writes of that checkpoint.
+
+The thread ID is wrapped in braces, a Redis Cluster hash tag, so all keys of
+a thread live on the same shard. Saving a checkpoint is one MULTI/EXEC
+round-trip; loading one is three pipelined round-trips whatever the number
+of channels.
+"""
+import random
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import ormsgpack
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id, get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+from storage.redis_client import RedisClient
+
+
+def _pairs(flat: List[bytes]) -> Dict[bytes, bytes]:
+    return dict(zip(flat[::2], flat[1::2]))
+
+
+class RedisSaver(BaseCheckpointSaver[str]):
+    """Redis checkpointer shared by every replica; sync and async methods use the same pooled client."""
+
+    def __init__(self, client: RedisClient, *, prefix: str = "asis:", serde: Optional[SerializerProtocol] = None):
+        super().__init__(serde=serde)
+        self.client = client
+        self.prefix = prefix
+
+    # Keys
+
+    def _checkpoints_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}cp:{{{thread_id}}}:{checkpoint_ns}"
+
+    def _blobs_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}cp-blobs:{{{thread_id}}}:{checkpoint_ns}"
+
+    def _writes_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}cp-writes:{{{thread_id}}}:{checkpoint_ns}:{checkpoint_id}"
+
+    def _namespaces_key(self, thread_id: str) -> str:
+        return f"{self.prefix}cp-namespaces:{{{thread_id}}}"
+
+    @property
+    def _threads_key(self) -> str:
+        return f"{self.prefix}cp-threads"
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as MemorySaver: zero-padded counter, so versions sort as text
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Writes
+
+    async def _put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        saved = checkpoint.copy()
+        values: Dict[str, Any] = saved.pop("channel_values")  # type: ignore[misc]
+        commands: List[tuple] = []
+        if new_versions:
+            blobs = []
+            for channel, version in new_versions.items():
+                typed = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+                blobs += [f"{channel}\0{version}", ormsgpack.packb(typed)]
+            commands.append(("HSET", self._blobs_key(thread_id, checkpoint_ns), *blobs))
+        record = ormsgpack.packb([
+            *self.serde.dumps_typed(saved),
+            *self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            config["configurable"].get("checkpoint_id"),
+        ])
+        commands += [
+            ("HSET", self._checkpoints_key(thread_id, checkpoint_ns), checkpoint["id"], record),
+            ("SADD", self._namespaces_key(thread_id), checkpoint_ns),
+            ("SADD", self._threads_key, thread_id),
+        ]
+        await self.client.pipeline(commands, transaction=True)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    async def _put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._writes_key(thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"])
+        commands = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            record = ormsgpack.packb([task_id, channel, *self.serde.dumps_typed(value), task_path, idx])
+            # Regular writes are kept from the first attempt; special channels (errors, interrupts) are replaced
+            commands.append(("HSETNX" if idx >= 0 else "HSET", key, f"{task_id}\0{idx}", record))
+        await self.client.pipeline(commands, transaction=True)
+
+    async def _delete_thread(self, thread_id: str) -> None:
+        namespaces = [ns.decode() for ns in (await self.client.pipeline(
+            [("SMEMBERS", self._namespaces_key(thread_id))]))[0]]
+        ids = await self.client.pipeline([("HKEYS", self._checkpoints_key(thread_id, ns)) for ns in namespaces])
+        keys = [self._namespaces_key(thread_id)]
+        for checkpoint_ns, checkpoint_ids in zip(namespaces, ids):
+            keys += [self._checkpoints_key(thread_id, checkpoint_ns), self._blobs_key(thread_id, checkpoint_ns)]
+            keys += [self._writes_key(thread_id, checkpoint_ns, cid.decode()) for cid in checkpoint_ids]
+        await self.client.pipeline([("DEL", *keys), ("SREM", self._threads_key, thread_id)], transaction=True)
+
+    # Reads
+
+    async def _load(self, thread_id: str, checkpoint_ns: str, records: List[Tuple[str, bytes]]) -> List[CheckpointTuple]:
+        """Turn (checkpoint ID, record) pairs into tuples, fetching pending writes and channel values in one round-trip."""
+        checkpoints = []
+        for checkpoint_id, record in records:
+            type_, data, metadata_type, metadata, parent_id = ormsgpack.unpackb(record)
+            checkpoints.append((checkpoint_id, self.serde.loads_typed((type_, data)), (metadata_type, metadata), parent_id))
+        replies = await self.client.pipeline(
+            [("HGETALL", self._writes_key(thread_id, checkpoint_ns, cid)) for cid, *_ in checkpoints]
+            + [("HMGET", self._blobs_key(thread_id, checkpoint_ns), *[f"{channel}\0{version}"
+                                                                      for channel, version in cp["channel_versions"].items()])
+               for _, cp, *_ in checkpoints if cp["channel_versions"]]
+        )
+        writes, blobs = replies[:len(checkpoints)], iter(replies[len(checkpoints):])
+        tuples = []
+        for (checkpoint_id, checkpoint, metadata, parent_id), pending in zip(checkpoints, writes):
+            channel_values = {}
+            if checkpoint["channel_versions"]:
+                for channel, blob in zip(checkpoint["channel_versions"], next(blobs)):
+                    if blob is not None and (typed := ormsgpack.unpackb(blob))[0] != "empty":
+                        channel_values[channel] = self.serde.loads_typed(tuple(typed))
+            pending = [ormsgpack.unpackb(write) for write in _pairs(pending).values()]
+            tuples.append(CheckpointTuple(
+                config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                         "checkpoint_id": checkpoint_id}},
+                checkpoint={**checkpoint, "channel_values": channel_values},
+                metadata=self.serde.loads_typed(metadata),
+                parent_config=(
+                    {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                    if parent_id else None
+                ),
+                pending_writes=[
+                    (task_id, channel, self.serde.loads_typed((type_, data)))
+                    for task_id, channel, type_, data, _, _ in sorted(pending, key=lambda w: (w[4], w[0], w[5]))
+                ],
+            ))
+        return tuples
+
+    async def _get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._checkpoints_key(thread_id, checkpoint_ns)
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            ids = (await self.client.pipeline([("HKEYS", key)]))[0]
+            if not ids:
+                return None
+            checkpoint_id = max(ids).decode()
+        record = (await self.client.pipeline([("HGET", key, checkpoint_id)]))[0]
+        if record is None:
+            return None
+        return (await self._load(thread_id, checkpoint_ns, [(checkpoint_id, record)]))[0]
+
+    async def _list(self, config: Optional[RunnableConfig], filter: Optional[Dict[str, Any]],
+                    before: Optional[RunnableConfig], limit: Optional[int]) -> List[CheckpointTuple]:
+        if config:
+            threads = [config["configurable"]["thread_id"]]
+        else:
+            threads = [t.decode() for t in (await self.client.pipeline([("SMEMBERS", self._threads_key)]))[0]]
+        namespaces = await self.client.pipeline([("SMEMBERS", self._namespaces_key(t)) for t in threads])
+        wanted_ns = config["configurable"].get("checkpoint_ns") if config else None
+        wanted_id = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+        pairs = [(t, ns.decode()) for t, members in zip(threads, namespaces) for ns in members
+                 if wanted_ns is None or ns.decode() == wanted_ns]
+        hashes = await self.client.pipeline([("HGETALL", self._checkpoints_key(t, ns)) for t, ns in pairs])
+
+        candidates = []
+        for (thread_id, checkpoint_ns), flat in zip(pairs, hashes):
+            for checkpoint_id, record in _pairs(flat).items():
+                checkpoint_id = checkpoint_id.decode()
+                if (wanted_id and checkpoint_id != wanted_id) or (before_id and checkpoint_id >= before_id):
+                    continue
+                if filter:
+                    metadata = self.serde.loads_typed(tuple(ormsgpack.unpackb(record)[2:4]))
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                candidates.append((checkpoint_id, thread_id, checkpoint_ns, record))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        if limit is not None:
+            candidates = candidates[:max(limit, 0)]
+
+        # Channel values are only loaded for the checkpoints returned, one batch per thread and namespace
+        groups: Dict[Tuple[str, str], List[Tuple[str, bytes]]] = {}
+        for checkpoint_id, thread_id, checkpoint_ns, record in candidates:
+            groups.setdefault((thread_id, checkpoint_ns), []).append((checkpoint_id, record))
+        loaded = {}
+        for (thread_id, checkpoint_ns), records in groups.items():
+            for item in await self._load(thread_id, checkpoint_ns, records):
+                loaded[(thread_id, checkpoint_ns, item.config["configurable"]["checkpoint_id"])] = item
+        return [loaded[(thread_id, checkpoint_ns, checkpoint_id)]
+                for checkpoint_id, thread_id, checkpoint_ns, _ in candidates]
+
+    # Retention helpers (see storage/checkpoint_retention.py)
+
+    async def _thread_usage(self) -> Dict[str, Tuple[str, int, int]]:
+        threads = [t.decode() for t in (await self.client.pipeline([("SMEMBERS", self._threads_key)]))[0]]
+        namespaces = await self.client.pipeline([("SMEMBERS", self._namespaces_key(t)) for t in threads])
+        pairs = [(t, ns.decode()) for t, members in zip(threads, namespaces) for ns in members]
+        replies = await self.client.pipeline(
+            [command for t, ns in pairs
+             for command in (("HGETALL", self._checkpoints_key(t, ns)), ("HVALS", self._blobs_key(t, ns)))]
+        )
+        usage: Dict[str, List] = {}
+        write_keys = []
+        for (thread_id, checkpoint_ns), flat, blobs in zip(pairs, replies[::2], replies[1::2]):
+            checkpoints = _pairs(flat)
+            if not checkpoints:
+                continue
+            entry = usage.setdefault(thread_id, ["", 0, 0])
+            entry[0] = max(entry[0], max(checkpoints).decode())
+            entry[1] += len(checkpoints)
+            entry[2] += sum(map(len, checkpoints.values())) + sum(map(len, blobs))
+            write_keys += [(thread_id, self._writes_key(thread_id, checkpoint_ns, cid.decode())) for cid in checkpoints]
+        writes = await self.client.pipeline([("HVALS", key) for _, key in write_keys])
+        for (thread_id, _), values in zip(write_keys, writes):
+            usage[thread_id][2] += sum(map(len, values))
+        return {thread_id: tuple(entry) for thread_id, entry in usage.items()}
+
+    async def _prune_thread(self, thread_id: str, keep_last: int) -> Tuple[int, int]:
+        namespaces = [ns.decode() for ns in (await self.client.pipeline(
+            [("SMEMBERS", self._namespaces_key(thread_id))]))[0]]
+        replies = await self.client.pipeline(
+            [command for ns in namespaces
+             for command in (("HGETALL", self._checkpoints_key(thread_id, ns)), ("HGETALL", self._blobs_key(thread_id, ns)))]
+        )
+        commands, removed, freed = [], 0, 0
+        dropped_writes = []
+        for checkpoint_ns, flat, blob_flat in zip(namespaces, replies[::2], replies[1::2]):
+            checkpoints = sorted(_pairs(flat).items(), reverse=True)
+            if len(checkpoints) <= keep_last:
+                continue
+            referenced = set()
+            for _, record in checkpoints[:keep_last]:
+                type_, data = ormsgpack.unpackb(record)[:2]
+                referenced.update(
+                    f"{channel}\0{version}".encode()
+                    for channel, version in self.serde.loads_typed((type_, data))["channel_versions"].items()
+                )
+            dropped = checkpoints[keep_last:]
+            unreferenced = [(field, blob) for field, blob in _pairs(blob_flat).items() if field not in referenced]
+            freed += sum(len(record) for _, record in dropped) + sum(len(blob) for _, blob in unreferenced)
+            removed += len(dropped)
+            commands.append(("HDEL", self._checkpoints_key(thread_id, checkpoint_ns), *[cid for cid, _ in dropped]))
+            if unreferenced:
+                commands.append(("HDEL", self._blobs_key(thread_id, checkpoint_ns), *[field for field, _ in unreferenced]))
+            dropped_writes += [self._writes_key(thread_id, checkpoint_ns, cid.decode()) for cid, _ in dropped]
+        if not commands:
+            return 0, 0
+        writes = await self.client.pipeline([("HVALS", key) for key in dropped_writes])
+        freed += sum(len(value) for values in writes for value in values)
+        await self.client.pipeline(commands + [("DEL", *dropped_writes)], transaction=True)
+        return removed, freed
+
+    def thread_usage(self) -> Dict[str, Tuple[str, int, int]]:
+        """Per thread: latest checkpoint ID, number of checkpoints and stored bytes."""
+        return self.client.run(self._thread_usage())
+
+    def prune_thread(self, thread_id: str, keep_last: int) -> Tuple[int, int]:
+        """Drop all but the newest `keep_last` checkpoints of a thread (per namespace).
+
+        Channel versions still referenced by a kept checkpoint are kept.
+        Returns the number of checkpoints removed and the bytes reclaimed.
+        """
+        return self.client.run(self._prune_thread(thread_id, keep_last))
+
+    # BaseCheckpointSaver interface
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.client.run(self._get_tuple(config))
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        yield from self.client.run(self._list(config, filter, before, limit))
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.client.run(self._put(config, checkpoint, metadata, new_versions))
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self.client.run(self._put_writes(config, writes, task_id, task_path))
+
+    def delete_thread(self, thread_id: str) -> None:
+        return self.client.run(self._delete_thread(thread_id))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self.client.arun(self._get_tuple(config))
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in await self.client.arun(self._list(config, filter, before, limit)):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self.client.arun(self._put(config, checkpoint, metadata, new_versions))
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await self.client.arun(self._put_writes(config, writes, task_id, task_path))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await self.client.arun(self._delete_thread(thread_id))
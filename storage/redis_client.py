@@ -0,0 +1,253 @@
+"""Small pooled Redis client (RESP2) shared by the Redis store and checkpointer.
+
+The client owns an event loop on a background thread, and all connections
+live on that loop. Callers hand it a coroutine: `run` for synchronous code
+(LangGraph's sync store and checkpointer methods) and `arun` for async code
+on any other event loop. Inside that coroutine, `pipeline` sends a list of
+commands in one write and reads all of their replies, so a multi-key read or
+write costs one round-trip. With `transaction=True` the commands are wrapped
+in MULTI/EXEC and applied atomically. `transaction` adds optimistic locking:
+it WATCHes keys, reads, and applies writes built from what it read only if
+none of the watched keys changed meanwhile.
+
+At most `max_connections` connections are open at once; idle ones are
+reused. No third-party Redis package is needed.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import unquote, urlsplit
+
+T = TypeVar("T")
+Command = Sequence[Any]
+
+
+class RedisError(Exception):
+    """An error reply from the server."""
+
+
+def encode_command(command: Command) -> bytes:
+    """A command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(command)]
+    for arg in command:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode()
+        else:
+            data = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read one RESP reply; error replies are returned as `RedisError`, not raised."""
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by the Redis server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        return None if length < 0 else (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected RESP reply: {line[:32]!r}")
+
+
+def _first_error(replies: List[Any]) -> Optional[RedisError]:
+    for reply in replies:
+        if isinstance(reply, RedisError):
+            return reply
+        if isinstance(reply, list) and (error := _first_error(reply)):
+            return error
+    return None
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, commands: List[Command]) -> List[Any]:
+        self.writer.write(b"".join(encode_command(command) for command in commands))
+        await self.writer.drain()
+        return [await read_reply(self.reader) for _ in commands]
+
+    def close(self):
+        self.writer.close()
+
+
+class RedisClient:
+    """Connection-pooled, pipelining Redis client with its own I/O thread."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", max_connections: int = 10, timeout: float = 5.0):
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError(f"Unsupported Redis URL scheme: {parts.scheme!r}")
+        self.url = url
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: List[_Connection] = []
+        self.connections = 0
+        self.round_trips = 0
+        self.commands = 0
+        self.errors = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._slots = asyncio.Semaphore(self.max_connections)
+                self._thread = threading.Thread(target=self._loop.run_forever, name="redis-client", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the client's loop and wait for its result (sync callers)."""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("RedisClient.run called from the client's own loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def arun(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the client's loop from any other event loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()))
+
+    async def _connect(self) -> _Connection:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        connection = _Connection(reader, writer)
+        setup = ([("AUTH", self.password)] if self.password else []) + ([("SELECT", self.db)] if self.db else [])
+        if setup:
+            error = _first_error(await connection.request(setup))
+            if error:
+                connection.close()
+                raise error
+        self.connections += 1
+        return connection
+
+    async def _checkout(self, commands: List[Command]) -> Tuple[_Connection, List[Any]]:
+        """Take a pooled connection (or open one) and send it `commands`; the caller holds a slot."""
+        reused = bool(self._idle)
+        connection = self._idle.pop() if reused else await self._connect()
+        try:
+            return connection, await self._request(connection, commands)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+            # The server dropped an idle connection; every first request sent here is idempotent, so resend once
+            connection = await self._connect()
+            return connection, await self._request(connection, commands)
+
+    def _count(self, commands: List[Command]):
+        self.round_trips += 1
+        self.commands += len(commands)
+
+    def _raise_first_error(self, replies: List[Any]):
+        error = _first_error(replies)
+        if error:
+            self.errors += 1
+            raise error
+
+    async def pipeline(self, commands: List[Command], transaction: bool = False) -> List[Any]:
+        """Send `commands` in one round-trip and return their replies.
+
+        Must be awaited on the client's loop, i.e. inside a coroutine given to
+        `run` or `arun`. Raises the first error reply after reading them all.
+        """
+        if not commands:
+            return []
+        if transaction:
+            commands = [("MULTI",), *commands, ("EXEC",)]
+        async with self._slots:
+            connection, replies = await self._checkout(commands)
+            self._idle.append(connection)
+        self._count(commands)
+        self._raise_first_error(replies)
+        return replies[-1] if transaction else replies
+
+    async def transaction(self, watch: Sequence[str], reads: List[Command],
+                          build: Callable[[List[Any]], List[Command]]) -> Optional[List[Any]]:
+        """Optimistic MULTI/EXEC in two round-trips on one connection.
+
+        WATCHes `watch` and runs `reads`, then applies `build(read replies)`
+        atomically. Returns the replies of those writes, or None if a watched
+        key changed before EXEC, in which case nothing was written and the
+        caller should retry. An exception from `build` unwatches the keys and
+        propagates. Must be awaited on the client's loop.
+        """
+        first = [("WATCH", *watch), *reads]
+        async with self._slots:
+            connection, replies = await self._checkout(first)
+            self._count(first)
+            try:
+                self._raise_first_error(replies)
+                writes = [("MULTI",), *build(replies[1:]), ("EXEC",)]
+            except BaseException:
+                await self._request(connection, [("UNWATCH",)])
+                self._idle.append(connection)
+                self._count([("UNWATCH",)])
+                raise
+            replies = await self._request(connection, writes)
+            self._idle.append(connection)
+        self._count(writes)
+        self._raise_first_error(replies)
+        return replies[-1]
+
+    async def _request(self, connection: _Connection, commands: List[Command]) -> List[Any]:
+        try:
+            return await asyncio.wait_for(connection.request(commands), self.timeout)
+        except BaseException:
+            # The connection may hold unread replies; never reuse it
+            connection.close()
+            self.connections -= 1
+            self.errors += 1
+            raise
+
+    def execute(self, *command: Any) -> Any:
+        """Run one command synchronously."""
+        return self.run(self.pipeline([command]))[0]
+
+    async def aexecute(self, *command: Any) -> Any:
+        """Run one command from async code."""
+        return (await self.arun(self.pipeline([command])))[0]
+
+    def close(self):
+        """Close every connection and stop the client's loop."""
+        if self._loop is None:
+            return
+
+        async def close_all():
+            while self._idle:
+                self._idle.pop().close()
+                self.connections -= 1
+
+        self.run(close_all())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool and traffic counters for monitoring."""
+        return {
+            "connections": self.connections,
+            "idle_connections": len(self._idle),
+            "round_trips": self.round_trips,
+            "commands": self.commands,
+            "errors": self.errors,
+        }
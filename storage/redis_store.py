@@ -0,0 +1,174 @@
+"""Shared `BaseStore` on Redis.
+
+With `InMemoryStore` every API replica keeps its own copy of user memory.
+`RedisStore` keeps it in Redis, so all replicas read and write the same
+profiles, todos and instructions. Each namespace is one hash: the field
+`v:<key>` holds the item's JSON value and update time, and `c:<key>` its
+creation time (written with HSETNX, so updates keep it). Namespace-index
+sets map every namespace prefix to the namespaces below it, which is how a
+prefix search finds its hashes without scanning the keyspace.
+
+A batch costs one pipelined round-trip for its gets and writes (wrapped in
+MULTI/EXEC when it writes, so a unit of work is applied atomically), plus
+one more when it searches or lists namespaces. A batch with versioned puts
+(see `storage.versioning`) instead WATCHes the namespaces it writes, reads
+the stored versions and applies its writes only if nothing changed
+meanwhile: two round-trips, retried when another write to the same hash got
+in between. Namespaces are encoded like `SqliteStore`'s, so a batch with a
+label containing "." (or an empty one) raises `InvalidNamespaceError`
+before anything is sent. Semantic search (`query=`) is not supported.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langgraph.store.base import (
+    BaseStore, GetOp, Item, ListNamespacesOp, Op, PutOp, Result, SearchItem, SearchOp,
+)
+
+from storage.redis_client import RedisClient, RedisError
+from storage.sqlite_store import decode_namespace, encode_namespace, match_namespaces, matches_filter
+from storage.versioning import check_versions, is_versioned
+
+# Optimistic transactions retried after a concurrent write to a watched hash
+CAS_MAX_ROUNDS = 16
+
+
+class RedisStore(BaseStore):
+    """Redis implementation of LangGraph's `BaseStore`, shared by every replica."""
+
+    def __init__(self, client: RedisClient, prefix: str = "asis:"):
+        self.client = client
+        self.prefix = prefix
+
+    def _hash_key(self, namespace: str) -> str:
+        return f"{self.prefix}store:{namespace}"
+
+    def _index_key(self, namespace_prefix: str) -> str:
+        return f"{self.prefix}store-index:{namespace_prefix}"
+
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        return self.client.run(self._batch(list(ops)))
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        return await self.client.arun(self._batch(list(ops)))
+
+    async def _batch(self, ops: List[Op]) -> List[Result]:
+        puts = [op for op in ops if isinstance(op, PutOp)]
+        if not any(is_versioned(op) for op in puts):
+            return await self._run(ops)
+        # Compare-and-set: answer the reads first, then apply every write in one checked transaction
+        results = await self._run([None if isinstance(op, PutOp) else op for op in ops])
+        await self._write_checked(puts)
+        return results
+
+    async def _write_checked(self, puts: List[PutOp]):
+        versioned = [op for op in puts if is_versioned(op)]
+        watch = sorted({self._hash_key(encode_namespace(op.namespace)) for op in versioned})
+        reads = [("HGET", self._hash_key(encode_namespace(op.namespace)), f"v:{op.key}") for op in versioned]
+
+        def build(replies: List[Optional[bytes]]) -> List[tuple]:
+            stored = {
+                (tuple(op.namespace), op.key): json.loads(reply)[0] if reply is not None else None
+                for op, reply in zip(versioned, replies)
+            }
+            check_versions(versioned, lambda namespace, key: stored[(namespace, key)])
+            return [command for op in puts for command in self._put_commands(op)]
+
+        for _ in range(CAS_MAX_ROUNDS):
+            if await self.client.transaction(watch, reads, build) is not None:
+                return
+        raise RedisError(f"Gave up after {CAS_MAX_ROUNDS} contended transactions on {', '.join(watch)}")
+
+    async def _run(self, ops: List[Optional[Op]]) -> List[Result]:
+        """Run `ops` (None entries are skipped) with one pipelined round-trip, plus one for searches."""
+        results: List[Result] = [None] * len(ops)
+        # First round-trip: gets, writes and the namespace lookups of searches and listings
+        commands: List[tuple] = []
+        slots: List[Tuple[int, int]] = []
+        writes = False
+        for i, op in enumerate(ops):
+            start = len(commands)
+            if op is None:
+                pass
+            elif isinstance(op, GetOp):
+                commands.append(("HMGET", self._hash_key(encode_namespace(op.namespace)), f"v:{op.key}", f"c:{op.key}"))
+            elif isinstance(op, PutOp):
+                commands.extend(self._put_commands(op))
+                writes = True
+            elif isinstance(op, SearchOp):
+                commands.append(("SMEMBERS", self._index_key(encode_namespace(op.namespace_prefix))))
+            elif isinstance(op, ListNamespacesOp):
+                commands.append(("SMEMBERS", self._index_key("")))
+            else:
+                raise ValueError(f"Unknown operation type: {type(op)}")
+            slots.append((start, len(commands)))
+        replies = await self.client.pipeline(commands, transaction=writes)
+
+        namespaces: Dict[int, List[str]] = {}
+        for i, op in enumerate(ops):
+            reply = replies[slots[i][0]:slots[i][1]]
+            if isinstance(op, GetOp) and reply[0][0] is not None:
+                results[i] = self._item(op.namespace, op.key, *reply[0])
+            elif isinstance(op, (SearchOp, ListNamespacesOp)):
+                namespaces[i] = sorted(member.decode() for member in reply[0])
+        if namespaces:
+            await self._read_namespaces(ops, namespaces, results)
+        return results
+
+    def _put_commands(self, op: PutOp) -> List[tuple]:
+        namespace = encode_namespace(op.namespace)
+        key = self._hash_key(namespace)
+        if op.value is None:
+            # Index entries of emptied namespaces stay; readers skip empty hashes
+            return [("HDEL", key, f"v:{op.key}", f"c:{op.key}")]
+        now = datetime.now(timezone.utc).isoformat()
+        commands = [
+            ("HSET", key, f"v:{op.key}", json.dumps([op.value, now])),
+            ("HSETNX", key, f"c:{op.key}", now),
+        ]
+        for depth in range(len(op.namespace) + 1):
+            commands.append(("SADD", self._index_key(encode_namespace(op.namespace[:depth])), namespace))
+        return commands
+
+    @staticmethod
+    def _item(namespace: Tuple[str, ...], key: str, data: bytes, created: Optional[bytes], item_type=Item):
+        value, updated_at = json.loads(data)
+        updated_at = datetime.fromisoformat(updated_at)
+        return item_type(
+            value=value, key=key, namespace=namespace,
+            created_at=datetime.fromisoformat(created.decode()) if created else updated_at, updated_at=updated_at,
+        )
+
+    async def _read_namespaces(self, ops: List[Op], namespaces: Dict[int, List[str]], results: List[Result]):
+        """Second round-trip: fetch the hashes searches cover and check which listed namespaces are non-empty."""
+        searched: Set[str] = set()
+        listed: Set[str] = set()
+        for i, names in namespaces.items():
+            (searched if isinstance(ops[i], SearchOp) else listed).update(names)
+        searched_names, listed_names = sorted(searched), sorted(listed)
+        replies = await self.client.pipeline(
+            [("HGETALL", self._hash_key(name)) for name in searched_names]
+            + [("HLEN", self._hash_key(name)) for name in listed_names]
+        )
+        hashes = dict(zip(searched_names, replies[:len(searched_names)]))
+        non_empty = {name for name, size in zip(listed_names, replies[len(searched_names):]) if size}
+
+        for i, names in namespaces.items():
+            op = ops[i]
+            if isinstance(op, ListNamespacesOp):
+                results[i] = match_namespaces((decode_namespace(name) for name in names if name in non_empty), op)
+                continue
+            items = [item for name in names for item in self._hash_items(name, hashes[name])]
+            items = [item for item in items if matches_filter(item.value, op.filter)]
+            # Creation order, like the other stores' insertion order
+            items.sort(key=lambda item: (item.created_at, item.namespace, item.key))
+            results[i] = items[op.offset:op.offset + op.limit]
+
+    def _hash_items(self, name: str, flat: List[bytes]) -> List[SearchItem]:
+        fields = dict(zip(flat[::2], flat[1::2]))
+        namespace = decode_namespace(name)
+        return [
+            self._item(namespace, field[2:].decode(), data, fields.get(b"c:" + field[2:]), SearchItem)
+            for field, data in fields.items() if field.startswith(b"v:")
+        ]
@@ -0,0 +1,494 @@
+"""Persistent, compact LangGraph checkpointer on SQLite.
+
+`MemorySaver` keeps every checkpoint of every thread in process memory.
+`SqliteSaver` writes them to a WAL-mode SQLite file instead and keeps them
+small:
+
+- Values are serialized with LangGraph's msgpack serializer and, above a
+  size threshold, compressed with zstd (or zlib when the optional
+  `zstandard` package is not installed).
+- Only channels whose version changed are written at each checkpoint, and a
+  list channel that merely grew (`messages` after a turn) is stored as the
+  appended tail plus a reference to its previous version. Every
+  `snapshot_every` versions a channel is stored in full again, which bounds
+  the chain a read has to follow.
+- Reads are lazy: resuming a thread loads its latest checkpoint row and just
+  the channel versions it references, never the thread's history.
+"""
+import asyncio
+import random
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id, get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from utils.logging_config import logger
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data BLOB NOT NULL,
+    base_version TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# Follows a blob's base_version references back to the nearest full snapshot
+_CHAIN_SQL = """
+WITH RECURSIVE chain(version, type, data, base_version, depth) AS (
+    SELECT version, type, data, base_version, 0 FROM blobs
+    WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?
+    UNION ALL
+    SELECT b.version, b.type, b.data, b.base_version, chain.depth + 1 FROM blobs b JOIN chain
+    ON b.thread_id = ? AND b.checkpoint_ns = ? AND b.channel = ? AND b.version = chain.base_version
+)
+SELECT type, data, base_version FROM chain ORDER BY depth DESC
+"""
+
+
+class CompressedSerializer(SerializerProtocol):
+    """Wraps a serializer and compresses payloads of at least `min_size` bytes.
+
+    The codec is appended to the type tag ("msgpack+zstd"), so values written
+    with compression off, or below the threshold, still load.
+    """
+
+    def __init__(self, serde: Optional[SerializerProtocol] = None, codec: str = "zstd", min_size: int = 256):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_size = min_size
+        if codec == "zstd" and zstandard is None:
+            logger.info("zstandard is not installed; compressing checkpoints with zlib")
+            codec = "zlib"
+        if codec not in ("zstd", "zlib", "none"):
+            raise ValueError(f"Unknown checkpoint compression: {codec}")
+        self.codec = codec
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if self.codec == "none" or len(data) < self.min_size:
+            return type_, data
+        if self.codec == "zstd":
+            compressed = zstandard.ZstdCompressor(level=3).compress(data)
+        else:
+            compressed = zlib.compress(data, 6)
+        if len(compressed) >= len(data):
+            return type_, data
+        return f"{type_}+{self.codec}", compressed
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if "+" in type_:
+            type_, codec = type_.rsplit("+", 1)
+            if codec == "zstd":
+                if zstandard is None:
+                    raise RuntimeError("Checkpoint was compressed with zstd; install the zstandard package")
+                payload = zstandard.ZstdDecompressor().decompress(payload)
+            elif codec == "zlib":
+                payload = zlib.decompress(payload)
+            else:
+                raise ValueError(f"Unknown checkpoint compression: {codec}")
+        return self.serde.loads_typed((type_, payload))
+
+
+class SqliteSaver(BaseCheckpointSaver[str]):
+    """SQLite (WAL) checkpointer with delta-encoded channels and lazy loading.
+
+    One connection is shared behind a lock; async methods run the same work
+    in a thread so the event loop never blocks on disk I/O.
+    """
+
+    def __init__(
+        self,
+        path: str = "asis_checkpoints.db",
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        compression: str = "zstd",
+        snapshot_every: int = 20,
+        max_cached_channels: int = 4096,
+    ):
+        super().__init__(serde=serde or CompressedSerializer(codec=compression))
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.max_cached_channels = max_cached_channels
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # (thread_id, checkpoint_ns, channel) -> (version, list value, delta depth) of the last list written,
+        # so the next version of the channel can be stored as a tail
+        self._last_lists: "OrderedDict[Tuple[str, str, str], Tuple[str, list, int]]" = OrderedDict()
+
+    def close(self):
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as MemorySaver: zero-padded counter, so versions sort as text
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def _blob_row(self, key: Tuple[str, str, str], version: str, value: Any) -> Tuple[str, bytes, Optional[str]]:
+        """Serialize one channel version, as a tail of the previous version when the list only grew."""
+        last = self._last_lists.pop(key, None)
+        if not isinstance(value, list):
+            return (*self.serde.dumps_typed(value), None)
+        base_version, depth, payload = None, 0, value
+        if last is not None:
+            last_version, last_value, last_depth = last
+            if (last_depth + 1 < self.snapshot_every and len(value) >= len(last_value)
+                    and all(a is b or a == b for a, b in zip(value, last_value))):
+                base_version, depth, payload = last_version, last_depth + 1, value[len(last_value):]
+        self._last_lists[key] = (version, list(value), depth)
+        if len(self._last_lists) > self.max_cached_channels:
+            self._last_lists.popitem(last=False)
+        return (*self.serde.dumps_typed(payload), base_version)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+        with self._lock:
+            blobs = []
+            for channel, version in new_versions.items():
+                if channel in values:
+                    type_, data, base_version = self._blob_row((thread_id, checkpoint_ns, channel), version, values[channel])
+                else:
+                    type_, data, base_version = "empty", b"", None
+                blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, data, base_version))
+            checkpoint_type, checkpoint_data = self.serde.dumps_typed(c)
+            metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?)", blobs)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     checkpoint_type, checkpoint_data, metadata_type, metadata_data),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                # The cached bases may not have been written
+                self._last_lists.clear()
+                raise
+            self._conn.execute("COMMIT")
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, data, task_path))
+        with self._lock:
+            # Special writes (errors, interrupts) replace earlier ones; regular writes keep the first attempt's
+            self._conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   [row for row in rows if row[4] < 0])
+            self._conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   [row for row in rows if row[4] >= 0])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("COMMIT")
+            for key in [key for key in self._last_lists if key[0] == thread_id]:
+                del self._last_lists[key]
+
+    def prune_thread(self, thread_id: str, keep_last: int) -> Tuple[int, int]:
+        """Drop all but the newest `keep_last` checkpoints of a thread (per namespace).
+
+        Channel versions still referenced by a kept checkpoint, including the
+        earlier versions their tails build on, are kept. Returns the number of
+        checkpoints removed and the bytes reclaimed.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, type, checkpoint, LENGTH(checkpoint) + LENGTH(metadata) "
+                "FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_ns, checkpoint_id DESC",
+                (thread_id,),
+            ).fetchall()
+            kept_per_ns: Dict[str, int] = {}
+            dropped, referenced, freed = [], set(), 0
+            for checkpoint_ns, checkpoint_id, type_, data, size in rows:
+                kept_per_ns[checkpoint_ns] = kept_per_ns.get(checkpoint_ns, 0) + 1
+                if kept_per_ns[checkpoint_ns] > keep_last:
+                    dropped.append((checkpoint_ns, checkpoint_id))
+                    freed += size
+                    continue
+                versions = self.serde.loads_typed((type_, data))["channel_versions"]
+                referenced.update((checkpoint_ns, channel, str(version)) for channel, version in versions.items())
+            if not dropped:
+                return 0, 0
+
+            blobs = {
+                (checkpoint_ns, channel, version): (base_version, size)
+                for checkpoint_ns, channel, version, base_version, size in self._conn.execute(
+                    "SELECT checkpoint_ns, channel, version, base_version, LENGTH(data) FROM blobs WHERE thread_id = ?",
+                    (thread_id,),
+                )
+            }
+            # Keep the versions that referenced tails are built on
+            pending = list(referenced)
+            while pending:
+                checkpoint_ns, channel, version = pending.pop()
+                base_version = blobs.get((checkpoint_ns, channel, version), (None, 0))[0]
+                if base_version is not None and (checkpoint_ns, channel, base_version) not in referenced:
+                    referenced.add((checkpoint_ns, channel, base_version))
+                    pending.append((checkpoint_ns, channel, base_version))
+            unreferenced = [key for key in blobs if key not in referenced]
+            freed += sum(blobs[key][1] for key in unreferenced)
+            freed += sum(
+                self._conn.execute(
+                    "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM writes "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, *key),
+                ).fetchone()[0]
+                for key in dropped
+            )
+
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, *key) for key in dropped],
+            )
+            self._conn.executemany(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, *key) for key in dropped],
+            )
+            self._conn.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                [(thread_id, *key) for key in unreferenced],
+            )
+            self._conn.execute("COMMIT")
+            return len(dropped), freed
+
+    def thread_usage(self) -> Dict[str, Tuple[str, int, int]]:
+        """Per thread: latest checkpoint ID, number of checkpoints and stored bytes."""
+        with self._lock:
+            usage = {
+                thread_id: [latest, count, size]
+                for thread_id, latest, count, size in self._conn.execute(
+                    "SELECT thread_id, MAX(checkpoint_id), COUNT(*), SUM(LENGTH(checkpoint) + LENGTH(metadata)) "
+                    "FROM checkpoints GROUP BY thread_id"
+                )
+            }
+            for table in ("blobs", "writes"):
+                for thread_id, size in self._conn.execute(
+                    f"SELECT thread_id, SUM(LENGTH(data)) FROM {table} GROUP BY thread_id"
+                ):
+                    if thread_id in usage:
+                        usage[thread_id][2] += size
+        return {thread_id: tuple(values) for thread_id, values in usage.items()}
+
+    def _load_channel(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> Tuple[bool, Any]:
+        rows = self._conn.execute(
+            _CHAIN_SQL, (thread_id, checkpoint_ns, channel, version, thread_id, checkpoint_ns, channel),
+        ).fetchall()
+        if not rows or rows[-1][0] == "empty":
+            return False, None
+        if rows[0][2] is not None:
+            # The chain is broken (its snapshot was deleted); treat the channel as unset
+            logger.warning(f"Checkpoint blob chain for {thread_id}/{channel} is incomplete")
+            return False, None
+        value = self.serde.loads_typed((rows[0][0], rows[0][1]))
+        for type_, data, _ in rows[1:]:
+            value = value + self.serde.loads_typed((type_, data))
+        return True, value
+
+    def _tuple(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((type_, data))
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            found, value = self._load_channel(thread_id, checkpoint_ns, channel, str(version))
+            if found:
+                channel_values[channel] = value
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, data FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, d))) for task_id, channel, t, d in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = "SELECT thread_id, checkpoint_ns, checkpoint_id, metadata_type, metadata FROM checkpoints"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            candidates = self._conn.execute(sql, params).fetchall()
+        for thread_id, checkpoint_ns, checkpoint_id, metadata_type, metadata in candidates:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                values = self.serde.loads_typed((metadata_type, metadata))
+                if not all(values.get(key) == value for key, value in filter.items()):
+                    continue
+            # Channel values are only loaded for the checkpoints actually consumed
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+                if row is None:
+                    continue
+                item = self._tuple(row)
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def stored_bytes(self) -> int:
+        """Total size of the serialized checkpoints, channel values and pending writes."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT (SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints)"
+                " + (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs)"
+                " + (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM writes)"
+            ).fetchone()[0]
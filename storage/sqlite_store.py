@@ -0,0 +1,244 @@
+"""Persistent `BaseStore` on SQLite.
+
+Profiles, todos and instructions written through `SqliteStore` survive
+restarts and can be shared by every worker process on the host. The database
+runs in WAL mode so readers never block the writer. Items live in one table
+keyed by (namespace prefix, key); namespaces are stored as their labels
+joined with ".", which LangGraph forbids inside a label, so a namespace
+prefix search is a range scan on the primary key. Because `batch` does not
+go through `BaseStore.put`'s validation, `encode_namespace` rejects such
+labels itself: ("todo", "john.doe") would otherwise be stored as
+("todo", "john", "doe") and show up in user "john"'s searches. Values are stored as JSON
+and simple `search` filters are evaluated by SQLite with `json_extract`.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langgraph.store.base import (
+    BaseStore, GetOp, InvalidNamespaceError, Item, ListNamespacesOp, Op, PutOp, Result, SearchItem, SearchOp,
+)
+
+from storage.versioning import check_versions, is_versioned
+
+NAMESPACE_SEPARATOR = "."
+# The character after NAMESPACE_SEPARATOR: "a.b." <= child < "a.b/"
+_PREFIX_END = chr(ord(NAMESPACE_SEPARATOR) + 1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS store (
+    prefix TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (prefix, key)
+);
+"""
+
+_SQL_OPERATORS = {"$eq": "IS", "$ne": "IS NOT", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def validate_namespace(namespace: Tuple[str, ...]):
+    """Raise `InvalidNamespaceError` for labels that would not decode back to themselves."""
+    for label in namespace:
+        if not isinstance(label, str) or not label or NAMESPACE_SEPARATOR in label:
+            raise InvalidNamespaceError(
+                f"Invalid namespace label {label!r} in {namespace}: labels must be non-empty strings "
+                f"without {NAMESPACE_SEPARATOR!r}"
+            )
+
+
+def encode_namespace(namespace: Tuple[str, ...]) -> str:
+    """Join `namespace` with the separator, rejecting labels that would not decode back to themselves."""
+    validate_namespace(namespace)
+    return NAMESPACE_SEPARATOR.join(namespace)
+
+
+def decode_namespace(prefix: str) -> Tuple[str, ...]:
+    return tuple(prefix.split(NAMESPACE_SEPARATOR)) if prefix else ()
+
+
+def _compare(item_value: Any, filter_value: Any) -> bool:
+    """Python fallback for filters SQLite cannot evaluate (same semantics as InMemoryStore)."""
+    if isinstance(filter_value, dict):
+        if any(k.startswith("$") for k in filter_value):
+            return all(_apply_operator(item_value, op, operand) for op, operand in filter_value.items())
+        return isinstance(item_value, dict) and all(_compare(item_value.get(k), v) for k, v in filter_value.items())
+    if isinstance(filter_value, (list, tuple)):
+        return (isinstance(item_value, (list, tuple)) and len(item_value) == len(filter_value)
+                and all(_compare(i, f) for i, f in zip(item_value, filter_value)))
+    return item_value == filter_value
+
+
+def _apply_operator(value: Any, operator: str, operand: Any) -> bool:
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if value is None:
+        return False
+    comparisons = {"$gt": float.__gt__, "$gte": float.__ge__, "$lt": float.__lt__, "$lte": float.__le__}
+    if operator not in comparisons:
+        raise ValueError(f"Unsupported operator: {operator}")
+    return comparisons[operator](float(value), float(operand))
+
+
+def matches_filter(value: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Whether an item value satisfies a `search` filter, evaluated in Python."""
+    return all(_compare(value.get(field), expected) for field, expected in (filter or {}).items())
+
+
+def match_namespaces(namespaces: Iterable[Tuple[str, ...]], op: ListNamespacesOp) -> List[Tuple[str, ...]]:
+    """Apply a `list_namespaces` operation's conditions, depth, offset and limit."""
+    namespaces = list(namespaces)
+    for condition in op.match_conditions or ():
+        path = tuple(condition.path)
+        namespaces = [ns for ns in namespaces if len(ns) >= len(path) and all(
+            p == "*" or p == n
+            for n, p in zip(ns if condition.match_type == "prefix" else ns[-len(path):], path)
+        )]
+    if op.max_depth is not None:
+        namespaces = [ns[:op.max_depth] for ns in namespaces]
+    namespaces = sorted(set(namespaces))
+    return namespaces[op.offset:op.offset + op.limit]
+
+
+def _filter_sql(filter: Optional[Dict[str, Any]]) -> Tuple[List[str], List[Any], Dict[str, Any]]:
+    """Split a search filter into SQL conditions with parameters and a residual Python filter."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    residual: Dict[str, Any] = {}
+    for field, expected in (filter or {}).items():
+        path = "$." + json.dumps(field)
+        if isinstance(expected, _SCALARS):
+            clauses.append("json_extract(value, ?) IS ?")
+            params.extend([path, expected])
+        elif (isinstance(expected, dict) and expected
+              and all(op in _SQL_OPERATORS and isinstance(v, _SCALARS) for op, v in expected.items())):
+            for op, operand in expected.items():
+                clauses.append(f"json_extract(value, ?) {_SQL_OPERATORS[op]} ?")
+                params.extend([path, operand])
+        else:
+            residual[field] = expected
+    return clauses, params, residual
+
+
+class SqliteStore(BaseStore):
+    """SQLite (WAL) implementation of LangGraph's `BaseStore`.
+
+    One connection is shared behind a lock; every `batch` runs in a single
+    transaction. `abatch` runs the same work in a thread so the event loop
+    never blocks on disk I/O. Semantic search (`query=`) is not supported.
+    A batch with versioned puts takes the write lock up front (BEGIN
+    IMMEDIATE), so its version checks and writes see no other writer.
+    """
+
+    def __init__(self, path: str = "asis_store.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
+
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        versioned = [op for op in ops if isinstance(op, PutOp) and is_versioned(op)]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE" if versioned else "BEGIN")
+            try:
+                # Versions are checked against the state before the batch, as in the other stores
+                check_versions(versioned, self._stored_value)
+                results = [self._run(op) for op in ops]
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return results
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        return await asyncio.to_thread(self.batch, list(ops))
+
+    def _run(self, op: Op) -> Result:
+        if isinstance(op, GetOp):
+            return self._get(op)
+        if isinstance(op, SearchOp):
+            return self._search(op)
+        if isinstance(op, PutOp):
+            return self._put(op)
+        if isinstance(op, ListNamespacesOp):
+            return self._list_namespaces(op)
+        raise ValueError(f"Unknown operation type: {type(op)}")
+
+    @staticmethod
+    def _item(row: tuple, item_type=Item):
+        prefix, key, value, created_at, updated_at = row
+        return item_type(
+            value=json.loads(value), key=key, namespace=decode_namespace(prefix),
+            created_at=datetime.fromisoformat(created_at), updated_at=datetime.fromisoformat(updated_at),
+        )
+
+    def _get(self, op: GetOp) -> Optional[Item]:
+        row = self._conn.execute(
+            "SELECT prefix, key, value, created_at, updated_at FROM store WHERE prefix = ? AND key = ?",
+            (encode_namespace(op.namespace), op.key),
+        ).fetchone()
+        return self._item(row) if row else None
+
+    def _stored_value(self, namespace: Tuple[str, ...], key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT value FROM store WHERE prefix = ? AND key = ?", (encode_namespace(namespace), key),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, op: PutOp) -> None:
+        prefix = encode_namespace(op.namespace)
+        if op.value is None:
+            self._conn.execute("DELETE FROM store WHERE prefix = ? AND key = ?", (prefix, op.key))
+            return None
+        now = datetime.now(timezone.utc).isoformat()
+        # Upsert keeps the rowid (and so the insertion order searches return) and created_at
+        self._conn.execute(
+            "INSERT INTO store (prefix, key, value, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (prefix, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            (prefix, op.key, json.dumps(op.value), now, now),
+        )
+        return None
+
+    def _search(self, op: SearchOp) -> List[SearchItem]:
+        clauses, params = [], []
+        if op.namespace_prefix:
+            prefix = encode_namespace(op.namespace_prefix)
+            clauses.append("(prefix = ? OR (prefix >= ? AND prefix < ?))")
+            params.extend([prefix, prefix + NAMESPACE_SEPARATOR, prefix + _PREFIX_END])
+        filter_clauses, filter_params, residual = _filter_sql(op.filter)
+        clauses += filter_clauses
+        params += filter_params
+
+        sql = "SELECT prefix, key, value, created_at, updated_at FROM store"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY rowid"
+        if not residual:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([op.limit, op.offset])
+
+        items = [self._item(row, SearchItem) for row in self._conn.execute(sql, params)]
+        if residual:
+            items = [item for item in items if matches_filter(item.value, residual)]
+            items = items[op.offset:op.offset + op.limit]
+        return items
+
+    def _list_namespaces(self, op: ListNamespacesOp) -> List[Tuple[str, ...]]:
+        namespaces = [decode_namespace(row[0]) for row in self._conn.execute("SELECT DISTINCT prefix FROM store")]
+        return match_namespaces(namespaces, op)
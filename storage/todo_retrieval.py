@@ -0,0 +1,423 @@
+"""Offline relevance ranking for ToDo memories.
+
+Power users can have hundreds of todos; putting all of them into the
+task_asis prompt makes every turn slow and expensive. `TodoRetrievalIndex`
+keeps a hashed bag-of-words vector per todo so a turn can pick the items
+relevant to the current message, plus every open item that is in progress
+or close to its deadline, under a fixed prompt budget. `IndexedStore` keeps
+the index in sync with every `store.put` into a todo namespace.
+
+A namespace is hydrated from the store on first use. Writes made by other
+processes sharing the store (SQLite, Redis) never reach this process's
+index, so `IndexedStore(max_age=...)` re-hydrates namespaces loaded longer
+ago than that. A load is discarded if a write to the namespace was indexed
+while the store was being read, since the read may predate it.
+
+The index also keeps each namespace's todos in sorted order by last update
+and by deadline, overall and per status, so `query` can answer "open items
+due before Friday, 20 at a time" with a bisect and a short walk instead of
+scanning every todo the user has.
+"""
+import base64
+import bisect
+import heapq
+import json
+import math
+import re
+import asyncio
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langgraph.store.base import BaseStore, Item, Op, PutOp, Result
+
+from storage.versioning import VersionConflictError
+from utils.helpers import estimate_tokens
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+HASH_DIMENSIONS = 1 << 18
+OPEN_STATUSES = ("not started", "in progress")
+
+# Upper bound on todos loaded from the store when an index namespace is cold
+HYDRATE_LIMIT = 10_000
+
+# Loads retried when writes keep landing while a namespace is read
+HYDRATE_ATTEMPTS = 3
+
+
+def hash_vector(text: str) -> Dict[int, float]:
+    """L2-normalised hashed term-frequency vector (unigrams and bigrams) for `text`."""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector: Dict[int, float] = {}
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        bucket = h % HASH_DIMENSIONS
+        # Signed hashing keeps collisions from systematically inflating scores
+        vector[bucket] = vector.get(bucket, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two normalised sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def todo_text(value: Dict[str, Any]) -> str:
+    """The searchable text of a todo document."""
+    return " ".join([str(value.get("task") or "")] + [str(s) for s in value.get("solutions") or []])
+
+
+def todo_status(value: Dict[str, Any]) -> str:
+    """The status of a todo document; todos without one have not been started."""
+    return value.get("status") or "not started"
+
+
+def _deadline(value: Dict[str, Any]) -> Optional[datetime]:
+    deadline = value.get("deadline")
+    if not deadline:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(deadline))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def is_pinned(value: Dict[str, Any], now: datetime, deadline_horizon: timedelta) -> bool:
+    """Open todos that are in progress, overdue or due within the horizon always go into the prompt."""
+    if todo_status(value) not in OPEN_STATUSES:
+        return False
+    if value.get("status") == "in progress":
+        return True
+    deadline = _deadline(value)
+    return deadline is not None and deadline <= now + deadline_horizon
+
+
+def _utc(moment: datetime) -> datetime:
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def encode_cursor(order: str, position: Tuple[float, str]) -> str:
+    """Opaque page cursor: the sort position of the last todo returned."""
+    return base64.urlsafe_b64encode(json.dumps([order, *position]).encode()).decode()
+
+
+def decode_cursor(cursor: str, order: str) -> Tuple[float, str]:
+    """Inverse of `encode_cursor`; raises ValueError for a malformed cursor or one from another ordering."""
+    try:
+        cursor_order, sort_value, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position = (float(sort_value), str(key))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if cursor_order != order:
+        raise ValueError("Cursor was issued for a query with a different ordering")
+    return position
+
+
+class _SortedKeys:
+    """Todo keys kept sorted by (sort value, key); inserts and deletes are a bisect plus a memmove."""
+
+    def __init__(self):
+        self.entries: List[Tuple[float, str]] = []
+
+    def add(self, entry: Tuple[float, str]):
+        bisect.insort(self.entries, entry)
+
+    def remove(self, entry: Tuple[float, str]):
+        i = bisect.bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def after(self, position: Optional[Tuple[float, str]]) -> Iterator[Tuple[float, str]]:
+        start = 0 if position is None else bisect.bisect_right(self.entries, position)
+        return (self.entries[i] for i in range(start, len(self.entries)))
+
+
+class _TodoOrders:
+    """Secondary indexes of one namespace: by last update (newest first) and by deadline, per status."""
+
+    ALL = ""
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[str, Tuple[float, str], Optional[Tuple[float, str]]]] = {}
+        self.updated: Dict[str, _SortedKeys] = {}
+        self.deadline: Dict[str, _SortedKeys] = {}
+
+    def add(self, item: Item):
+        self.remove(item.key)
+        status = todo_status(item.value)
+        # Negated so that ascending order is newest first
+        updated = (-_utc(item.updated_at).timestamp(), item.key)
+        deadline = _deadline(item.value)
+        due = (deadline.timestamp(), item.key) if deadline else None
+        self.entries[item.key] = (status, updated, due)
+        for bucket in (self.ALL, status):
+            self.updated.setdefault(bucket, _SortedKeys()).add(updated)
+            if due:
+                self.deadline.setdefault(bucket, _SortedKeys()).add(due)
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        status, updated, due = entry
+        for bucket in (self.ALL, status):
+            self.updated[bucket].remove(updated)
+            if due:
+                self.deadline[bucket].remove(due)
+
+
+class TodoRetrievalIndex:
+    """In-process vector index over todo items, one collection per namespace."""
+
+    def __init__(self):
+        self._docs: Dict[Tuple[str, ...], Dict[str, Tuple[Item, Dict[int, float]]]] = {}
+        self._orders: Dict[Tuple[str, ...], _TodoOrders] = {}
+        # Namespace -> monotonic time of its last load
+        self._loaded: Dict[Tuple[str, ...], float] = {}
+        # Namespace -> number of writes indexed, to detect writes racing a load
+        self._generations: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, namespace: Tuple[str, ...], max_age: Optional[float] = None) -> bool:
+        """Whether `namespace` mirrors the store: hydrated, and less than `max_age` seconds ago if given."""
+        loaded = self._loaded.get(tuple(namespace))
+        return loaded is not None and (max_age is None or time.monotonic() - loaded < max_age)
+
+    def generation(self, namespace: Tuple[str, ...]) -> int:
+        """Writes indexed into `namespace` so far; pass it to `load` to detect writes racing the read."""
+        return self._generations.get(tuple(namespace), 0)
+
+    def load(self, namespace: Tuple[str, ...], items: Iterable[Item], generation: Optional[int] = None) -> bool:
+        """Replace the contents of `namespace` with `items` from the store.
+
+        With `generation` (taken before reading `items`), the load is dropped
+        and False returned if a write was indexed in the meantime.
+        """
+        docs = {item.key: (item, hash_vector(todo_text(item.value))) for item in items}
+        orders = _TodoOrders()
+        for item, _ in docs.values():
+            orders.add(item)
+        with self._lock:
+            if generation is not None and self._generations.get(tuple(namespace), 0) != generation:
+                return False
+            self._docs[tuple(namespace)] = docs
+            self._orders[tuple(namespace)] = orders
+            self._loaded[tuple(namespace)] = time.monotonic()
+        return True
+
+    def upsert(self, namespace: Tuple[str, ...], key: str, value: Dict[str, Any]):
+        """Index a todo written to the store."""
+        namespace = tuple(namespace)
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            docs = self._docs.setdefault(namespace, {})
+            created_at = docs[key][0].created_at if key in docs else now
+            item = Item(value=value, key=key, namespace=namespace, created_at=created_at, updated_at=now)
+            docs[key] = (item, hash_vector(todo_text(value)))
+            self._orders.setdefault(namespace, _TodoOrders()).add(item)
+
+    def delete(self, namespace: Tuple[str, ...], key: str):
+        """Drop a todo deleted from the store."""
+        with self._lock:
+            self._generations[tuple(namespace)] = self._generations.get(tuple(namespace), 0) + 1
+            self._docs.get(tuple(namespace), {}).pop(key, None)
+            if tuple(namespace) in self._orders:
+                self._orders[tuple(namespace)].remove(key)
+
+    def forget(self, namespace: Tuple[str, ...]):
+        """Drop `namespace` so its next use hydrates it from the store again."""
+        with self._lock:
+            self._docs.pop(tuple(namespace), None)
+            self._orders.pop(tuple(namespace), None)
+            self._loaded.pop(tuple(namespace), None)
+
+    def size(self, namespace: Tuple[str, ...]) -> int:
+        """Number of indexed todos in `namespace`."""
+        return len(self._docs.get(tuple(namespace), {}))
+
+    def select(
+        self,
+        namespace: Tuple[str, ...],
+        query: str,
+        top_k: int = 10,
+        max_tokens: int = 800,
+        deadline_horizon: timedelta = timedelta(days=3),
+        now: Optional[datetime] = None,
+        statuses: Optional[Sequence[str]] = None,
+    ) -> List[Item]:
+        """Pick the todos to show for a message.
+
+        Pinned items (see `is_pinned`) come first, soonest deadline first,
+        followed by the `top_k` items most similar to `query`. The result is
+        cut off once it would exceed `max_tokens`. With `statuses`, only
+        todos in one of those statuses are considered.
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            namespace_docs = self._docs.get(tuple(namespace), {})
+            if statuses is None:
+                docs = list(namespace_docs.values())
+            else:
+                orders = self._orders.get(tuple(namespace), _TodoOrders())
+                docs = [
+                    namespace_docs[key] for status in set(statuses)
+                    for _, key in orders.updated.get(status, _SortedKeys()).entries
+                ]
+
+        pinned, rest = [], []
+        for item, vector in docs:
+            (pinned if is_pinned(item.value, now, deadline_horizon) else rest).append((item, vector))
+        far_future = datetime.max.replace(tzinfo=timezone.utc)
+        pinned.sort(key=lambda doc: _deadline(doc[0].value) or far_future)
+
+        query_vector = hash_vector(query)
+        rest.sort(key=lambda doc: cosine(query_vector, doc[1]), reverse=True)
+
+        selected, used = [], 0
+        for item, _ in pinned + rest[:top_k]:
+            cost = estimate_tokens(item.value)
+            if selected and used + cost > max_tokens:
+                break
+            selected.append(item)
+            used += cost
+        return selected
+
+    def query(
+        self,
+        namespace: Tuple[str, ...],
+        statuses: Optional[Sequence[str]] = None,
+        due_before: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Item], Optional[str]]:
+        """One page of todos, optionally only those in `statuses` and/or due before `due_before`.
+
+        Pages are ordered newest update first or, with `due_before`, soonest
+        deadline first (todos without a deadline are then left out). Returns
+        the page and a cursor for the next one, or None on the last page.
+        The cursor is a sort position, so todos written between pages never
+        make a page skip or repeat an item that did not change. Raises
+        ValueError for an invalid cursor.
+        """
+        order = "deadline" if due_before is not None else "updated"
+        position = decode_cursor(cursor, order) if cursor else None
+        end = _utc(due_before).timestamp() if due_before is not None else None
+        with self._lock:
+            orders = self._orders.get(tuple(namespace))
+            if orders is None:
+                return [], None
+            by_order = orders.deadline if order == "deadline" else orders.updated
+            buckets = [by_order.get(status, _SortedKeys()) for status in sorted(set(statuses))] \
+                if statuses is not None else [by_order.get(_TodoOrders.ALL, _SortedKeys())]
+            page: List[Tuple[float, str]] = []
+            # Each bucket is already sorted, so merging them costs O(limit) per bucket, not O(todos)
+            for entry in heapq.merge(*(bucket.after(position) for bucket in buckets)):
+                if end is not None and entry[0] >= end:
+                    break
+                page.append(entry)
+                if len(page) > limit:
+                    break
+            docs = self._docs[tuple(namespace)]
+            items = [docs[key][0] for _, key in page[:limit]]
+        next_cursor = encode_cursor(order, page[limit - 1]) if len(page) > limit else None
+        return items, next_cursor
+
+
+class IndexedStore(BaseStore):
+    """BaseStore decorator that mirrors every todo namespace write into a TodoRetrievalIndex.
+
+    `max_age` (seconds) bounds how stale a namespace may get when other
+    processes write to the same store; None trusts the index indefinitely,
+    which is right when this process is the only writer.
+    """
+
+    def __init__(self, store: BaseStore, todo_index: Optional[TodoRetrievalIndex] = None,
+                 max_age: Optional[float] = None):
+        self.store = store
+        self.todo_index = todo_index or TodoRetrievalIndex()
+        self.max_age = max_age
+        # Held from the freshness check to the load, so a namespace is read once per expiry
+        self._hydrate_lock = threading.Lock()
+
+    def _observe(self, ops: List[Op]):
+        for op in ops:
+            if isinstance(op, PutOp) and op.namespace and op.namespace[0] == "todo":
+                if op.value is None:
+                    self.todo_index.delete(op.namespace, op.key)
+                else:
+                    self.todo_index.upsert(op.namespace, op.key, op.value)
+
+    def _conflicted(self, error: VersionConflictError):
+        # Another process wrote these todos, so this index has missed writes
+        for namespace in {conflict.namespace for conflict in error.conflicts}:
+            if namespace and namespace[0] == "todo":
+                self.todo_index.forget(namespace)
+
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        try:
+            results = self.store.batch(ops)
+        except VersionConflictError as e:
+            self._conflicted(e)
+            raise
+        self._observe(ops)
+        return results
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        try:
+            results = await self.store.abatch(ops)
+        except VersionConflictError as e:
+            self._conflicted(e)
+            raise
+        self._observe(ops)
+        return results
+
+    def _fresh(self, namespace: Tuple[str, ...]) -> bool:
+        return self.todo_index.is_loaded(namespace, self.max_age)
+
+    def _hydrate(self, namespace: Tuple[str, ...]):
+        if self._fresh(namespace):
+            return
+        with self._hydrate_lock:
+            # If writes race every attempt the namespace stays unloaded, and the next use tries again
+            for _ in range(HYDRATE_ATTEMPTS):
+                if self._fresh(namespace):
+                    return
+                generation = self.todo_index.generation(namespace)
+                items = self.store.search(namespace, limit=HYDRATE_LIMIT)
+                if self.todo_index.load(namespace, items, generation):
+                    return
+
+    async def _ahydrate(self, namespace: Tuple[str, ...]):
+        # The load runs in a thread, so holding the lock never blocks the event loop
+        if not self._fresh(namespace):
+            await asyncio.to_thread(self._hydrate, namespace)
+
+    def relevant_todos(self, namespace: Tuple[str, ...], query: str, **options) -> List[Item]:
+        """Select the todos to show for `query`, hydrating the namespace from the store if needed."""
+        self._hydrate(namespace)
+        return self.todo_index.select(namespace, query, **options)
+
+    async def arelevant_todos(self, namespace: Tuple[str, ...], query: str, **options) -> List[Item]:
+        """Async variant of `relevant_todos`."""
+        await self._ahydrate(namespace)
+        return self.todo_index.select(namespace, query, **options)
+
+    def query_todos(self, namespace: Tuple[str, ...], **options) -> Tuple[List[Item], Optional[str]]:
+        """One page of todos from the secondary indexes (see `TodoRetrievalIndex.query`)."""
+        self._hydrate(namespace)
+        return self.todo_index.query(namespace, **options)
+
+    async def aquery_todos(self, namespace: Tuple[str, ...], **options) -> Tuple[List[Item], Optional[str]]:
+        """Async variant of `query_todos`."""
+        await self._ahydrate(namespace)
+        return self.todo_index.query(namespace, **options)
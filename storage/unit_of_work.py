@@ -0,0 +1,318 @@
+"""Batched, optionally write-behind persistence of memory updates.
+
+An update node used to call `store.put` once per extracted document, which
+is one store round-trip per document on the user's critical path.
+`UnitOfWork` collects a node's writes and `StoreWriter` commits them as a
+single `store.batch` (one transaction on `SqliteStore`), so a node's
+documents are written all together or not at all.
+
+With `write_behind` enabled, async commits are handed to a background queue
+and the node returns right away. Flushes for one user run in commit order
+and are retried with backoff. Reads of a user's memories wait for that
+user's pending flushes (`StoreWriter.wait`), so the next turn always sees
+the previous turn's updates. Sync graph nodes commit inline and, on a
+worker thread, block on flushes queued by async turns (`wait_blocking`);
+run on the event loop's own thread they raise instead of deadlocking. A flush that still fails after its retries is
+logged and counted as lost writes.
+
+Writes are compare-and-set against the document versions the node read
+(see `storage.versioning`), so concurrent writers need no lock. When a
+commit hits a version conflict, each conflicting document is re-read and
+merged field by field with the stored one, and the batch is retried. If
+both writers changed the same field, `VersionConflictError` reaches the
+node, which extracts again from the fresh documents (a background flush
+cannot, and counts the writes as lost).
+
+Writes go to `store.batch` as raw `PutOp`s, which skips the namespace check
+`store.put` makes, so `UnitOfWork` and `StoreWriter.aput` check namespaces
+themselves when a write is made, with the same label rules the SQLite and
+Redis backends enforce.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore, GetOp, Item, PutOp
+
+from config import app_config
+from storage.sqlite_store import validate_namespace
+from storage.versioning import (
+    VERSION_FIELD, VersionConflictError, merge_documents, version_of, with_version, without_version,
+)
+from utils.logging_config import logger
+from utils.task_queue import KeyedTaskQueue
+
+Resolve = Callable[[VersionConflictError], List[PutOp]]
+AsyncResolve = Callable[[VersionConflictError], Awaitable[List[PutOp]]]
+
+
+class StoreWriter:
+    """Commits units of work inline or write-behind and keeps flush statistics."""
+
+    def __init__(self, write_behind: bool = False, max_attempts: int = 3, retry_delay: float = 0.1,
+                 concurrency: int = 4, max_conflict_attempts: int = 3):
+        self.write_behind = write_behind
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_conflict_attempts = max_conflict_attempts
+        self._queue = KeyedTaskQueue(max_concurrency=concurrency)
+        self.batches = 0
+        self.ops = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.lost_writes = 0
+        self.conflicts = 0
+        self.merges = 0
+        self.reextractions = 0
+        self.conflict_failures = 0
+        self._flush_total = 0.0
+        self.max_flush = 0.0
+
+    @classmethod
+    def from_app_config(cls) -> "StoreWriter":
+        """Build the writer from the STORE_WRITE_* settings."""
+        return cls(
+            write_behind=app_config.store_write_behind,
+            max_attempts=app_config.store_write_max_attempts,
+            concurrency=app_config.extraction_concurrency,
+            max_conflict_attempts=app_config.store_cas_max_attempts,
+        )
+
+    def _conflict(self, error: VersionConflictError, attempt: int, resolve: Optional[Any]):
+        """Count a conflict; re-raise it when there is nothing left to retry with."""
+        self.conflicts += 1
+        if resolve is None or attempt >= self.max_conflict_attempts:
+            raise error
+
+    def record_reextraction(self):
+        """Count an update node extracting again after an unresolvable conflict."""
+        self.reextractions += 1
+
+    def record_conflict_failure(self, writes: int):
+        """Count writes given up after `max_conflict_attempts` conflicts."""
+        self.conflict_failures += 1
+        logger.error(f"Gave up {writes} memory writes after {self.max_conflict_attempts} version conflicts")
+
+    def _write(self, store: BaseStore, ops: List[PutOp], resolve: Optional[Resolve]):
+        for attempt in range(1, self.max_conflict_attempts + 1):
+            try:
+                store.batch(ops)
+                return
+            except VersionConflictError as e:
+                self._conflict(e, attempt, resolve)
+                ops = resolve(e)
+                self.merges += 1
+
+    async def _awrite(self, store: BaseStore, ops: List[PutOp], resolve: Optional[AsyncResolve]):
+        for attempt in range(1, self.max_conflict_attempts + 1):
+            try:
+                await store.abatch(ops)
+                return
+            except VersionConflictError as e:
+                self._conflict(e, attempt, resolve)
+                ops = await resolve(e)
+                self.merges += 1
+
+    def _record(self, ops: List[PutOp], started: float):
+        elapsed = time.monotonic() - started
+        self.batches += 1
+        self.ops += len(ops)
+        self._flush_total += elapsed
+        self.max_flush = max(self.max_flush, elapsed)
+
+    def commit(self, store: BaseStore, ops: List[PutOp], on_commit: Optional[Callable[[], Any]] = None,
+               resolve: Optional[Resolve] = None):
+        """Write `ops` in one batch now; errors propagate to the caller.
+
+        On a version conflict, `resolve(error)` returns the ops to retry
+        with (e.g. merged documents) or raises to give up.
+        """
+        if not ops:
+            return
+        started = time.monotonic()
+        self._write(store, ops, resolve)
+        self._record(ops, started)
+        if on_commit:
+            on_commit()
+
+    async def _flush(self, store: BaseStore, ops: List[PutOp], on_commit: Optional[Callable[[], Any]],
+                     resolve: Optional[AsyncResolve]):
+        started = time.monotonic()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._awrite(store, ops, resolve)
+                break
+            except VersionConflictError as e:
+                # The node has moved on, so nothing can extract again from the fresh documents
+                self.conflict_failures += 1
+                self.lost_writes += len(ops)
+                logger.error(f"Write-behind flush of {len(ops)} writes lost to a version conflict: {e}")
+                return
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.failed_batches += 1
+                    self.lost_writes += len(ops)
+                    logger.error(f"Write-behind flush of {len(ops)} writes failed after {attempt} attempts: {e}")
+                    return
+                self.retries += 1
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        self._record(ops, started)
+        if on_commit:
+            on_commit()
+
+    async def acommit(self, store: BaseStore, ops: List[PutOp], key: str,
+                      on_commit: Optional[Callable[[], Any]] = None, resolve: Optional[AsyncResolve] = None):
+        """Write `ops` in one batch, in the background when write-behind is on.
+
+        `key` (the user ID) orders flushes and is what `wait` waits on.
+        `on_commit` runs once the batch is durable, e.g. to invalidate caches.
+        `resolve` is the async counterpart of `commit`'s.
+        """
+        if not ops:
+            return
+        if not self.write_behind or self._queue.closed:
+            started = time.monotonic()
+            await self._awrite(store, ops, resolve)
+            self._record(ops, started)
+            if on_commit:
+                on_commit()
+            return
+        self._queue.submit(key, lambda: self._flush(store, ops, on_commit, resolve))
+
+    async def aput(self, store: BaseStore, namespace: Tuple[str, ...], key: str,
+                   value: Dict[str, Any]) -> Dict[str, Any]:
+        """Write one document from outside the graph and return it as stored.
+
+        A `value` carrying `_version` (as returned by a read) is written only
+        if the document is still at that version, and raises
+        `VersionConflictError` otherwise. Without `_version` the document
+        replaces whatever version is stored, re-reading the version when a
+        concurrent write gets in first.
+        """
+        validate_namespace(tuple(namespace))
+        if VERSION_FIELD in value:
+            stored = with_version(value, version_of(value) + 1)
+            await self._awrite(store, [PutOp(namespace, key, stored)], None)
+            return stored
+        for attempt in range(1, self.max_conflict_attempts + 1):
+            current = await store.aget(namespace, key)
+            stored = with_version(value, version_of(current.value if current else None) + 1)
+            try:
+                await store.abatch([PutOp(namespace, key, stored)])
+                return stored
+            except VersionConflictError as e:
+                self.conflicts += 1
+                if attempt == self.max_conflict_attempts:
+                    self.conflict_failures += 1
+                    raise e
+
+    async def wait(self, key: str):
+        """Wait until every write committed so far for `key` has been flushed."""
+        await self._queue.wait(key)
+
+    def wait_blocking(self, key: str):
+        """`wait` for sync callers, from a thread other than the one running the flushes."""
+        self._queue.wait_blocking(key)
+
+    async def drain(self, timeout: Optional[float] = None) -> int:
+        """Flush pending writes before shutdown; returns the number of flushes cancelled."""
+        return await self._queue.drain(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Write counters and flush latency for monitoring."""
+        return {
+            "batches": self.batches,
+            "ops": self.ops,
+            "pending": self._queue.pending,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "lost_writes": self.lost_writes,
+            "conflicts": self.conflicts,
+            "merges": self.merges,
+            "reextractions": self.reextractions,
+            "conflict_failures": self.conflict_failures,
+            "avg_flush_ms": round(self._flush_total / self.batches * 1000, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush * 1000, 2),
+        }
+
+
+# Global writer shared by the update nodes
+store_writer = StoreWriter.from_app_config()
+
+
+class UnitOfWork:
+    """The store writes of one update node, committed together as one batch.
+
+    Call `read` with the documents the node based its writes on: each put is
+    then a compare-and-set against the version read, and a document that
+    was not read must not exist yet.
+    """
+
+    def __init__(self, store: BaseStore, key: str, writer: Optional[StoreWriter] = None):
+        self.store = store
+        self.key = key
+        self.writer = writer or store_writer
+        self._bases: Dict[Tuple[Tuple[str, ...], str], Optional[Dict[str, Any]]] = {}
+        self._writes: Dict[Tuple[Tuple[str, ...], str], Optional[Dict[str, Any]]] = {}
+
+    def read(self, items: Iterable[Optional[Item]]):
+        """Record the stored documents the node's writes are based on."""
+        for item in items:
+            if item is not None:
+                self._bases[(tuple(item.namespace), item.key)] = item.value
+
+    def put(self, namespace: Tuple[str, ...], key: str, value: Dict[str, Any]):
+        """Buffer a put until `commit`."""
+        validate_namespace(tuple(namespace))
+        self._writes[(tuple(namespace), key)] = without_version(value)
+
+    def delete(self, namespace: Tuple[str, ...], key: str):
+        """Buffer a delete until `commit`."""
+        validate_namespace(tuple(namespace))
+        self._writes[(tuple(namespace), key)] = None
+
+    @property
+    def ops(self) -> List[PutOp]:
+        """The buffered writes, versioned one past the documents they are based on."""
+        return [
+            PutOp(namespace, key, None if value is None else with_version(
+                value, version_of(self._bases.get((namespace, key))) + 1,
+            ))
+            for (namespace, key), value in self._writes.items()
+        ]
+
+    def _merge(self, error: VersionConflictError, current: List[Optional[Item]]) -> List[PutOp]:
+        for conflict, item in zip(error.conflicts, current):
+            ident = (conflict.namespace, conflict.key)
+            theirs = item.value if item else None
+            merged = merge_documents(self._bases.get(ident), self._writes[ident], theirs)
+            if merged is None:
+                raise error
+            self._bases[ident] = theirs
+            self._writes[ident] = merged
+        return self.ops
+
+    def _resolve(self, error: VersionConflictError) -> List[PutOp]:
+        return self._merge(error, self.store.batch([GetOp(c.namespace, c.key) for c in error.conflicts]))
+
+    async def _aresolve(self, error: VersionConflictError) -> List[PutOp]:
+        return self._merge(error, await self.store.abatch([GetOp(c.namespace, c.key) for c in error.conflicts]))
+
+    def _take(self) -> "UnitOfWork":
+        """Move the buffered writes to a unit of their own, which a background flush may still merge."""
+        taken = UnitOfWork(self.store, self.key, self.writer)
+        taken._bases, taken._writes = dict(self._bases), self._writes
+        for op in taken.ops:
+            self._bases[(op.namespace, op.key)] = op.value
+        self._writes = {}
+        return taken
+
+    def commit(self, on_commit: Optional[Callable[[], Any]] = None):
+        """Write the buffered ops now, as one batch."""
+        taken = self._take()
+        self.writer.commit(self.store, taken.ops, on_commit, resolve=taken._resolve)
+
+    async def acommit(self, on_commit: Optional[Callable[[], Any]] = None):
+        """Write the buffered ops as one batch, write-behind if enabled."""
+        taken = self._take()
+        await self.writer.acommit(self.store, taken.ops, self.key, on_commit, resolve=taken._aresolve)
@@ -0,0 +1,129 @@
+"""Optimistic concurrency (versioned writes) for memory documents.
+
+Every memory document carries its version in the reserved `_version` field.
+A put whose value has `_version` n is a compare-and-set: the store applies
+it only if the stored document is at version n - 1 (a missing document is
+at version 0). Otherwise the whole batch fails with `VersionConflictError`
+and nothing is written. Puts without `_version`, and deletes, are
+unconditional. `SqliteStore`, `RedisStore`, `JournaledStore` and
+`VersionedInMemoryStore` check versions atomically with the write, so
+writers in different threads, tasks or processes need no shared lock.
+
+Writers that lose a race re-read the document and merge (`merge_documents`)
+or, when both sides changed the same field, extract again from the fresh
+document (see `storage.unit_of_work`).
+"""
+import threading
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from langgraph.store.base import PutOp
+from langgraph.store.memory import InMemoryStore
+
+VERSION_FIELD = "_version"
+
+_MISSING = object()
+
+
+class Conflict(NamedTuple):
+    """One document a compare-and-set put found at an unexpected version."""
+    namespace: Tuple[str, ...]
+    key: str
+    expected: int
+    actual: int
+
+
+class VersionConflictError(Exception):
+    """A versioned put found a document changed since the writer read it."""
+
+    def __init__(self, conflicts: List[Conflict]):
+        self.conflicts = conflicts
+        described = ", ".join(
+            f"{'/'.join(c.namespace)}/{c.key} (read v{c.expected}, stored v{c.actual})" for c in conflicts
+        )
+        super().__init__(f"Version conflict on {described}")
+
+
+def version_of(value: Optional[Dict[str, Any]]) -> int:
+    """The version of a stored document value; 0 for a missing or unversioned one."""
+    return int(value.get(VERSION_FIELD, 0)) if value else 0
+
+
+def is_versioned(op: PutOp) -> bool:
+    """Whether `op` is a compare-and-set put."""
+    return op.value is not None and VERSION_FIELD in op.value
+
+
+def with_version(value: Dict[str, Any], version: int) -> Dict[str, Any]:
+    return {**value, VERSION_FIELD: version}
+
+
+def without_version(value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The document without its version field (what prompts and extractors see)."""
+    if value is None or VERSION_FIELD not in value:
+        return value
+    return {field: v for field, v in value.items() if field != VERSION_FIELD}
+
+
+def check_versions(ops: Iterable[PutOp], stored: Callable[[Tuple[str, ...], str], Optional[Dict[str, Any]]]):
+    """Raise `VersionConflictError` unless every versioned put in `ops` matches the stored version.
+
+    `stored(namespace, key)` returns the current value, or None. Stores call
+    this inside the critical section or transaction that applies the puts.
+    """
+    conflicts = []
+    for op in ops:
+        if not is_versioned(op):
+            continue
+        expected = version_of(op.value) - 1
+        actual = version_of(stored(tuple(op.namespace), op.key))
+        if actual != expected:
+            conflicts.append(Conflict(tuple(op.namespace), op.key, expected, actual))
+    if conflicts:
+        raise VersionConflictError(conflicts)
+
+
+def merge_documents(base: Optional[Dict[str, Any]], ours: Dict[str, Any],
+                    theirs: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Three-way merge of a document's fields.
+
+    Starts from `theirs` (the stored document) and applies every field `ours`
+    changed relative to `base` (what we read). Returns None when both sides
+    changed the same field to different values, or `theirs` was deleted.
+    Version fields are ignored.
+    """
+    if theirs is None:
+        return None
+    base, ours, theirs = without_version(base) or {}, without_version(ours), without_version(theirs)
+    merged = dict(theirs)
+    for field in set(base) | set(ours):
+        mine, original = ours.get(field, _MISSING), base.get(field, _MISSING)
+        if mine == original:
+            continue
+        other = theirs.get(field, _MISSING)
+        if other != original and other != mine:
+            return None
+        if mine is _MISSING:
+            merged.pop(field, None)
+        else:
+            merged[field] = mine
+    return merged
+
+
+class VersionedInMemoryStore(InMemoryStore):
+    """`InMemoryStore` that enforces compare-and-set on versioned puts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._write_lock = threading.RLock()
+
+    def _stored_value(self, namespace: Tuple[str, ...], key: str) -> Optional[Dict[str, Any]]:
+        item = self._data[namespace].get(key) if namespace in self._data else None
+        return item.value if item else None
+
+    def _check_versions(self, put_ops: Dict[Tuple[Tuple[str, ...], str], PutOp]):
+        check_versions(put_ops.values(), self._stored_value)
+
+    def _apply_put_ops(self, put_ops: Dict[Tuple[Tuple[str, ...], str], PutOp]) -> None:
+        with self._write_lock:
+            self._check_versions(put_ops)
+            super()._apply_put_ops(put_ops)
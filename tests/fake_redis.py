@@ -0,0 +1,262 @@
+"""In-process, Redis-compatible server for the tests.
+
+`FakeRedisServer` speaks RESP2 over TCP on its own thread, so `RedisClient`
+(and so `RedisStore` and `RedisSaver`) can be exercised without a Redis
+installation. It implements the strings, hashes, sets and MULTI/EXEC/WATCH
+subset the Redis backends use, keeps everything in memory and ignores
+expiry.
+
+    with FakeRedisServer() as server:
+        client = RedisClient(server.url)
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from storage.redis_client import RedisError, read_reply
+
+Value = Union[bytes, Dict[bytes, bytes], set]
+
+# Commands that modify their key(s), and so abort transactions WATCHing them
+_WRITE_COMMANDS = {b"SET", b"DEL", b"EXPIRE", b"HSET", b"HSETNX", b"HDEL", b"SADD", b"SREM"}
+
+
+def _encode_reply(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RedisError):
+        return b"-%s\r\n" % str(reply).encode()
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode()
+    if isinstance(reply, bool):
+        return b":%d\r\n" % int(reply)
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(_encode_reply(item) for item in reply)
+
+
+class FakeRedisServer:
+    """Single-database Redis stand-in; `port=0` picks a free port."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.data: Dict[bytes, Value] = {}
+        # Per-key modification counters for WATCH; FLUSHDB bumps the epoch instead
+        self._revisions: Dict[bytes, int] = {}
+        self._epoch = 0
+        self.commands_received = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Dict[bytes, Callable[..., Any]] = {
+            name[len("_cmd_"):].upper().encode(): getattr(self, name)
+            for name in dir(self) if name.startswith("_cmd_")
+        }
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    def start(self) -> "FakeRedisServer":
+        """Start serving on a background thread."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fake-redis", daemon=True)
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._serve, self.host, self.port), self._loop,
+        ).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        """Stop serving and drop every connection."""
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "FakeRedisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _revision(self, key: bytes) -> tuple:
+        return self._epoch, self._revisions.get(key, 0)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        queued: Optional[List[List[bytes]]] = None
+        watched: Dict[bytes, tuple] = {}
+        try:
+            while True:
+                try:
+                    command = await read_reply(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                self.commands_received += 1
+                name = command[0].upper()
+                if name == b"WATCH" and queued is None:
+                    watched.update((key, self._revision(key)) for key in command[1:])
+                    reply = "OK"
+                elif name == b"UNWATCH" and queued is None:
+                    watched.clear()
+                    reply = "OK"
+                elif name == b"MULTI":
+                    queued, reply = [], "OK"
+                elif name == b"EXEC":
+                    if any(self._revision(key) != revision for key, revision in watched.items()):
+                        reply = None
+                    else:
+                        reply = [self._execute(queued_command) for queued_command in queued or []]
+                    queued = None
+                    watched.clear()
+                elif queued is not None:
+                    queued.append(command)
+                    reply = "QUEUED"
+                else:
+                    reply = self._execute(command)
+                writer.write(_encode_reply(reply))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _execute(self, command: List[bytes]) -> Any:
+        handler = self._handlers.get(command[0].upper())
+        if handler is None:
+            return RedisError(f"ERR unknown command '{command[0].decode()}'")
+        name = command[0].upper()
+        if name in _WRITE_COMMANDS:
+            for key in (command[1:] if name == b"DEL" else command[1:2]):
+                self._revisions[key] = self._revisions.get(key, 0) + 1
+        try:
+            return handler(*command[1:])
+        except TypeError:
+            return RedisError(f"ERR wrong number of arguments for '{command[0].decode()}' command")
+        except RedisError as e:
+            return e
+
+    def _typed(self, key: bytes, kind: type, create: bool = False) -> Any:
+        value = self.data.get(key)
+        if value is None:
+            if not create:
+                return kind()
+            value = self.data[key] = kind()
+        if not isinstance(value, kind):
+            raise RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _gc(self, key: bytes):
+        if key in self.data and not self.data[key]:
+            del self.data[key]
+
+    # Connection and keys
+
+    def _cmd_ping(self, *message):
+        return message[0] if message else "PONG"
+
+    def _cmd_auth(self, *credentials):
+        return "OK"
+
+    def _cmd_select(self, db):
+        return "OK" if db == b"0" else RedisError("ERR DB index is out of range")
+
+    def _cmd_flushdb(self, *mode):
+        self.data.clear()
+        self._revisions.clear()
+        self._epoch += 1
+        return "OK"
+
+    def _cmd_dbsize(self):
+        return len(self.data)
+
+    def _cmd_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def _cmd_exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def _cmd_expire(self, key, seconds):
+        return key in self.data
+
+    # Strings
+
+    def _cmd_get(self, key):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, bytes):
+            raise RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _cmd_set(self, key, value):
+        self.data[key] = value
+        return "OK"
+
+    # Hashes
+
+    def _cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise TypeError
+        hash_ = self._typed(key, dict, create=True)
+        added = sum(field not in hash_ for field in pairs[::2])
+        hash_.update(zip(pairs[::2], pairs[1::2]))
+        return added
+
+    def _cmd_hsetnx(self, key, field, value):
+        hash_ = self._typed(key, dict, create=True)
+        if field in hash_:
+            return 0
+        hash_[field] = value
+        return 1
+
+    def _cmd_hget(self, key, field):
+        return self._typed(key, dict).get(field)
+
+    def _cmd_hmget(self, key, *fields):
+        hash_ = self._typed(key, dict)
+        return [hash_.get(field) for field in fields]
+
+    def _cmd_hgetall(self, key):
+        return [part for item in self._typed(key, dict).items() for part in item]
+
+    def _cmd_hkeys(self, key):
+        return list(self._typed(key, dict))
+
+    def _cmd_hvals(self, key):
+        return list(self._typed(key, dict).values())
+
+    def _cmd_hlen(self, key):
+        return len(self._typed(key, dict))
+
+    def _cmd_hdel(self, key, *fields):
+        hash_ = self._typed(key, dict)
+        removed = sum(hash_.pop(field, None) is not None for field in fields)
+        self._gc(key)
+        return removed
+
+    # Sets
+
+    def _cmd_sadd(self, key, *members):
+        set_ = self._typed(key, set, create=True)
+        added = len(set(members) - set_)
+        set_.update(members)
+        return added
+
+    def _cmd_srem(self, key, *members):
+        set_ = self._typed(key, set)
+        removed = len(set_ & set(members))
+        set_.difference_update(members)
+        self._gc(key)
+        return removed
+
+    def _cmd_smembers(self, key):
+        return list(self._typed(key, set))
+
+    def _cmd_scard(self, key):
+        return len(self._typed(key, set))
+
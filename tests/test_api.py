@@ -1,10 +1,14 @@
 """API tests for FastAPI Memory Agent."""
 
+import json
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from app.main import app
+from app.api.dependencies import get_graph
 from app.models.requests import ChatRequest, ChatResponse
 
 client = TestClient(app)
@@ -58,15 +62,14 @@ class TestMetricsEndpoint:
 class TestChatEndpoint:
     """Test chat endpoint."""
     
-    @patch('app.api.routes.get_graph')
-    def test_chat_endpoint_success(self, mock_get_graph):
+    def test_chat_endpoint_success(self):
         """Test successful chat request."""
         # Mock the graph response
         mock_graph = MagicMock()
-        mock_graph.invoke.return_value = {
+        mock_graph.ainvoke = AsyncMock(return_value={
             "messages": [MagicMock(content="Test response")]
-        }
-        mock_get_graph.return_value = mock_graph
+        })
+        app.dependency_overrides[get_graph] = lambda: mock_graph
         
         # Test request
         request_data = {
@@ -75,8 +78,13 @@ class TestChatEndpoint:
             "session_id": "test-session"
         }
         
-        response = client.post("/api/v1/chat", json=request_data)
+        try:
+            response = client.post("/api/v1/chat", json=request_data)
+        finally:
+            app.dependency_overrides.clear()
         assert response.status_code == 200
+        mock_graph.ainvoke.assert_awaited_once()
+        mock_graph.invoke.assert_not_called()
         
         data = response.json()
         assert "response" in data
@@ -97,6 +105,101 @@ class TestChatEndpoint:
         assert response.status_code == 422  # Validation error
 
 
+class TestSessionRunner:
+    """Test per-session serialization and message coalescing."""
+    
+    @pytest.mark.asyncio
+    async def test_runs_on_a_session_never_overlap(self):
+        """Test a second message waits for the running turn instead of racing it."""
+        import asyncio
+        from app.api.sessions import SessionRunner
+        runner = SessionRunner(window=0)
+        active, peak = 0, 0
+        
+        async def run(messages):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return messages
+        
+        first = asyncio.ensure_future(runner.submit("s1", "hi", run))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(runner.submit("s1", "there", run))
+        other = asyncio.ensure_future(runner.submit("s2", "hello", run))
+        assert await first == ["hi"]
+        assert await second == ["there"]
+        assert await other == ["hello"]
+        assert peak == 2  # s1 and s2 in parallel, never two runs of s1
+        assert runner.stats()["active_sessions"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_messages_queued_behind_a_run_are_merged(self):
+        """Test messages sent during a run are answered by one combined follow-up run."""
+        import asyncio
+        from app.api.sessions import SessionRunner
+        runner = SessionRunner(window=0.02)
+        batches = []
+        
+        async def run(messages):
+            batches.append(messages)
+            await asyncio.sleep(0.01)
+            return f"answer to {len(messages)}"
+        
+        first = asyncio.ensure_future(runner.submit("s1", "a", run))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(runner.submit("s1", m, run)) for m in ("b", "c")]
+        assert await first == "answer to 1"
+        assert await asyncio.gather(*followers) == ["answer to 2", "answer to 2"]
+        assert batches == [["a"], ["b", "c"]]
+        assert runner.stats()["merged_messages"] == 1
+
+    @pytest.mark.asyncio
+    async def test_messages_of_other_users_are_not_merged(self):
+        """Test a queued message only joins a batch of its own user, whose run it is answered by."""
+        import asyncio
+        from app.api.sessions import SessionRunner
+        runner = SessionRunner(window=0.02)
+        batches = []
+
+        def run_as(user_id):
+            async def run(messages):
+                batches.append((user_id, messages))
+                await asyncio.sleep(0.01)
+                return user_id
+            return run
+
+        first = asyncio.ensure_future(runner.submit("s1", "a", run_as("ana"), group="ana"))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(runner.submit("s1", m, run_as(user), group=user))
+                     for m, user in (("b", "ana"), ("c", "rui"), ("d", "ana"))]
+        assert await first == "ana"
+        assert await asyncio.gather(*followers) == ["ana", "rui", "ana"]
+        assert batches == [("ana", ["a"]), ("ana", ["b", "d"]), ("rui", ["c"])]
+
+    def test_chat_endpoint_merges_queued_messages(self):
+        """Test /chat sends merged messages to the graph as separate human messages."""
+        from app.api.dependencies import get_session_runner
+        from app.api.sessions import SessionRunner
+        mock_graph = MagicMock()
+        mock_graph.ainvoke = AsyncMock(return_value={"messages": [MagicMock(content="Combined reply")]})
+        runner = SessionRunner(window=0)
+        app.dependency_overrides[get_graph] = lambda: mock_graph
+        app.dependency_overrides[get_session_runner] = lambda: runner
+        try:
+            response = client.post("/api/v1/chat", json={
+                "message": "Hello", "user_id": "test-user", "session_id": "merge-session"
+            })
+        finally:
+            app.dependency_overrides.clear()
+        assert response.status_code == 200
+        assert response.json()["response"] == "Combined reply"
+        messages = mock_graph.ainvoke.await_args.args[0]["messages"]
+        assert [m.content for m in messages] == ["Hello"]
+        assert runner.stats()["runs"] == 1
+
+
 class TestMemoryEndpoints:
     """Test memory management endpoints."""
     
@@ -187,6 +290,50 @@ class TestMemoryEndpoints:
         assert data["user_id"] == "test-user"
 
 
+    def test_get_todos_filters_and_pages(self):
+        """Test status/due_before filters and cursor paging on the todos endpoint."""
+        from graph.builder import graph
+        namespace = ("todo", "general", "paging-user")
+        for i in range(5):
+            graph.store.put(namespace, f"t{i}", {
+                "task": f"Task {i}",
+                "status": "done" if i == 0 else "not started",
+                "deadline": f"2025-01-0{i + 1}T00:00:00+00:00",
+            })
+
+        first = client.get("/api/v1/memories/todos/paging-user",
+                           params={"status": "not started", "limit": 3}).json()["data"]
+        assert len(first["todos"]) == 3 and first["next_cursor"]
+        rest = client.get("/api/v1/memories/todos/paging-user",
+                          params={"status": "not started", "limit": 3, "cursor": first["next_cursor"]}).json()["data"]
+        assert len(rest["todos"]) == 1 and rest["next_cursor"] is None
+        assert {todo["task"] for todo in first["todos"] + rest["todos"]} == {f"Task {i}" for i in range(1, 5)}
+
+        due = client.get("/api/v1/memories/todos/paging-user",
+                         params={"due_before": "2025-01-03T00:00:00+00:00"}).json()["data"]
+        assert [todo["task"] for todo in due["todos"]] == ["Task 0", "Task 1"]
+
+        response = client.get("/api/v1/memories/todos/paging-user", params={"cursor": "bogus"})
+        assert response.status_code == 400
+
+    def test_user_id_with_dot_is_rejected(self):
+        """Test a "." in a user ID is a 400, since it would split the memory namespace."""
+        response = client.post("/api/v1/memories/profile/john.doe", json={"user_id": "john.doe", "data": {"name": "J"}})
+        assert response.status_code == 400
+        assert client.get("/api/v1/memories/todos/john.doe").status_code == 400
+    
+    def test_update_profile_versions(self):
+        """Test posts bump the document version and a post carrying a stale version is refused."""
+        url = "/api/v1/memories/profile/versioned-user"
+        first = client.post(url, json={"user_id": "versioned-user", "data": {"name": "Ana"}}).json()["data"]
+        second = client.post(url, json={"user_id": "versioned-user", "data": {"name": "Ana B."}}).json()["data"]
+        assert (first["_version"], second["_version"]) == (1, 2)
+
+        stale = client.post(url, json={"user_id": "versioned-user", "data": {**first, "name": "Ana C."}})
+        assert stale.status_code == 409
+        fresh = client.post(url, json={"user_id": "versioned-user", "data": {**second, "name": "Ana C."}})
+        assert fresh.status_code == 200 and fresh.json()["data"] == {"name": "Ana C.", "_version": 3}
+
 class TestErrorHandling:
     """Test error handling."""
     
@@ -201,6 +348,26 @@ class TestErrorHandling:
         assert response.status_code == 404  # Empty user_id in path
 
 
+@contextmanager
+def _scripted_graph(responses, errors=()):
+    """Serve the API from a fresh graph whose model replies from `responses` (profile extraction stubbed)."""
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.store.memory import InMemoryStore
+    from graph import nodes
+    from graph.builder import builder
+    from benchmarks.fake_model import FakeChatModel
+    graph = builder.compile(checkpointer=MemorySaver(), store=InMemoryStore())
+    profile_extractor = MagicMock()
+    profile_extractor.ainvoke = AsyncMock(return_value={"responses": [], "response_metadata": []})
+    app.dependency_overrides[get_graph] = lambda: graph
+    try:
+        with patch.object(nodes, 'model', FakeChatModel(responses=responses, errors=list(errors))), \
+                patch.object(nodes, 'get_profile_extractor', return_value=profile_extractor):
+            yield graph
+    finally:
+        app.dependency_overrides.clear()
+
+
 class TestWebSocketEndpoint:
     """Test WebSocket endpoint."""
     
@@ -210,6 +377,135 @@ class TestWebSocketEndpoint:
         # This is a placeholder for WebSocket-specific tests
         # In a real implementation, you'd use websockets library for testing
         pass
+    
+    @staticmethod
+    def _turn(message, responses, stream="deltas", session_id=None):
+        """Send one message through /ws/chat on a fresh graph and collect the events up to `done`."""
+        events = []
+        payload = {"message": message, "user_id": "ws-user", "session_id": session_id}
+        if stream is not None:
+            payload["stream"] = stream
+        with _scripted_graph(responses):
+            with client.websocket_connect("/ws/chat") as websocket:
+                websocket.send_json(payload)
+                while not events or events[-1]["type"] not in ("done", "error"):
+                    events.append(websocket.receive_json())
+        return events
+    
+    def test_deltas_stream_reply_tokens(self):
+        """Test the delta protocol sends the reply token by token between node events."""
+        events = self._turn("Hello there", ["Hi! How can I help today?"], session_id="ws-tokens")
+        assert [e["type"] for e in events] == ["node_start"] + ["token"] * 6 + ["node_end", "done"]
+        assert events[0] == {"type": "node_start", "node": "task_asis"}
+        assert "".join(e["text"] for e in events if e["type"] == "token") == "Hi! How can I help today?"
+        assert events[-1] == {"type": "done", "session_id": "ws-tokens", "user_id": "ws-user"}
+    
+    def test_deltas_report_memory_updates(self):
+        """Test an update turn sends a memory notice and no extraction tokens or state."""
+        from langchain_core.messages import AIMessage
+        update = AIMessage(content="", tool_calls=[
+            {"name": "UpdateMemory", "args": {"update_type": "user"}, "id": "call-1"}
+        ])
+        events = self._turn("I'm Ana", [update, "Nice to meet you, Ana!"], session_id="ws-memory")
+        assert [e.get("node") for e in events if e["type"] == "node_start"] == [
+            "task_asis", "update_profile", "task_asis"
+        ]
+        assert {"type": "memory", "kind": "profile", "summary": "updated profile"} in events
+        assert "".join(e["text"] for e in events if e["type"] == "token") == "Nice to meet you, Ana!"
+        assert not any("messages" in e or "data" in e for e in events)
+    
+    def test_values_mode_sends_full_state(self):
+        """Test clients that don't opt into deltas still get the full state after every step."""
+        events = self._turn("Hello there", ["Hi!"], stream=None, session_id="ws-values")
+        chunks = [e for e in events if e["type"] == "chunk"]
+        assert [m["content"] for m in chunks[-1]["data"]["messages"]] == ["Hello there", "Hi!"]
+        assert events[-1]["type"] == "done"
+
+    def test_text_of_content_blocks(self):
+        """Test replies made of content blocks are flattened to their text."""
+        from langchain_core.messages import AIMessageChunk
+        from app.api.streaming import _text
+        chunk = AIMessageChunk(content=[{"type": "text", "text": "Hi "}, {"type": "text", "text": "there"}])
+        assert _text(chunk) == "Hi there"
+
+
+class TestChatStreamEndpoint:
+    """Test the Server-Sent Events chat endpoint."""
+    
+    @staticmethod
+    def _events(body):
+        """Parse an SSE body into (event, data) pairs, skipping comments."""
+        events = []
+        for frame in body.strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":"))
+            if fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+        return events
+    
+    def test_streams_tokens_then_done(self):
+        """Test the turn arrives as token events between node events, ending with done."""
+        with _scripted_graph(["Hi! How can I help?"]):
+            response = client.post("/api/v1/chat/stream", json={
+                "message": "Hello", "user_id": "sse-user", "session_id": "sse-session"
+            })
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = self._events(response.text)
+        assert [name for name, _ in events] == ["node_start"] + ["token"] * 5 + ["node_end", "done"]
+        assert "".join(data["text"] for name, data in events if name == "token") == "Hi! How can I help?"
+        assert events[-1][1] == {"session_id": "sse-session", "user_id": "sse-user"}
+    
+    def test_failure_is_an_error_event(self):
+        """Test a failing run ends the stream with an error event instead of a broken response."""
+        from utils.resilience import CircuitOpenError
+        with _scripted_graph(["unused"], errors=[CircuitOpenError("circuit open")]):
+            response = client.post("/api/v1/chat/stream", json={"message": "Hello", "user_id": "sse-user"})
+        name, data = self._events(response.text)[-1]
+        assert (name, data["status"]) == ("error", 503)
+    
+    def test_validates_like_chat(self):
+        """Test the endpoint takes the same ChatRequest body as /chat."""
+        response = client.post("/api/v1/chat/stream", json={"user_id": "sse-user"})
+        assert response.status_code == 422
+    
+    @pytest.mark.asyncio
+    async def test_heartbeats_while_waiting(self):
+        """Test comment frames keep the connection alive while no event is ready."""
+        import asyncio
+        from app.api.streaming import HEARTBEAT_FRAME, sse_frames
+        
+        async def slow():
+            await asyncio.sleep(0.05)
+            yield {"type": "token", "text": "Hi"}
+        
+        async def connected():
+            return False
+        
+        frames = [frame async for frame in sse_frames(slow(), 0.01, connected)]
+        assert frames[0] == HEARTBEAT_FRAME
+        assert frames[-1] == 'event: token\ndata: {"text":"Hi"}\n\n'
+    
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_the_run(self):
+        """Test the producing run is cancelled once the client is gone."""
+        import asyncio
+        from app.api.streaming import sse_frames
+        cancelled = asyncio.Event()
+        
+        async def endless():
+            try:
+                yield {"type": "node_start", "node": "task_asis"}
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        async def disconnected():
+            return True
+        
+        frames = [frame async for frame in sse_frames(endless(), 0.01, disconnected)]
+        assert frames == ['event: node_start\ndata: {"node":"task_asis"}\n\n']
+        assert cancelled.is_set()
 
 
 class TestCORS:
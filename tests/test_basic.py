@@ -1,6 +1,8 @@
 """Basic unit tests for the memory agent - 30 essential tests."""
+import time
+import uuid
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from langchain_core.messages import HumanMessage
 from datetime import datetime
 
@@ -156,6 +158,44 @@ class TestUtils:
         sniffer = Sniffer()
         assert sniffer.called_tools == []
     
+    @pytest.mark.asyncio
+    async def test_task_queue_orders_jobs_per_key(self):
+        """Test jobs for one key run in order while the concurrency bound holds."""
+        import asyncio
+        from utils.task_queue import KeyedTaskQueue
+        queue = KeyedTaskQueue(max_concurrency=2)
+        running, peak, order = 0, 0, []
+        
+        def job(key, i):
+            async def run():
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                order.append((key, i))
+                running -= 1
+            return run
+        
+        for i in range(3):
+            for key in ("a", "b", "c"):
+                queue.submit(key, job(key, i))
+        assert await queue.drain(timeout=5) == 0
+        assert peak <= 2
+        for key in ("a", "b", "c"):
+            assert [i for k, i in order if k == key] == [0, 1, 2]
+        assert queue.stats() == {"pending": 0, "completed": 9, "failed": 0}
+    
+    @pytest.mark.asyncio
+    async def test_task_queue_drain_rejects_and_cancels(self):
+        """Test draining cancels overdue jobs and refuses new submissions."""
+        import asyncio
+        from utils.task_queue import KeyedTaskQueue
+        queue = KeyedTaskQueue()
+        queue.submit("slow", lambda: asyncio.sleep(10))
+        assert await queue.drain(timeout=0.01) == 1
+        with pytest.raises(RuntimeError):
+            queue.submit("late", lambda: asyncio.sleep(0))
+    
     def test_extract_tool_info(self):
         """Test extract_tool_info function."""
         from utils.helpers import extract_tool_info
@@ -175,6 +215,27 @@ class TestUtils:
 class TestChains:
     """Test chain components."""
     
+    def test_registry_builds_each_runnable_once(self):
+        """Test extractors and bound models are built once and then reused."""
+        from chains.extractors import RunnableRegistry
+        registry = RunnableRegistry()
+        factory = MagicMock(side_effect=lambda: object())
+        first = registry.get(("extractor", 1, ("ToDo",)), factory)
+        assert registry.get(("extractor", 1, ("ToDo",)), factory) is first
+        assert registry.get(("extractor", 2, ("ToDo",)), factory) is not first
+        assert factory.call_count == 2
+        assert registry.stats() == {"size": 2, "builds": 2, "hits": 1}
+    
+    def test_get_todo_extractor_is_shared(self):
+        """Test per-call listeners wrap the shared todo extractor without rebuilding it."""
+        from chains.extractors import get_todo_extractor
+        from graph.nodes import model
+        with patch('chains.extractors.create_todo_extractor') as create:
+            extractor = get_todo_extractor(model)
+            extractor.with_listeners(on_end=lambda run: None)
+            assert get_todo_extractor(model) is extractor
+            create.assert_not_called()
+    
     def test_prompts_formatting(self):
         """Test prompt template formatting."""
         from chains.prompts import MODEL_SYSTEM_MESSAGE, TRUSTCALL_INSTRUCTION
@@ -194,6 +255,153 @@ class TestChains:
         assert "2024-01-01T00:00:00" in formatted
         assert "Reflect on following interaction" in formatted
 
+    def test_render_todos_compact(self):
+        """Test todos render one line each, open and soonest first, without default fields."""
+        from chains.prompts import render_todos
+        rendered = render_todos([
+            {"task": "File taxes", "status": "done", "deadline": None, "solutions": [], "time_to_complete": None},
+            {"task": "Renew passport", "status": "not started", "deadline": "2025-03-01T09:00:00",
+             "solutions": ["Book embassy slot"], "time_to_complete": 30},
+            {"task": "Fix bike", "status": "in progress", "deadline": None, "solutions": [], "time_to_complete": None},
+        ])
+        assert rendered.splitlines() == [
+            "- [in progress] Fix bike",
+            "- Renew passport (due 2025-03-01 09:00, ~30m) | Book embassy slot",
+            "- [done] File taxes",
+        ]
+        truncated = render_todos([{"task": "x" * 200}] * 5, max_tokens=100)
+        assert truncated.endswith("... 3 more not shown")
+
+    def test_render_todo_acknowledgement(self):
+        """Test ToDo confirmations are built from the Trustcall diff."""
+        from chains.prompts import render_todo_acknowledgement
+        changes = [
+            {"type": "new", "value": {"task": "Buy milk"}},
+            {"type": "new", "value": {"task": "Call mum"}},
+            {"type": "update", "doc_id": "d1", "planned_edits": "", "value": "done"},
+            {"type": "no_update", "doc_id": "d2", "planned_edits": ""},
+        ]
+        documents = {"d1": {"task": "File taxes", "status": "done"}}
+        assert render_todo_acknowledgement(changes, documents) == (
+            'I\'ve added "Buy milk" and "Call mum" to your ToDo list. I\'ve marked "File taxes" as done.'
+        )
+        assert render_todo_acknowledgement(changes[3:], documents) == ""
+
+    def test_response_cache_lru_and_ttl(self):
+        """Test cached replies are evicted by LRU size and TTL."""
+        from chains.llm_cache import ResponseCache
+        from langchain_core.messages import AIMessage
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            cache.put(key, AIMessage(content=key))
+        assert cache.get("a") is None
+        assert cache.get("c").content == "c"
+        with patch('chains.llm_cache.time.time', return_value=time.time() + 120):
+            assert cache.get("c") is None
+        assert cache.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+    def test_response_cache_promotions_respect_max_entries(self, tmp_path):
+        """Test replies promoted from the SQLite tier evict like puts do."""
+        from chains.llm_cache import ResponseCache
+        from langchain_core.messages import AIMessage
+        path = str(tmp_path / "llm_cache.db")
+        writer = ResponseCache(path=path)
+        for key in ("a", "b", "c"):
+            writer.put(key, AIMessage(content=key))
+        reader = ResponseCache(max_entries=2, path=path)
+        assert [reader.get(key).content for key in ("a", "b", "c")] == ["a", "b", "c"]
+        assert reader.stats()["size"] == 2
+
+    @pytest.mark.asyncio
+    async def test_acached_invoke_keeps_sqlite_tier_off_the_event_loop(self, tmp_path):
+        """Test the async path calls the SQLite tier from worker threads."""
+        import threading
+        from chains import llm_cache
+        from langchain_core.messages import AIMessage
+        cache = llm_cache.ResponseCache(path=str(tmp_path / "llm_cache.db"))
+        threads = set()
+        original_get = cache.get
+
+        def get(key):
+            threads.add(threading.get_ident())
+            return original_get(key)
+
+        invoke = AsyncMock(return_value=AIMessage(content="Hi"))
+        with patch.object(llm_cache, "response_cache", cache), patch.object(cache, "get", get), \
+                patch.object(llm_cache.app_config, "llm_cache", True):
+            for _ in range(2):
+                reply = await llm_cache.acached_invoke(MagicMock(), [HumanMessage(content="Hello")], "u1", invoke)
+        assert reply.content == "Hi" and invoke.await_count == 1
+        assert threading.get_ident() not in threads
+
+    def test_response_cache_key_tracks_memory_version(self):
+        """Test keys ignore message IDs but change when the user's memories change."""
+        from chains.llm_cache import ResponseCache
+        cache = ResponseCache()
+        key = cache.key("u1", [HumanMessage(content="What's on my list?", id="run-1")])
+        assert cache.key("u1", [HumanMessage(content="What's on my list?", id="run-2")]) == key
+        assert cache.key("u2", [HumanMessage(content="What's on my list?")]) != key
+        cache.bump("u1")
+        assert cache.key("u1", [HumanMessage(content="What's on my list?")]) != key
+
+    def test_response_cache_sqlite_tier(self, tmp_path):
+        """Test replies and memory versions survive in the SQLite tier."""
+        from chains.llm_cache import ResponseCache
+        from langchain_core.messages import AIMessage
+        path = str(tmp_path / "llm_cache.db")
+        cache = ResponseCache(path=path)
+        cache.bump("u1")
+        cache.put("k", AIMessage(content="", id="original", tool_calls=[
+            {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call-1"}]))
+        reopened = ResponseCache(path=path)
+        assert reopened.memory_version("u1") == 1
+        cached = reopened.get("k")
+        assert cached.tool_calls[0]["args"] == {"update_type": "todo"}
+        assert cached.id is None and cached.tool_calls[0]["id"] != "call-1"
+
+    def test_response_cache_versions_are_shared_through_sqlite_tier(self, tmp_path):
+        """Test a memory write on one worker invalidates the keys of another sharing the SQLite tier."""
+        from chains.llm_cache import ResponseCache
+        path = str(tmp_path / "llm_cache.db")
+        worker_a, worker_b = ResponseCache(path=path), ResponseCache(path=path)
+        messages = [HumanMessage(content="What's on my list?")]
+        key = worker_b.key("u1", messages)
+        worker_a.bump("u1")
+        worker_b.bump("u1")
+        assert worker_a.memory_version("u1") == worker_b.memory_version("u1") == 2
+        assert worker_b.key("u1", messages) != key
+
+    def test_response_cache_is_off_for_shared_stores_without_shared_versions(self):
+        """Test LLM_CACHE is ignored when other processes write to the store and versions are process-local."""
+        from config import AppConfig
+        for backend, path, enabled in (("memory", "", True), ("sqlite", "", False),
+                                       ("sqlite", "cache.db", True), ("redis", "cache.db", False)):
+            with patch.dict('os.environ', {'LLM_CACHE': 'true', 'STORE_BACKEND': backend, 'LLM_CACHE_PATH': path}):
+                assert AppConfig().llm_cache is enabled
+
+    def test_compact_rendering_reduces_prompt_tokens(self):
+        """Test the compact memory rendering uses far fewer prompt tokens than raw dict reprs."""
+        from chains.prompts import MODEL_SYSTEM_MESSAGE, render_profile, render_todos, render_instructions
+        from utils.helpers import estimate_tokens
+        profile = {"name": "Ana", "location": "Lisbon", "job": "Nurse", "connections": ["Rui (brother)"],
+                   "interests": ["climbing", "baking"]}
+        todos = [{"task": f"Chore number {i}", "time_to_complete": 15 if i % 2 else None,
+                  "deadline": f"2025-02-{i + 10:02d}T18:00:00" if i % 3 == 0 else None,
+                  "solutions": ["Ask a neighbour"] if i % 4 == 0 else [],
+                  "status": "in progress" if i == 5 else "not started"} for i in range(10)]
+        instructions = {"memory": "Always add a deadline for work tasks."}
+
+        def prompt(user_profile, todo, user_instructions):
+            return MODEL_SYSTEM_MESSAGE.format(task_asis_role="role", user_profile=user_profile,
+                                               todo=todo, instructions=user_instructions)
+
+        raw = prompt(profile, "\n".join(f"{t}" for t in todos), instructions)
+        compact = prompt(render_profile(profile), render_todos(todos), render_instructions(instructions))
+        memory_overhead = estimate_tokens(prompt("", "", ""))
+        assert estimate_tokens(compact) - memory_overhead < 0.5 * (estimate_tokens(raw) - memory_overhead)
+        assert "name: Ana" in compact and "Chore number 9" in compact
+        assert "None" not in compact
+
 
 class TestGraph:
     """Test graph components."""
@@ -224,6 +432,357 @@ class TestGraph:
         result = route_message(state, {}, MagicMock())
         assert result == "update_todos"
     
+    @pytest.mark.asyncio
+    async def test_atask_asis_uses_async_model(self):
+        """Test the async task_asis node awaits the model instead of blocking."""
+        from graph import nodes
+        from langchain_core.messages import AIMessage
+        from langgraph.store.memory import InMemoryStore
+        bound = MagicMock()
+        bound.ainvoke = AsyncMock(return_value=AIMessage(content="Hi there"))
+        with patch.object(nodes, 'model') as mock_model:
+            mock_model.bind_tools.return_value = bound
+            result = await nodes.atask_asis(
+                {"messages": [HumanMessage(content="Hello")]},
+                {"configurable": {"user_id": "test-user"}},
+                InMemoryStore()
+            )
+        assert result["messages"][0].content == "Hi there"
+        bound.ainvoke.assert_awaited_once()
+        bound.invoke.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_aload_memories_single_batch(self):
+        """Test all three memory namespaces are fetched in one store batch."""
+        from graph.memory import aload_memories
+        from langgraph.store.memory import InMemoryStore
+        
+        class CountingStore(InMemoryStore):
+            round_trips = 0
+            
+            async def abatch(self, ops):
+                self.round_trips += 1
+                return await super().abatch(ops)
+        
+        store = CountingStore()
+        store.put(("profile", "general", "u1"), "p", {"name": "Ana"})
+        store.put(("todo", "general", "u1"), "t", {"task": "Renew passport"})
+        store.put(("instructions", "general", "u1"), "user_instructions", {"memory": "Be brief"})
+        snapshot = await aload_memories(store, "u1", "general")
+        assert store.round_trips == 1
+        assert snapshot.user_profile == {"name": "Ana"}
+        assert [mem.value["task"] for mem in snapshot.todos] == ["Renew passport"]
+        assert snapshot.user_instructions == {"memory": "Be brief"}
+    
+    def test_load_memories_empty_store(self):
+        """Test an empty store yields an empty snapshot."""
+        from graph.memory import load_memories
+        from langgraph.store.memory import InMemoryStore
+        snapshot = load_memories(InMemoryStore(), "nobody", "general")
+        assert snapshot.user_profile is None
+        assert snapshot.todos == []
+        assert snapshot.user_instructions is None
+    
+    def test_graph_nodes_support_async(self):
+        """Test every graph node exposes an async implementation."""
+        from graph.builder import graph
+        for name in ("task_asis", "update_todos", "update_profile", "update_instructions"):
+            assert graph.builder.nodes[name].runnable.afunc is not None
+    
+    def test_route_message_fans_out_multiple_types(self):
+        """Test several memory types in one turn are dispatched in parallel with Send."""
+        from graph.edges import route_message
+        from langgraph.types import Send
+        tool_calls = [
+            {"name": "UpdateMemory", "args": {"update_type": "user"}, "id": "call-1"},
+            {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call-2"},
+            {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call-3"},
+        ]
+        state = {"messages": [MagicMock(tool_calls=tool_calls)]}
+        sends = route_message(state, {}, MagicMock())
+        assert all(isinstance(send, Send) for send in sends)
+        assert {send.node: [tc["id"] for tc in send.arg["tool_calls"]] for send in sends} == {
+            "update_profile": ["call-1"],
+            "update_todos": ["call-2", "call-3"],
+        }
+    
+    @pytest.mark.asyncio
+    async def test_multi_intent_turn_makes_two_reply_calls(self):
+        """Test a profile + todo turn updates both memories and rejoins in one task_asis pass."""
+        from graph import nodes
+        from graph.builder import graph
+        from langchain_core.messages import AIMessage, ToolMessage
+        extraction = {"responses": [], "response_metadata": []}
+        bound = MagicMock()
+        bound.ainvoke = AsyncMock(side_effect=[
+            AIMessage(content="", tool_calls=[
+                {"name": "UpdateMemory", "args": {"update_type": "user"}, "id": "call-1"},
+                {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call-2"},
+            ]),
+            AIMessage(content="Nice to meet you, Ana! Added the passport renewal."),
+        ])
+        profile_extractor = MagicMock()
+        profile_extractor.ainvoke = AsyncMock(return_value=extraction)
+        todo_extractor = MagicMock()
+        todo_extractor.with_listeners.return_value.ainvoke = AsyncMock(return_value=extraction)
+        with patch.object(nodes, 'model') as mock_model, \
+                patch.object(nodes, 'get_profile_extractor', return_value=profile_extractor), \
+                patch.object(nodes, 'get_todo_extractor', return_value=todo_extractor):
+            mock_model.bind_tools.return_value = bound
+            result = await graph.ainvoke(
+                {"messages": [HumanMessage(content="I'm Ana from Kyiv, remind me to renew my passport")]},
+                {"configurable": {"thread_id": "fan-out-test", "user_id": "test-user"}}
+            )
+        assert bound.ainvoke.await_count == 2
+        profile_extractor.ainvoke.assert_awaited_once()
+        todo_extractor.with_listeners.return_value.ainvoke.assert_awaited_once()
+        tool_messages = [m for m in result["messages"] if isinstance(m, ToolMessage)]
+        assert sorted(m.tool_call_id for m in tool_messages) == ["call-1", "call-2"]
+        assert result["messages"][-1].content.startswith("Nice to meet you")
+    
+    def test_messages_since_watermark(self):
+        """Test only turns after the watermark are returned."""
+        from graph.context import messages_since
+        from langchain_core.messages import AIMessage
+        messages = [
+            HumanMessage(content="q0", id="h0"), AIMessage(content="a0", id="a0"),
+            HumanMessage(content="q1", id="h1"), AIMessage(content="a1", id="a1"),
+        ]
+        assert messages_since(messages, None) == messages
+        assert messages_since(messages, "h0") == messages[2:]
+        assert messages_since(messages, "h1") == []
+        assert messages_since(messages, "summarized-away") == messages
+    
+    @pytest.mark.asyncio
+    async def test_todo_extraction_is_incremental(self):
+        """Test the second todo extraction only sees the turn after the watermark."""
+        from graph import nodes
+        from graph.builder import graph
+        from langchain_core.messages import AIMessage
+        
+        def todo_call(call_id):
+            return AIMessage(content="", tool_calls=[
+                {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": call_id}
+            ])
+        
+        bound = MagicMock()
+        bound.ainvoke = AsyncMock(side_effect=[
+            todo_call("call-1"), AIMessage(content="Added."),
+            todo_call("call-2"), AIMessage(content="Added too."),
+        ])
+        todo_extractor = MagicMock()
+        extract = todo_extractor.with_listeners.return_value.ainvoke = AsyncMock(
+            return_value={"responses": [], "response_metadata": []}
+        )
+        config = {"configurable": {"thread_id": "watermark-test", "user_id": "test-user"}}
+        with patch.object(nodes, 'model') as mock_model, \
+                patch.object(nodes, 'get_todo_extractor', return_value=todo_extractor):
+            mock_model.bind_tools.return_value = bound
+            await graph.ainvoke({"messages": [HumanMessage(content="Buy milk")]}, config)
+            result = await graph.ainvoke({"messages": [HumanMessage(content="Call mom")]}, config)
+        
+        first, second = [call.args[0]["messages"] for call in extract.await_args_list]
+        assert [m.content for m in first[1:]] == ["Buy milk"]
+        assert [m.content for m in second[1:]] == ["Call mom"]
+        assert result["extraction_watermarks"]["todo"] == result["messages"][-4].id
+    
+    def test_route_message_deferred_extraction(self):
+        """Test the final reply is handed to background extraction in deferred mode."""
+        from graph.edges import route_message
+        from config import app_config
+        state = {"messages": [MagicMock(tool_calls=[])]}
+        with patch.object(app_config, 'deferred_extraction', True):
+            assert route_message(state, {}, MagicMock()) == "schedule_memory_update"
+    
+    @pytest.mark.asyncio
+    async def test_deferred_turn_makes_one_foreground_call(self):
+        """Test deferred mode replies with one model call and queues extraction."""
+        from graph import nodes
+        from graph.builder import graph
+        from config import app_config
+        from langchain_core.messages import AIMessage
+        with patch.object(app_config, 'deferred_extraction', True), \
+                patch.object(nodes, 'model') as mock_model, \
+                patch.object(nodes, 'extraction_queue') as mock_queue:
+            mock_model.ainvoke = AsyncMock(return_value=AIMessage(content="Added to your list!"))
+            mock_queue.closed = False
+            result = await graph.ainvoke(
+                {"messages": [HumanMessage(content="Remind me to renew my passport")]},
+                {"configurable": {"thread_id": "deferred-test", "user_id": "test-user"}}
+            )
+        assert result["messages"][-1].content == "Added to your list!"
+        mock_model.ainvoke.assert_awaited_once()
+        mock_model.bind_tools.assert_not_called()
+        assert mock_queue.submit.call_args.args[0] == "test-user"
+
+    @pytest.mark.asyncio
+    async def test_deferred_extraction_is_incremental(self):
+        """Test background reflection only extracts the turns after the watermarks and advances them."""
+        from graph import nodes
+        from graph.builder import graph
+        from config import app_config
+        from langchain_core.messages import AIMessage
+        router = MagicMock()
+        router.ainvoke = AsyncMock(return_value=AIMessage(content="", tool_calls=[
+            {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call-1"}]))
+        todo_extractor = MagicMock()
+        extract = todo_extractor.with_listeners.return_value.ainvoke = AsyncMock(
+            return_value={"responses": [], "response_metadata": []})
+        config = {"configurable": {"thread_id": "deferred-watermark-test", "user_id": "test-user"}}
+        with patch.object(app_config, 'deferred_extraction', True), \
+                patch.object(nodes, 'model') as mock_model, \
+                patch.object(nodes, 'get_memory_router', return_value=router), \
+                patch.object(nodes, 'get_todo_extractor', return_value=todo_extractor), \
+                patch.object(nodes, 'extraction_queue') as mock_queue:
+            mock_model.ainvoke = AsyncMock(side_effect=[AIMessage(content="Added."), AIMessage(content="Added too.")])
+            mock_queue.closed = True  # reflect inline
+            await graph.ainvoke({"messages": [HumanMessage(content="Buy milk")]}, config)
+            result = await graph.ainvoke({"messages": [HumanMessage(content="Call mom")]}, config)
+
+        first, second = [call.args[0]["messages"] for call in extract.await_args_list]
+        assert [m.content for m in first[1:]] == ["Buy milk"]
+        assert [m.content for m in second[1:]] == ["Call mom"]
+        assert [m.content for m in router.ainvoke.await_args.args[0][1:]] == ["Call mom"]
+        assert result["extraction_watermarks"] == dict.fromkeys(nodes.EXTRACTION_KINDS, result["messages"][-2].id)
+
+    @pytest.mark.asyncio
+    async def test_templated_acknowledgement_skips_second_reply_call(self):
+        """Test a todo update is confirmed from the Trustcall diff without a second task_asis call."""
+        from graph import nodes
+        from graph.builder import graph
+        from config import app_config
+        from schemas.todo import ToDo
+        from utils.metrics import metrics
+        from langchain_core.messages import AIMessage
+        todo = ToDo(task="Renew passport", time_to_complete=30, deadline=None, solutions=["Book an appointment"], status="not started")
+        todo_extractor = MagicMock()
+        todo_extractor.with_listeners.return_value.ainvoke = AsyncMock(
+            return_value={"responses": [todo], "response_metadata": [{}]})
+        sniffer = MagicMock(called_tools=[[{"name": "ToDo", "args": todo.model_dump(mode="json")}]])
+        bound = MagicMock()
+        bound.ainvoke = AsyncMock(return_value=AIMessage(content="", tool_calls=[
+            {"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": "call-1"}]))
+        saved_before = metrics.llm_calls_saved
+        with patch.object(app_config, 'templated_acknowledgement', True), \
+                patch.object(nodes, 'model') as mock_model, \
+                patch.object(nodes, 'Sniffer', return_value=sniffer), \
+                patch.object(nodes, 'get_todo_extractor', return_value=todo_extractor):
+            mock_model.bind_tools.return_value = bound
+            result = await graph.ainvoke(
+                {"messages": [HumanMessage(content="Remind me to renew my passport")]},
+                {"configurable": {"thread_id": "templated-ack-test", "user_id": "test-user"}}
+            )
+        bound.ainvoke.assert_awaited_once()
+        assert result["messages"][-1].content == 'I\'ve added "Renew passport" to your ToDo list.'
+        assert metrics.llm_calls_saved == saved_before + 1
+    
+    @pytest.mark.asyncio
+    async def test_templated_acknowledgement_falls_back_for_profile(self):
+        """Test silent profile updates still get a task_asis reply in templated mode."""
+        from graph import nodes
+        from graph.builder import graph
+        from config import app_config
+        from langchain_core.messages import AIMessage
+        profile_extractor = MagicMock()
+        profile_extractor.ainvoke = AsyncMock(return_value={"responses": [], "response_metadata": []})
+        bound = MagicMock()
+        bound.ainvoke = AsyncMock(side_effect=[
+            AIMessage(content="", tool_calls=[{"name": "UpdateMemory", "args": {"update_type": "user"}, "id": "call-1"}]),
+            AIMessage(content="Nice to meet you, Ana!"),
+        ])
+        with patch.object(app_config, 'templated_acknowledgement', True), \
+                patch.object(nodes, 'model') as mock_model, \
+                patch.object(nodes, 'get_profile_extractor', return_value=profile_extractor):
+            mock_model.bind_tools.return_value = bound
+            result = await graph.ainvoke(
+                {"messages": [HumanMessage(content="I'm Ana")]},
+                {"configurable": {"thread_id": "templated-ack-profile-test", "user_id": "test-user"}}
+            )
+        assert bound.ainvoke.await_count == 2
+        assert result["messages"][-1].content == "Nice to meet you, Ana!"
+    
+    @pytest.mark.asyncio
+    async def test_repeated_turn_served_from_cache(self):
+        """Test an identical turn reuses the cached reply until the user's memories change."""
+        from graph import nodes
+        from graph.builder import graph
+        from config import app_config
+        from chains.llm_cache import ResponseCache
+        from langchain_core.messages import AIMessage
+        user_id = f"cache-user-{uuid.uuid4()}"
+        bound = MagicMock()
+        bound.kwargs = {"tools": [{"name": "UpdateMemory"}]}
+        bound.ainvoke = AsyncMock(return_value=AIMessage(content="Your list is empty."))
+
+        async def ask(thread_id):
+            result = await graph.ainvoke(
+                {"messages": [HumanMessage(content="What's on my list?")]},
+                {"configurable": {"thread_id": thread_id, "user_id": user_id}}
+            )
+            return result["messages"][-1].content
+
+        cache = ResponseCache()
+        with patch.object(app_config, 'llm_cache', True), \
+                patch.object(nodes, 'response_cache', cache), \
+                patch('chains.llm_cache.response_cache', cache), \
+                patch.object(nodes, 'model') as mock_model:
+            mock_model.bind_tools.return_value = bound
+            assert await ask(f"{user_id}-1") == "Your list is empty."
+            assert await ask(f"{user_id}-2") == "Your list is empty."
+            assert bound.ainvoke.await_count == 1
+            cache.bump(user_id)
+            await ask(f"{user_id}-3")
+            assert bound.ainvoke.await_count == 2
+        assert cache.stats()["hits"] == 1
+    
+    def test_context_window_keeps_whole_recent_turns(self):
+        """Test the token budget drops the oldest whole turns first."""
+        from graph.context import ContextWindow
+        from langchain_core.messages import AIMessage, ToolMessage
+        messages = []
+        for i in range(5):
+            messages += [
+                HumanMessage(content=f"message {i} " + "x" * 400),
+                AIMessage(content="", tool_calls=[{"name": "UpdateMemory", "args": {"update_type": "todo"}, "id": f"call-{i}"}]),
+                ToolMessage(content="updated", tool_call_id=f"call-{i}"),
+                AIMessage(content="Done"),
+            ]
+        window = ContextWindow(token_budget=300).window(messages)
+        assert isinstance(window[0], HumanMessage)
+        assert window[-1] is messages[-1]
+        assert len(window) < len(messages)
+        assert ContextWindow(token_budget=1).window(messages) == messages[-4:]
+        assert ContextWindow(token_budget=0).window(messages) == messages
+    
+    def test_context_window_overflow(self):
+        """Test older turns overflow only after summarize_after extra turns."""
+        from graph.context import ContextWindow
+        from langchain_core.messages import AIMessage
+        window = ContextWindow(keep_turns=2, summarize_after=2)
+        messages = []
+        for i in range(4):
+            messages += [HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}")]
+        assert window.overflow(messages) == []
+        messages += [HumanMessage(content="q4"), AIMessage(content="a4")]
+        assert [m.content for m in window.overflow(messages)] == ["q0", "a0", "q1", "a1", "q2", "a2"]
+    
+    @pytest.mark.asyncio
+    async def test_summarize_conversation_removes_old_turns(self):
+        """Test summarization stores the summary and removes the summarized messages."""
+        from graph import nodes
+        from graph.context import ContextWindow
+        from langchain_core.messages import AIMessage, RemoveMessage
+        messages = []
+        for i in range(4):
+            messages += [HumanMessage(content=f"q{i}", id=f"h{i}"), AIMessage(content=f"a{i}", id=f"a{i}")]
+        with patch.object(nodes, 'context_window', ContextWindow(keep_turns=1, summarize_after=1)), \
+                patch.object(nodes, 'model') as mock_model:
+            mock_model.ainvoke = AsyncMock(return_value=AIMessage(content="User asked q0-q2."))
+            update = await nodes.asummarize_conversation({"messages": messages, "summary": ""}, {}, MagicMock())
+        assert update["summary"] == "User asked q0-q2."
+        assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+        assert [m.id for m in update["messages"]] == ["h0", "a0", "h1", "a1", "h2", "a2"]
+    
     def test_health_check(self):
         """Test health check function."""
         from graph.builder import health_check
@@ -245,7 +804,9 @@ class TestGraph:
             mock_stats = {"requests_total": 5, "errors_total": 0}
             mock_metrics.get_stats.return_value = mock_stats
             result = get_metrics()
-            assert result == mock_stats
+            assert {k: result[k] for k in mock_stats} == mock_stats
+            assert {"llm_cache_hits", "llm_cache_misses", "llm_cache_size"} <= result.keys()
+            assert {"extraction_pending", "extraction_completed", "extraction_failed"} <= result.keys()
 
 
 class TestIntegration:
@@ -0,0 +1,183 @@
+"""Unit tests for retries, circuit breaking and hedging of model calls."""
+import asyncio
+import time
+import uuid
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+def _policy(**options):
+    from utils.resilience import ResiliencePolicy, CircuitBreaker
+    options.setdefault("base_delay", 0)
+    options.setdefault("breaker", CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    return ResiliencePolicy(**options)
+
+
+class TestResiliencePolicy:
+    """Test the retry, deadline and circuit-breaker behaviour against the fake model."""
+
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors(self):
+        """Test transient errors are retried until the call succeeds."""
+        from benchmarks.fake_model import FakeChatModel
+        model = FakeChatModel(responses=["hello"], errors=[ConnectionError("reset"), TimeoutError()])
+        policy = _policy()
+        result = await policy.acall(lambda: model.ainvoke("hi"))
+        assert result.content == "hello"
+        assert model.calls == 3
+        assert policy.stats()["retries"] == 2
+        assert policy.breaker.state == "closed"
+
+    def test_sync_call_retries(self):
+        """Test blocking calls use the same retry policy."""
+        from benchmarks.fake_model import FakeChatModel
+        model = FakeChatModel(responses=["hello"], errors=[ConnectionError("reset")])
+        assert _policy().call(lambda: model.invoke("hi")).content == "hello"
+        assert model.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_error_fails_immediately(self):
+        """Test errors that are not transient are raised without retrying or tripping the breaker."""
+        from benchmarks.fake_model import FakeChatModel
+        model = FakeChatModel(errors=[ValueError("bad request")] * 5)
+        policy = _policy()
+        for _ in range(5):
+            with pytest.raises(ValueError):
+                await policy.acall(lambda: model.ainvoke("hi"))
+        assert model.calls == 5
+        assert policy.breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_deadline_bounds_the_call(self):
+        """Test a slow provider is cut off at the per-call deadline."""
+        from benchmarks.fake_model import FakeChatModel
+        model = FakeChatModel(latency=1.0)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await _policy(deadline=0.1).acall(lambda: model.ainvoke("hi"))
+        assert time.monotonic() - started < 0.5
+
+    @pytest.mark.asyncio
+    async def test_circuit_opens_and_recovers(self):
+        """Test the breaker fails fast while open and closes after a successful trial call."""
+        from benchmarks.fake_model import FakeChatModel
+        from utils.resilience import CircuitBreaker, CircuitOpenError
+        model = FakeChatModel(responses=["back"], errors=[ConnectionError()] * 3)
+        policy = _policy(max_attempts=1, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.05))
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await policy.acall(lambda: model.ainvoke("hi"))
+        with pytest.raises(CircuitOpenError):
+            await policy.acall(lambda: model.ainvoke("hi"))
+        assert model.calls == 3
+
+        await asyncio.sleep(0.06)
+        assert policy.breaker.state == "half_open"
+        assert (await policy.acall(lambda: model.ainvoke("hi"))).content == "back"
+        assert policy.breaker.state == "closed"
+        assert policy.stats()["circuit_rejections"] == 1
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_beats_slow_attempt(self):
+        """Test a second attempt is fired after the p95 latency and the faster one wins."""
+        from benchmarks.fake_model import FakeChatModel
+        model = FakeChatModel(responses=["slow", "fast"], latency=[1.0, 0.01])
+        policy = _policy(hedge=True, hedge_min_samples=5)
+        for _ in range(5):
+            policy.latency.record(0.02)
+        started = time.monotonic()
+        result = await policy.acall(lambda: model.ainvoke("hi"), hedge=True)
+        assert result.content == "fast"
+        assert time.monotonic() - started < 0.5
+        assert policy.stats()["hedges"] == 1
+        assert policy.stats()["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_task_asis_survives_transient_model_error(self):
+        """Test a turn still gets a reply when the first model call fails transiently."""
+        from graph import nodes
+        from graph.builder import graph
+        from benchmarks.fake_model import FakeChatModel
+        model = FakeChatModel(responses=[AIMessage(content="Here you go")], errors=[ConnectionError("reset")])
+        with patch.object(nodes, 'model', model), \
+                patch.object(nodes, 'model_resilience', _policy()):
+            result = await graph.ainvoke(
+                {"messages": [HumanMessage(content="Hi")]},
+                {"configurable": {"thread_id": f"resilience-{uuid.uuid4()}", "user_id": "test-user"}}
+            )
+        assert result["messages"][-1].content == "Here you go"
+        assert model.calls == 2
+
+
+class TestLLMScheduler:
+    """Test the outbound model call scheduler."""
+
+    @pytest.mark.asyncio
+    async def test_interactive_calls_go_first(self):
+        """Test a waiting task_asis call is granted the next slot ahead of earlier extraction calls."""
+        from utils.llm_scheduler import LLMScheduler, INTERACTIVE, BACKGROUND
+        scheduler = LLMScheduler(max_concurrency=1)
+        release = asyncio.Event()
+        order = []
+
+        async def call(name, wait=False):
+            if wait:
+                await release.wait()
+            order.append(name)
+
+        blocker = asyncio.ensure_future(scheduler.arun(lambda: call("blocker", wait=True)))
+        await asyncio.sleep(0)
+        queued = [asyncio.ensure_future(scheduler.arun(lambda: call("extract"), BACKGROUND))]
+        await asyncio.sleep(0)
+        queued.append(asyncio.ensure_future(scheduler.arun(lambda: call("reply"), INTERACTIVE)))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == 2
+        release.set()
+        await asyncio.gather(blocker, *queued)
+        assert order == ["blocker", "reply", "extract"]
+        assert scheduler.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_is_full(self):
+        """Test calls beyond the queue depth are rejected instead of piling up."""
+        from utils.llm_scheduler import LLMScheduler, SchedulerRejectedError
+        scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=1)
+        release = asyncio.Event()
+        blocker = asyncio.ensure_future(scheduler.arun(release.wait))
+        waiting = asyncio.ensure_future(scheduler.arun(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerRejectedError):
+            await scheduler.arun(release.wait)
+        release.set()
+        await asyncio.gather(blocker, waiting)
+        assert scheduler.stats()["rejections"] == 1
+
+    @pytest.mark.asyncio
+    async def test_tokens_per_minute_limit(self):
+        """Test a call waits until the TPM bucket has refilled enough for it."""
+        from utils.llm_scheduler import LLMScheduler
+
+        async def noop():
+            return None
+
+        scheduler = LLMScheduler(tpm=60_000)
+        await scheduler.arun(noop, tokens=60_000)
+        started = time.monotonic()
+        await scheduler.arun(noop, tokens=100)
+        assert 0.05 < time.monotonic() - started < 1.0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_gives_up_its_place(self):
+        """Test a caller cancelled while queued (e.g. by a deadline) does not leak a slot."""
+        from utils.llm_scheduler import LLMScheduler
+        scheduler = LLMScheduler(max_concurrency=1)
+        release = asyncio.Event()
+        blocker = asyncio.ensure_future(scheduler.arun(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.arun(release.wait), 0.05)
+        assert scheduler.stats()["queue_depth"] == 0
+        release.set()
+        await blocker
+        assert scheduler.stats()["in_flight"] == 0
@@ -0,0 +1,1078 @@
+"""Unit tests for the storage components of the memory agent."""
+import asyncio
+import os
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from langchain_core.messages import HumanMessage
+from langgraph.store.base import PutOp
+from langgraph.store.memory import InMemoryStore
+
+
+class TestTodoRetrieval:
+    """Test relevance-ranked todo retrieval."""
+
+    def test_hash_vector_similarity(self):
+        """Test related texts score higher than unrelated ones."""
+        from storage.todo_retrieval import hash_vector, cosine
+        query = hash_vector("renew my passport")
+        assert cosine(query, hash_vector("Renew passport at the embassy")) > cosine(query, hash_vector("Buy running shoes"))
+        assert hash_vector("") == {}
+
+    def test_select_ranks_and_pins(self):
+        """Test pinned todos come first, then the most relevant ones."""
+        from storage.todo_retrieval import TodoRetrievalIndex
+        now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        index = TodoRetrievalIndex()
+        namespace = ("todo", "general", "u1")
+        index.upsert(namespace, "passport", {"task": "Renew passport", "status": "not started"})
+        index.upsert(namespace, "shoes", {"task": "Buy running shoes", "status": "not started"})
+        index.upsert(namespace, "tax", {"task": "File taxes", "status": "not started",
+                                        "deadline": (now + timedelta(days=1)).isoformat()})
+        index.upsert(namespace, "done-urgent", {"task": "Pay rent", "status": "done",
+                                                "deadline": now.isoformat()})
+        for i in range(50):
+            index.upsert(namespace, f"filler-{i}", {"task": f"Unrelated chore {i}", "status": "not started"})
+
+        selected = index.select(namespace, "When should I renew my passport?", top_k=1, now=now)
+        assert [item.key for item in selected] == ["tax", "passport"]
+
+    def test_select_respects_token_budget(self):
+        """Test the selection stops once the prompt budget is used up."""
+        from storage.todo_retrieval import TodoRetrievalIndex
+        index = TodoRetrievalIndex()
+        namespace = ("todo", "general", "u1")
+        for i in range(20):
+            index.upsert(namespace, str(i), {"task": f"Task {i} " + "x" * 200, "status": "not started"})
+        selected = index.select(namespace, "task", top_k=20, max_tokens=200)
+        assert 1 <= len(selected) < 20
+
+    def test_indexed_store_tracks_puts_and_deletes(self):
+        """Test writes through the store keep the index up to date."""
+        from storage.todo_retrieval import IndexedStore
+        store = IndexedStore(InMemoryStore())
+        namespace = ("todo", "general", "u1")
+        store.put(namespace, "a", {"task": "Renew passport"})
+        store.put(("profile", "general", "u1"), "p", {"name": "Ana"})
+        assert store.todo_index.size(namespace) == 1
+        store.delete(namespace, "a")
+        assert store.todo_index.size(namespace) == 0
+        assert store.get(("profile", "general", "u1"), "p").value == {"name": "Ana"}
+
+    @pytest.mark.asyncio
+    async def test_indexed_store_hydrates_cold_namespace(self):
+        """Test a namespace written before indexing is loaded from the store on first use."""
+        from storage.todo_retrieval import IndexedStore
+        inner = InMemoryStore()
+        namespace = ("todo", "general", "u1")
+        for i in range(15):
+            inner.put(namespace, str(i), {"task": f"Task number {i}"})
+        store = IndexedStore(inner)
+        selected = await store.arelevant_todos(namespace, "task number 3", top_k=15, max_tokens=10_000)
+        assert len(selected) == 15
+        assert store.todo_index.is_loaded(namespace)
+
+    @pytest.mark.asyncio
+    async def test_indexed_store_rereads_namespaces_after_max_age(self):
+        """Test writes made by another process sharing the store show up once the namespace expires."""
+        from storage.todo_retrieval import IndexedStore
+        shared = InMemoryStore()
+        namespace = ("todo", "general", "u1")
+        store = IndexedStore(shared, max_age=0.05)
+        await store.aput(namespace, "a", {"task": "Renew passport"})
+        assert len((await store.aquery_todos(namespace))[0]) == 1
+        shared.put(namespace, "b", {"task": "Book flights"})  # another replica's write
+        assert len((await store.aquery_todos(namespace))[0]) == 1
+        await asyncio.sleep(0.06)
+        assert {item.key for item in (await store.aquery_todos(namespace))[0]} == {"a", "b"}
+
+    def test_load_racing_a_write_is_dropped(self):
+        """Test a load read before an indexed write cannot overwrite that write."""
+        from storage.todo_retrieval import TodoRetrievalIndex
+        index = TodoRetrievalIndex()
+        namespace = ("todo", "general", "u1")
+        generation = index.generation(namespace)
+        index.upsert(namespace, "a", {"task": "Renew passport"})
+        assert not index.load(namespace, [], generation)
+        assert index.size(namespace) == 1 and not index.is_loaded(namespace)
+        assert index.load(namespace, [], index.generation(namespace))
+
+
+class TestTodoQueries:
+    """Test the status, deadline and update-time todo indexes."""
+
+    NAMESPACE = ("todo", "general", "u1")
+
+    def _index(self):
+        from langgraph.store.base import Item
+        from storage.todo_retrieval import TodoRetrievalIndex
+        index = TodoRetrievalIndex()
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        index.load(self.NAMESPACE, [
+            Item(value={
+                "task": f"Task {i}",
+                "status": ["not started", "in progress", "done"][i % 3],
+                "deadline": (start + timedelta(days=i)).isoformat() if i % 2 == 0 else None,
+            }, key=f"t{i:02d}", namespace=self.NAMESPACE, created_at=start, updated_at=start + timedelta(minutes=i))
+            for i in range(30)
+        ])
+        return index, start
+
+    def test_pages_cover_matches_once_newest_first(self):
+        """Test status-filtered pages are newest first and a cursor walks every match exactly once."""
+        index, _ = self._index()
+        keys, cursor = [], None
+        while True:
+            page, cursor = index.query(self.NAMESPACE, statuses=["not started", "in progress"], limit=7, cursor=cursor)
+            keys.extend(item.key for item in page)
+            if cursor is None:
+                break
+        assert keys == [f"t{i:02d}" for i in reversed(range(30)) if i % 3 != 2]
+
+    def test_due_before_orders_by_deadline(self):
+        """Test due_before keeps only earlier deadlines, soonest first, combined with a status filter."""
+        index, start = self._index()
+        page, cursor = index.query(self.NAMESPACE, due_before=start + timedelta(days=10), limit=100)
+        assert [item.key for item in page] == ["t00", "t02", "t04", "t06", "t08"]
+        assert cursor is None
+        page, _ = index.query(self.NAMESPACE, statuses=["done"], due_before=start + timedelta(days=30))
+        assert [item.key for item in page] == ["t02", "t08", "t14", "t20", "t26"]
+
+    def test_writes_move_items_between_indexes(self):
+        """Test status changes and deletes update every index."""
+        index, _ = self._index()
+        index.upsert(self.NAMESPACE, "t00", {"task": "Task 0", "status": "done"})
+        index.delete(self.NAMESPACE, "t03")
+        done, _ = index.query(self.NAMESPACE, statuses=["done"])
+        assert done[0].key == "t00"
+        not_started, _ = index.query(self.NAMESPACE, statuses=["not started"])
+        assert {"t00", "t03"}.isdisjoint(item.key for item in not_started)
+        everything, _ = index.query(self.NAMESPACE)
+        assert len(everything) == 29
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors and cursors from another ordering are rejected."""
+        index, start = self._index()
+        _, cursor = index.query(self.NAMESPACE, limit=5)
+        with pytest.raises(ValueError):
+            index.query(self.NAMESPACE, cursor="not-a-cursor")
+        with pytest.raises(ValueError):
+            index.query(self.NAMESPACE, due_before=start, cursor=cursor)
+
+    def test_select_restricted_to_statuses(self):
+        """Test retrieval can be limited to open todos."""
+        index, _ = self._index()
+        selected = index.select(self.NAMESPACE, "task", top_k=30, max_tokens=100_000, statuses=["not started"])
+        assert selected and all(item.value["status"] == "not started" for item in selected)
+
+    def test_task_asis_sees_only_prompt_statuses(self):
+        """Test TODO_PROMPT_STATUSES limits the todos task_asis gets, with or without retrieval."""
+        from config import app_config
+        from graph.memory import load_memories, select_todos
+        from storage.todo_retrieval import IndexedStore
+        store = IndexedStore(InMemoryStore())
+        for i in range(6):
+            store.put(self.NAMESPACE, str(i), {"task": f"Task {i}", "status": "done" if i % 2 else "in progress"})
+        for retrieval in (True, False):
+            with patch.object(app_config, "todo_retrieval", retrieval), \
+                    patch.object(app_config, "todo_prompt_statuses", ["in progress"]):
+                memories = select_todos(store, load_memories(store, "u1", "general"), "u1", "general", "task")
+            assert sorted(item.key for item in memories.todos) == ["0", "2", "4"]
+
+    @pytest.mark.asyncio
+    async def test_query_hydrates_or_falls_back(self):
+        """Test IndexedStore hydrates a cold namespace and plain stores are queried without an index."""
+        from graph.memory import aquery_todos
+        from storage.todo_retrieval import IndexedStore
+        inner = InMemoryStore()
+        for i in range(12):
+            inner.put(self.NAMESPACE, str(i), {"task": f"Task {i}", "status": "done" if i < 4 else "not started"})
+        for store in (IndexedStore(inner), inner):
+            page, cursor = await aquery_todos(store, "u1", "general", statuses=["not started"], limit=5)
+            assert len(page) == 5 and cursor is not None
+            rest, cursor = await aquery_todos(store, "u1", "general", statuses=["not started"], limit=5, cursor=cursor)
+            assert len(rest) == 3 and cursor is None
+
+
+class TestSqliteStore:
+    """Test the SQLite-backed BaseStore."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        from storage.sqlite_store import SqliteStore
+        store = SqliteStore(str(tmp_path / "store.db"))
+        yield store
+        store.close()
+
+    def test_put_get_delete(self, store):
+        """Test items round-trip as JSON and deletes remove them."""
+        namespace = ("profile", "general", "u1")
+        store.put(namespace, "user_profile", {"name": "Ana", "interests": ["climbing"]})
+        item = store.get(namespace, "user_profile")
+        assert item.value == {"name": "Ana", "interests": ["climbing"]}
+        assert item.namespace == namespace
+        created_at = item.created_at
+        store.put(namespace, "user_profile", {"name": "Ana B."})
+        updated = store.get(namespace, "user_profile")
+        assert updated.value == {"name": "Ana B."} and updated.created_at == created_at
+        store.delete(namespace, "user_profile")
+        assert store.get(namespace, "user_profile") is None
+
+    def test_search_is_scoped_to_namespace_prefix(self, store):
+        """Test a prefix search never returns items from sibling namespaces."""
+        store.put(("todo", "general", "u1"), "a", {"task": "A"})
+        store.put(("todo", "general", "u10"), "b", {"task": "B"})
+        store.put(("todo", "general", "u1", "archive"), "c", {"task": "C"})
+        assert [i.key for i in store.search(("todo", "general", "u1"))] == ["a", "c"]
+        assert len(store.search(("todo",))) == 3
+
+    def test_batch_rejects_dotted_labels(self, store):
+        """Test raw batches cannot store a label that would read back as two namespace levels."""
+        from langgraph.store.base import InvalidNamespaceError, PutOp
+        with pytest.raises(InvalidNamespaceError):
+            store.batch([PutOp(("todo", "general", "john.doe"), "a", {"task": "A"})])
+        assert store.search(("todo", "general", "john")) == []
+
+    def test_search_filters_match_in_memory_store(self, store):
+        """Test pushed-down and residual filters give the same results as InMemoryStore."""
+        reference = InMemoryStore()
+        namespace = ("todo", "general", "u1")
+        for i, status in enumerate(["not started", "done", "in progress", "done"]):
+            value = {"task": f"Task {i}", "status": status, "time_to_complete": i * 10,
+                     "solutions": ["x"] if i % 2 else [], "deadline": None}
+            store.put(namespace, str(i), value)
+            reference.put(namespace, str(i), value)
+        filters = [
+            {"status": "done"},
+            {"status": {"$ne": "done"}},
+            {"time_to_complete": {"$gte": 10, "$lt": 30}},
+            {"deadline": None},
+            {"solutions": ["x"]},
+        ]
+        for filter in filters:
+            expected = [i.key for i in reference.search(namespace, filter=filter)]
+            assert [i.key for i in store.search(namespace, filter=filter)] == expected, filter
+        assert [i.key for i in store.search(namespace, limit=2, offset=1)] == ["1", "2"]
+
+    @pytest.mark.asyncio
+    async def test_abatch_and_list_namespaces(self, store):
+        """Test async batches and namespace listing."""
+        from langgraph.store.base import GetOp
+        await store.abatch([
+            PutOp(("profile", "general", "u1"), "p", {"name": "Ana"}),
+            PutOp(("todo", "general", "u1"), "t", {"task": "A"}),
+        ])
+        results = await store.abatch([GetOp(("profile", "general", "u1"), "p"), GetOp(("todo", "general", "u2"), "t")])
+        assert results[0].value == {"name": "Ana"} and results[1] is None
+        assert store.list_namespaces(prefix=("todo",)) == [("todo", "general", "u1")]
+        assert store.list_namespaces(max_depth=1) == [("profile",), ("todo",)]
+
+    def test_persists_across_connections(self, tmp_path):
+        """Test memories survive reopening the database (e.g. a restart)."""
+        from storage.sqlite_store import SqliteStore
+        path = str(tmp_path / "store.db")
+        first = SqliteStore(path)
+        first.put(("instructions", "general", "u1"), "user_instructions", {"memory": "Add deadlines"})
+        first.close()
+        reopened = SqliteStore(path)
+        assert reopened.get(("instructions", "general", "u1"), "user_instructions").value == {"memory": "Add deadlines"}
+        reopened.close()
+
+
+@pytest.fixture
+def redis_client():
+    """A RedisClient connected to a fresh in-process Redis stand-in."""
+    from tests.fake_redis import FakeRedisServer
+    from storage.redis_client import RedisClient
+    with FakeRedisServer() as server:
+        client = RedisClient(server.url, max_connections=4)
+        yield client
+        client.close()
+
+
+async def _chat(saver, thread_id, turns):
+    """Run `turns` scripted turns on `thread_id` with `saver` as the checkpointer."""
+    from graph import nodes
+    from graph.builder import builder
+    from benchmarks.fake_model import FakeChatModel
+    graph = builder.compile(checkpointer=saver, store=InMemoryStore())
+    config = {"configurable": {"thread_id": thread_id, "user_id": "test-user"}}
+    with patch.object(nodes, 'model', FakeChatModel(responses=["Noted, " + "details " * 40])):
+        for turn in range(turns):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"Message {turn}")]}, config)
+    return graph, config
+
+
+class TestSqliteCheckpointer:
+    """Test the SQLite checkpointer."""
+
+    @pytest.fixture
+    def saver(self, tmp_path):
+        from storage.sqlite_checkpointer import SqliteSaver
+        saver = SqliteSaver(str(tmp_path / "checkpoints.db"))
+        yield saver
+        saver.close()
+
+    def test_compressed_serializer_round_trip(self):
+        """Test large values are compressed, small ones are not, and both load."""
+        from storage.sqlite_checkpointer import CompressedSerializer
+        serde = CompressedSerializer(codec="zlib", min_size=64)
+        large = {"messages": ["the same words again"] * 50}
+        type_, data = serde.dumps_typed(large)
+        assert type_ == "msgpack+zlib"
+        assert serde.loads_typed((type_, data)) == large
+        assert serde.dumps_typed({"a": 1})[0] == "msgpack"
+        assert CompressedSerializer(codec="none").loads_typed((type_, data)) == large
+
+    @pytest.mark.asyncio
+    async def test_state_survives_reopen(self, saver, tmp_path):
+        """Test a conversation resumes from the database after a restart."""
+        from storage.sqlite_checkpointer import SqliteSaver
+        await _chat(saver, "persisted", turns=3)
+        saver.close()
+        reopened = SqliteSaver(str(tmp_path / "checkpoints.db"))
+        graph, config = await _chat(reopened, "persisted", turns=1)
+        messages = (await graph.aget_state(config)).values["messages"]
+        assert [m.content for m in messages if m.type == "human"] == [f"Message {i}" for i in (0, 1, 2, 0)]
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_growing_messages_are_stored_as_tails(self, saver):
+        """Test each turn adds roughly constant bytes instead of a copy of the whole history."""
+        graph, config = await _chat(saver, "deltas", turns=2)
+        early = saver.stored_bytes()
+        await _chat(saver, "deltas", turns=1)
+        first_turn = saver.stored_bytes() - early
+        await _chat(saver, "deltas", turns=8)
+        before_last = saver.stored_bytes()
+        await _chat(saver, "deltas", turns=1)
+        assert saver.stored_bytes() - before_last < first_turn * 1.5
+        tails = saver._conn.execute(
+            "SELECT COUNT(*) FROM blobs WHERE channel = 'messages' AND base_version IS NOT NULL").fetchone()[0]
+        assert tails > 0
+        assert len((await graph.aget_state(config)).values["messages"]) == 24
+
+    def test_snapshot_bounds_delta_chains(self, tmp_path):
+        """Test a channel is stored in full again every snapshot_every versions."""
+        from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+        from storage.sqlite_checkpointer import SqliteSaver
+        saver = SqliteSaver(str(tmp_path / "checkpoints.db"), snapshot_every=3)
+        config = {"configurable": {"thread_id": "t", "checkpoint_ns": ""}}
+        checkpoint, version = empty_checkpoint(), None
+        for step in range(7):
+            version = saver.get_next_version(version, None)
+            checkpoint = create_checkpoint(checkpoint, None, step)
+            checkpoint["channel_values"] = {"items": list(range(step + 1))}
+            checkpoint["channel_versions"] = {"items": version}
+            config = saver.put(config, checkpoint, {"step": step}, {"items": version})
+        bases = [row[0] for row in saver._conn.execute("SELECT base_version FROM blobs ORDER BY version")]
+        assert [base is None for base in bases] == [True, False, False, True, False, False, True]
+        assert saver.get_tuple(config).checkpoint["channel_values"] == {"items": list(range(7))}
+        saver.close()
+
+    @pytest.mark.asyncio
+    async def test_list_filters_and_delete_thread(self, saver):
+        """Test listing newest first with filters and limits, and deleting a thread."""
+        graph, config = await _chat(saver, "listed", turns=2)
+        await _chat(saver, "other", turns=1)
+        checkpoints = list(saver.list(config))
+        assert checkpoints[0].config == (await saver.aget_tuple(config)).config
+        assert [c.checkpoint["id"] for c in checkpoints] == sorted((c.checkpoint["id"] for c in checkpoints), reverse=True)
+        assert len(list(saver.list(config, limit=2))) == 2
+        assert all(c.metadata["source"] == "input" for c in saver.list(config, filter={"source": "input"}))
+        older = list(saver.list(config, before=checkpoints[0].config))
+        assert len(older) == len(checkpoints) - 1
+        await saver.adelete_thread("listed")
+        assert saver.get_tuple(config) is None
+        assert saver.get_tuple({"configurable": {"thread_id": "other"}}) is not None
+
+
+class TestCheckpointRetention:
+    """Test checkpoint pruning, idle-thread expiry and the size cap."""
+
+    @pytest.fixture(params=["memory", "sqlite", "redis"])
+    def saver(self, request, tmp_path):
+        from langgraph.checkpoint.memory import MemorySaver
+        from storage.redis_checkpointer import RedisSaver
+        from storage.sqlite_checkpointer import SqliteSaver
+        if request.param == "memory":
+            yield MemorySaver()
+            return
+        if request.param == "redis":
+            yield RedisSaver(request.getfixturevalue("redis_client"))
+            return
+        saver = SqliteSaver(str(tmp_path / "checkpoints.db"))
+        yield saver
+        saver.close()
+
+    @pytest.mark.asyncio
+    async def test_keep_last_prunes_old_checkpoints(self, saver):
+        """Test only the newest checkpoints survive and the thread still resumes intact."""
+        from storage.checkpoint_retention import CheckpointRetention
+        graph, config = await _chat(saver, "pruned", turns=6)
+        retention = CheckpointRetention(saver, keep_last=2, idle_ttl=0)
+        removed = retention.sweep()
+        assert removed["pruned_checkpoints"] > 0 and removed["bytes_reclaimed"] > 0
+        assert len(list(saver.list(config))) == 2
+        assert len((await graph.aget_state(config)).values["messages"]) == 12
+        graph, config = await _chat(saver, "pruned", turns=1)
+        assert len((await graph.aget_state(config)).values["messages"]) == 14
+        assert retention.sweep()["pruned_checkpoints"] > 0
+
+    @pytest.mark.asyncio
+    async def test_idle_threads_expire_unless_active(self, saver):
+        """Test threads idle past the TTL are deleted, except those with a run in progress."""
+        from storage.checkpoint_retention import CheckpointRetention
+        await _chat(saver, "idle", turns=1)
+        await _chat(saver, "busy", turns=1)
+        retention = CheckpointRetention(saver, keep_last=0, idle_ttl=60)
+        retention.is_active = lambda thread_id: thread_id == "busy"
+        assert retention.sweep()["expired_threads"] == 0
+        removed = retention.sweep(now=time.time() + 61)
+        assert removed["expired_threads"] == 1
+        assert saver.get_tuple({"configurable": {"thread_id": "idle"}}) is None
+        assert saver.get_tuple({"configurable": {"thread_id": "busy"}}) is not None
+        assert retention.stats()["threads"] == 1
+
+    @pytest.mark.asyncio
+    async def test_size_cap_evicts_least_recently_active(self, saver):
+        """Test the cap deletes the threads that were active longest ago first."""
+        from storage.checkpoint_retention import CheckpointRetention
+        for thread_id in ("oldest", "middle", "newest"):
+            await _chat(saver, thread_id, turns=1)
+        sizes = CheckpointRetention(saver, keep_last=0, idle_ttl=0)._backend.usage()
+        retention = CheckpointRetention(saver, keep_last=0, idle_ttl=0,
+                                        max_bytes=sizes["middle"].bytes + sizes["newest"].bytes)
+        removed = retention.sweep()
+        assert removed["evicted_threads"] == 1
+        assert removed["bytes_reclaimed"] == sizes["oldest"].bytes
+        assert saver.get_tuple({"configurable": {"thread_id": "oldest"}}) is None
+        assert saver.get_tuple({"configurable": {"thread_id": "newest"}}) is not None
+        assert retention.stats()["stored_bytes"] <= retention.max_bytes
+
+    @pytest.mark.asyncio
+    async def test_background_sweeps(self, saver):
+        """Test the lifespan task sweeps periodically and stops cleanly."""
+        from storage.checkpoint_retention import CheckpointRetention
+        retention = CheckpointRetention(saver, interval=0.01)
+        retention.start()
+        await asyncio.sleep(0.1)
+        await retention.stop()
+        assert retention.stats()["sweeps"] >= 2
+
+
+class _CountingStore(InMemoryStore):
+    """InMemoryStore that records every batch it receives."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def batch(self, ops):
+        ops = list(ops)
+        self.batches.append(ops)
+        return super().batch(ops)
+
+    async def abatch(self, ops):
+        return self.batch(ops)
+
+
+class TestCachedStore:
+    """Test the read-through namespace cache."""
+
+    def test_ttl_is_capped_for_shared_stores(self):
+        """Test SQLite and Redis stores get a cache TTL no longer than the todo index's max age."""
+        from graph.builder import create_store_cache
+        from config import app_config
+        for backend, ttl in (("memory", 60), ("sqlite", 5), ("redis", 5)):
+            with patch.multiple(app_config, store_backend=backend, store_cache_mb=1,
+                                store_cache_ttl=60, todo_index_max_age=5):
+                assert create_store_cache(InMemoryStore()).ttl_seconds == ttl
+        with patch.object(app_config, "store_cache_mb", 0):
+            assert create_store_cache(InMemoryStore()) is None
+
+    def test_repeated_reads_hit_the_cache(self):
+        """Test a second identical read is served without touching the store."""
+        from storage.cached_store import CachedStore
+        inner = _CountingStore()
+        store = CachedStore(inner)
+        namespace = ("profile", "general", "u1")
+        store.put(namespace, "user_profile", {"name": "Ana"})
+        inner.batches.clear()
+        assert store.search(namespace)[0].value == {"name": "Ana"}
+        assert store.search(namespace)[0].value == {"name": "Ana"}
+        assert store.get(namespace, "user_profile").value == {"name": "Ana"}
+        assert store.get(namespace, "user_profile").value == {"name": "Ana"}
+        assert len(inner.batches) == 2
+        stats = store.stats()
+        assert stats["hits"] == 2 and stats["misses"] == 2 and stats["hit_rate"] == 0.5
+
+    def test_writes_invalidate_namespace_and_prefixes(self):
+        """Test a put is visible to the next get, search and prefix search."""
+        from storage.cached_store import CachedStore
+        store = CachedStore(InMemoryStore())
+        namespace = ("todo", "general", "u1")
+        store.put(namespace, "a", {"task": "A"})
+        other = ("todo", "general", "u2")
+        store.put(other, "z", {"task": "Z"})
+        assert [i.key for i in store.search(namespace)] == ["a"]
+        assert len(store.search(("todo",))) == 2
+        store.search(other)
+        store.put(namespace, "b", {"task": "B"})
+        assert [i.key for i in store.search(namespace)] == ["a", "b"]
+        assert len(store.search(("todo",))) == 3
+        store.delete(namespace, "a")
+        assert store.get(namespace, "a") is None
+        assert store.stats()["invalidations"] == 4
+        # The unrelated user's namespace stayed cached
+        hits = store.stats()["hits"]
+        store.search(other)
+        assert store.stats()["hits"] == hits + 1
+
+    def test_lru_eviction_by_size(self):
+        """Test least recently used namespaces are evicted once the size budget is exceeded."""
+        from storage.cached_store import CachedStore
+        store = CachedStore(InMemoryStore(), max_bytes=2000)
+        for user in ("u1", "u2", "u3"):
+            store.put(("profile", "general", user), "p", {"bio": "x" * 500})
+        store.search(("profile", "general", "u1"))
+        store.search(("profile", "general", "u2"))
+        store.search(("profile", "general", "u1"))
+        store.search(("profile", "general", "u3"))
+        stats = store.stats()
+        assert stats["evictions"] == 1 and stats["namespaces"] == 2
+        assert stats["size_bytes"] <= 2000
+        store.search(("profile", "general", "u1"))
+        assert store.stats()["hits"] == stats["hits"] + 1
+
+    def test_entries_expire(self):
+        """Test cached reads are refreshed after the TTL (writes from other processes)."""
+        from storage.cached_store import CachedStore
+        inner = InMemoryStore()
+        store = CachedStore(inner, ttl_seconds=0.05)
+        namespace = ("instructions", "general", "u1")
+        store.put(namespace, "user_instructions", {"memory": "old"})
+        assert store.get(namespace, "user_instructions").value == {"memory": "old"}
+        inner.put(namespace, "user_instructions", {"memory": "new"})
+        assert store.get(namespace, "user_instructions").value == {"memory": "old"}
+        time.sleep(0.06)
+        assert store.get(namespace, "user_instructions").value == {"memory": "new"}
+
+    @pytest.mark.asyncio
+    async def test_abatch_forwards_only_misses(self):
+        """Test a batched memory load sends only the uncached namespaces to the store."""
+        from graph.memory import aload_memories
+        from storage.cached_store import CachedStore
+        inner = _CountingStore()
+        store = CachedStore(inner)
+        await store.aput(("todo", "general", "u1"), "t", {"task": "A"})
+        await aload_memories(store, "u1", "general")
+        store.invalidate(("todo", "general", "u1"))
+        inner.batches.clear()
+        memories = await aload_memories(store, "u1", "general")
+        assert [item.value for item in memories.todos] == [{"task": "A"}]
+        assert [[op.namespace_prefix for op in ops] for ops in inner.batches] == [[("todo", "general", "u1")]]
+
+
+class _FlakyStore(_CountingStore):
+    """Store whose first `failures` batches raise, optionally after a delay."""
+
+    def __init__(self, failures=0, delay=0.0):
+        super().__init__()
+        self.failures = failures
+        self.delay = delay
+
+    async def abatch(self, ops):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("store unavailable")
+        return self.batch(ops)
+
+
+class TestUnitOfWork:
+    """Test batched and write-behind persistence of memory updates."""
+
+    def test_commit_writes_one_batch(self):
+        """Test every buffered put goes to the store in a single batch, then on_commit runs."""
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        store, committed = _CountingStore(), []
+        work = UnitOfWork(store, "u1", StoreWriter())
+        for i in range(10):
+            work.put(("todo", "general", "u1"), str(i), {"task": f"Task {i}"})
+        work.commit(on_commit=lambda: committed.append(True))
+        assert len(store.batches) == 1 and len(store.batches[0]) == 10
+        assert committed == [True]
+        assert len(store.search(("todo", "general", "u1"), limit=20)) == 10
+
+    def test_commit_is_atomic_on_sqlite(self, tmp_path):
+        """Test a failing write leaves none of the node's documents behind."""
+        from storage.sqlite_store import SqliteStore
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        store = SqliteStore(str(tmp_path / "store.db"))
+        work = UnitOfWork(store, "u1", StoreWriter())
+        work.put(("todo", "general", "u1"), "a", {"task": "A"})
+        work.put(("todo", "general", "u1"), "b", {"task": object()})
+        with pytest.raises(TypeError):
+            work.commit()
+        assert store.search(("todo", "general", "u1")) == []
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_dotted_namespace_labels_are_rejected(self, tmp_path):
+        """Test a user ID containing "." cannot store memories that read back under another user."""
+        from langgraph.store.base import InvalidNamespaceError
+        from storage.sqlite_store import SqliteStore
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        store = SqliteStore(str(tmp_path / "store.db"))
+        writer = StoreWriter()
+        work = UnitOfWork(store, "john.doe", writer)
+        with pytest.raises(InvalidNamespaceError):
+            work.put(("todo", "general", "john.doe"), "a", {"task": "A"})
+        with pytest.raises(InvalidNamespaceError):
+            await writer.aput(store, ("profile", "general", "john.doe"), "user_profile", {"name": "John"})
+        assert store.search(("todo", "general", "john")) == []
+        assert store.search(("profile", "general", "john")) == []
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_write_behind_flushes_in_background(self):
+        """Test acommit returns before the flush and wait() makes the writes visible."""
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        store = _FlakyStore(delay=0.05)
+        writer = StoreWriter(write_behind=True)
+        work = UnitOfWork(store, "u1", writer)
+        work.put(("profile", "general", "u1"), "user_profile", {"name": "Ana"})
+        started = time.monotonic()
+        await work.acommit()
+        assert time.monotonic() - started < 0.04
+        assert writer.stats()["pending"] == 1
+        await writer.wait("u1")
+        assert store.get(("profile", "general", "u1"), "user_profile").value == {"name": "Ana", "_version": 1}
+        stats = writer.stats()
+        assert stats["pending"] == 0 and stats["batches"] == 1 and stats["avg_flush_ms"] >= 40
+
+    @pytest.mark.asyncio
+    async def test_write_behind_retries_then_counts_lost_writes(self):
+        """Test transient flush failures are retried and exhausted retries are reported."""
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        store = _FlakyStore(failures=1)
+        writer = StoreWriter(write_behind=True, max_attempts=2, retry_delay=0)
+        work = UnitOfWork(store, "u1", writer)
+        work.put(("todo", "general", "u1"), "a", {"task": "A"})
+        await work.acommit()
+        await writer.wait("u1")
+        assert writer.stats()["retries"] == 1 and store.get(("todo", "general", "u1"), "a") is not None
+
+        store.failures = 2
+        work.put(("todo", "general", "u1"), "b", {"task": "B"})
+        await work.acommit(on_commit=pytest.fail)
+        await writer.wait("u1")
+        stats = writer.stats()
+        assert stats["failed_batches"] == 1 and stats["lost_writes"] == 1
+        assert store.get(("todo", "general", "u1"), "b") is None
+
+    @pytest.mark.asyncio
+    async def test_memory_load_waits_for_pending_flush(self):
+        """Test the next turn's memory load sees writes still being flushed."""
+        from graph.memory import aload_memories
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        writer = StoreWriter(write_behind=True)
+        store = _FlakyStore(delay=0.05)
+        with patch("graph.memory.store_writer", writer):
+            work = UnitOfWork(store, "u1", writer)
+            work.put(("instructions", "general", "u1"), "user_instructions", {"memory": "Add deadlines"})
+            await work.acommit()
+            memories = await aload_memories(store, "u1", "general")
+        assert memories.user_instructions == {"memory": "Add deadlines"}
+
+    @pytest.mark.asyncio
+    async def test_sync_memory_load_waits_for_pending_flush(self):
+        """Test a sync load on a worker thread blocks until the flush queued by an async turn lands."""
+        from graph.memory import load_memories
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        writer = StoreWriter(write_behind=True)
+        store = _FlakyStore(delay=0.05)
+        with patch("graph.memory.store_writer", writer):
+            work = UnitOfWork(store, "u1", writer)
+            work.put(("instructions", "general", "u1"), "user_instructions", {"memory": "Add deadlines"})
+            await work.acommit()
+            with pytest.raises(RuntimeError):
+                writer.wait_blocking("u1")  # on the loop running the flush
+            memories = await asyncio.to_thread(load_memories, store, "u1", "general")
+        assert memories.user_instructions == {"memory": "Add deadlines"}
+
+
+class TestVersionedWrites:
+    """Test compare-and-set puts, conflict merging and re-extraction."""
+
+    NS = ("profile", "general", "u1")
+
+    @pytest.fixture(params=["memory", "journaled", "sqlite", "redis"])
+    def store(self, request, tmp_path):
+        from storage.journaled_store import JournaledStore
+        from storage.redis_store import RedisStore
+        from storage.sqlite_store import SqliteStore
+        from storage.versioning import VersionedInMemoryStore
+        if request.param == "memory":
+            yield VersionedInMemoryStore()
+        elif request.param == "journaled":
+            store = JournaledStore(str(tmp_path / "journal"), fsync_interval=0)
+            yield store
+            store.close()
+        elif request.param == "sqlite":
+            store = SqliteStore(str(tmp_path / "store.db"))
+            yield store
+            store.close()
+        else:
+            yield RedisStore(request.getfixturevalue("redis_client"))
+
+    def test_compare_and_set(self, store):
+        """Test a versioned put applies only on top of the version it names, and a conflict writes nothing."""
+        from storage.versioning import VersionConflictError
+        store.put(self.NS, "p", {"name": "Ana", "_version": 1})
+        with pytest.raises(VersionConflictError) as conflict:
+            store.put(self.NS, "p", {"name": "Bea", "_version": 1})
+        assert conflict.value.conflicts[0][1:] == ("p", 0, 1)
+        store.put(self.NS, "p", {"name": "Bea", "_version": 2})
+        with pytest.raises(VersionConflictError):
+            store.batch([PutOp(self.NS, "new", {"x": 1, "_version": 1}), PutOp(self.NS, "p", {"name": "C", "_version": 2})])
+        assert store.get(self.NS, "new") is None
+        assert store.get(self.NS, "p").value == {"name": "Bea", "_version": 2}
+
+    def test_concurrent_writers_lose_no_update(self, store):
+        """Test threads incrementing one document with read/compare-and-set retries lose no increment."""
+        from concurrent.futures import ThreadPoolExecutor
+        from storage.versioning import VersionConflictError, version_of
+
+        def increment(_):
+            while True:
+                item = store.get(self.NS, "counter")
+                value = item.value if item else {"count": 0}
+                try:
+                    store.put(self.NS, "counter", {"count": value["count"] + 1, "_version": version_of(value) + 1})
+                    return
+                except VersionConflictError:
+                    continue
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(increment, range(40)))
+        assert store.get(self.NS, "counter").value == {"count": 40, "_version": 40}
+
+    def test_unit_of_work_merges_disjoint_changes(self):
+        """Test a commit that lost a race to another writer's change of a different field merges and retries."""
+        from storage.cached_store import CachedStore
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        from storage.versioning import VersionedInMemoryStore
+        inner = VersionedInMemoryStore()
+        store, writer = CachedStore(inner), StoreWriter()
+        store.put(self.NS, "p", {"name": "Ana", "age": 30, "_version": 1})
+        work = UnitOfWork(store, "u1", writer)
+        work.read([store.get(self.NS, "p")])
+        # Another process updates the age behind the cache's back
+        inner.put(self.NS, "p", {"name": "Ana", "age": 31, "_version": 2})
+        work.put(self.NS, "p", {"name": "Ana B.", "age": 30})
+        work.commit()
+        assert store.get(self.NS, "p").value == {"name": "Ana B.", "age": 31, "_version": 3}
+        assert writer.stats()["conflicts"] == 1 and writer.stats()["merges"] == 1
+
+    def test_overlapping_changes_extract_again(self):
+        """Test a conflict on the same field reaches the node, which extracts again from the fresh document."""
+        from graph import nodes
+        from storage.unit_of_work import StoreWriter, UnitOfWork
+        from storage.versioning import VersionedInMemoryStore
+        store, writer = VersionedInMemoryStore(), StoreWriter()
+        store.put(self.NS, "p", {"name": "Ana", "_version": 1})
+        attempts = []
+
+        def extract_and_save():
+            existing = store.get(self.NS, "p")
+            attempts.append(existing.value["name"])
+            if len(attempts) == 1:
+                store.put(self.NS, "p", {"name": "Ana C.", "_version": 2})
+            work = UnitOfWork(store, "u1", writer)
+            work.read([existing])
+            work.put(self.NS, "p", {"name": existing.value["name"] + "!"})
+            work.commit()
+
+        with patch.object(nodes, "store_writer", writer):
+            nodes._with_reextraction(extract_and_save)
+        assert attempts == ["Ana", "Ana C."]
+        assert store.get(self.NS, "p").value == {"name": "Ana C.!", "_version": 3}
+        stats = writer.stats()
+        assert stats["conflicts"] == 1 and stats["merges"] == 0 and stats["reextractions"] == 1
+
+    def test_merge_documents(self):
+        """Test three-way merges keep both sides' changes and refuse overlapping ones."""
+        from storage.versioning import merge_documents
+        base = {"name": "Ana", "age": 30, "city": "Kyiv", "_version": 4}
+        assert merge_documents(base, {"name": "Ana", "age": 30}, {**base, "age": 31, "_version": 5}) == \
+            {"name": "Ana", "age": 31}
+        assert merge_documents(base, {**base, "age": 31}, {**base, "city": "Lviv"}) == \
+            {"name": "Ana", "age": 31, "city": "Lviv"}
+        assert merge_documents(base, {**base, "age": 31}, {**base, "age": 32}) is None
+        assert merge_documents(base, {**base, "age": 31}, None) is None
+
+    def test_redis_transaction_aborts_on_watched_write(self, redis_client):
+        """Test EXEC applies nothing when a watched key changed between the read and the write."""
+        from storage.redis_client import RedisClient
+        other = RedisClient(redis_client.url)
+
+        def build(replies):
+            # Another client writes the watched key before EXEC
+            other.execute("SET", "k", "theirs")
+            return [("SET", "k", "mine")]
+
+        assert redis_client.run(redis_client.transaction(["k"], [("GET", "k")], build)) is None
+        assert redis_client.execute("GET", "k") == b"theirs"
+        other.close()
+        assert redis_client.run(redis_client.transaction(["k"], [("GET", "k")], lambda replies: [("SET", "k", "mine")])) == ["OK"]
+
+
+class TestJournaledStore:
+    """Test journal replay and snapshot restore of the in-memory store."""
+
+    NS = ("todo", "general", "u1")
+
+    def _open(self, tmp_path, **kwargs):
+        from storage.journaled_store import JournaledStore
+        return JournaledStore(str(tmp_path / "journal"), **kwargs)
+
+    def test_restores_from_journal(self, tmp_path):
+        """Test puts and deletes survive a restart, timestamps included."""
+        store = self._open(tmp_path, fsync_interval=0)
+        store.put(self.NS, "a", {"task": "A"})
+        store.put(self.NS, "b", {"task": "B"})
+        store.put(self.NS, "a", {"task": "A2"})
+        store.delete(self.NS, "b")
+        written = store.get(self.NS, "a")
+        store.close()
+
+        restored = self._open(tmp_path)
+        item = restored.get(self.NS, "a")
+        assert item.value == {"task": "A2"} and item.updated_at == written.updated_at
+        assert restored.get(self.NS, "b") is None
+        assert [i.key for i in restored.search(("todo",))] == ["a"]
+        assert restored.stats()["replayed_records"] == 4
+        restored.close()
+
+    def test_update_keeps_created_at(self, tmp_path):
+        """Test an update keeps the item's creation time, also after replay."""
+        store = self._open(tmp_path, fsync_interval=0)
+        store.put(self.NS, "a", {"task": "A"})
+        created = store.get(self.NS, "a").created_at
+        time.sleep(0.01)
+        store.put(self.NS, "a", {"task": "A2"})
+        updated = store.get(self.NS, "a")
+        assert updated.created_at == created and updated.updated_at > created
+        store.close()
+
+        restored = self._open(tmp_path)
+        item = restored.get(self.NS, "a")
+        assert item.created_at == created and item.updated_at == updated.updated_at
+        restored.close()
+
+    def test_snapshot_replays_only_later_segments(self, tmp_path):
+        """Test restore loads the snapshot and replays just the journal written after it."""
+        store = self._open(tmp_path, snapshot_every=0)
+        for i in range(10):
+            store.put(self.NS, str(i), {"task": f"Task {i}"})
+        store.snapshot()
+        store.put(self.NS, "10", {"task": "Task 10"})
+        store.delete(self.NS, "0")
+        store.close()
+        assert sorted(os.listdir(tmp_path / "journal")) == ["journal-00000001.log", "snapshot.bin"]
+
+        restored = self._open(tmp_path)
+        stats = restored.stats()
+        assert stats["restored_items"] == 10 and stats["replayed_records"] == 2
+        assert sorted(int(i.key) for i in restored.search(self.NS, limit=20)) == list(range(1, 11))
+        restored.close()
+
+    def test_background_snapshot_after_threshold(self, tmp_path):
+        """Test a snapshot is taken once snapshot_every writes have been journaled."""
+        store = self._open(tmp_path, snapshot_every=5)
+        store.batch([PutOp(self.NS, str(i), {"task": i}) for i in range(5)])
+        store._snapshot_thread.join()
+        assert store.stats()["snapshots"] == 1 and store.stats()["records_since_snapshot"] == 0
+        store.close()
+        assert self._open(tmp_path).stats()["restored_items"] == 5
+
+    def test_torn_tail_is_discarded(self, tmp_path):
+        """Test a frame cut short by a crash is dropped and later writes still replay."""
+        store = self._open(tmp_path, fsync_interval=0)
+        store.put(self.NS, "a", {"task": "A"})
+        store.put(self.NS, "b", {"task": "B"})
+        store.close()
+        segment = tmp_path / "journal" / "journal-00000000.log"
+        segment.write_bytes(segment.read_bytes()[:-3])
+
+        restored = self._open(tmp_path)
+        assert restored.get(self.NS, "a") is not None and restored.get(self.NS, "b") is None
+        assert restored.stats()["torn_frames"] == 1
+        restored.put(self.NS, "c", {"task": "C"})
+        restored.close()
+        assert {i.key for i in self._open(tmp_path).search(self.NS)} == {"a", "c"}
+
+    def test_unencodable_batch_is_not_applied(self, tmp_path):
+        """Test a batch the journal cannot encode fails without touching memory or disk."""
+        store = self._open(tmp_path)
+        with pytest.raises(TypeError):
+            store.batch([PutOp(self.NS, "a", {"task": "A"}), PutOp(self.NS, "b", {"task": object()})])
+        assert store.get(self.NS, "a") is None and store.stats()["bytes"] == 0
+        store.close()
+
+
+class TestRedisStore:
+    """Test the Redis-backed BaseStore against the in-process stand-in."""
+
+    @pytest.fixture
+    def store(self, redis_client):
+        from storage.redis_store import RedisStore
+        return RedisStore(redis_client)
+
+    def test_put_get_delete(self, store):
+        """Test items round-trip, updates keep created_at and deletes remove them."""
+        namespace = ("profile", "general", "u1")
+        store.put(namespace, "user_profile", {"name": "Ana", "interests": ["climbing"]})
+        item = store.get(namespace, "user_profile")
+        assert item.value == {"name": "Ana", "interests": ["climbing"]} and item.namespace == namespace
+        store.put(namespace, "user_profile", {"name": "Ana B."})
+        updated = store.get(namespace, "user_profile")
+        assert updated.value == {"name": "Ana B."} and updated.created_at == item.created_at
+        store.delete(namespace, "user_profile")
+        assert store.get(namespace, "user_profile") is None
+        assert store.list_namespaces() == []
+
+    def test_batch_rejects_dotted_labels(self, store, redis_client):
+        """Test raw and versioned batches write nothing for a label containing the separator."""
+        from langgraph.store.base import InvalidNamespaceError, PutOp
+        namespace = ("todo", "general", "john.doe")
+        for value in ({"task": "A"}, {"task": "A", "_version": 1}):
+            with pytest.raises(InvalidNamespaceError):
+                store.batch([PutOp(("todo", "general", "jane"), "b", {"task": "B"}), PutOp(namespace, "a", value)])
+        assert store.search(("todo", "general")) == []
+        assert redis_client.execute("DBSIZE") == 0
+
+    def test_search_matches_sqlite_store(self, store, tmp_path):
+        """Test prefix scoping, filters, order and paging agree with SqliteStore."""
+        from storage.sqlite_store import SqliteStore
+        reference = SqliteStore(str(tmp_path / "store.db"))
+        for namespace, key, value in [
+            (("todo", "general", "u1"), "a", {"task": "A", "status": "done", "time_to_complete": 10}),
+            (("todo", "general", "u10"), "b", {"task": "B", "status": "done"}),
+            (("todo", "general", "u1", "archive"), "c", {"task": "C", "status": "open", "time_to_complete": 30}),
+            (("todo", "general", "u1"), "d", {"task": "D", "status": "done", "time_to_complete": 20}),
+        ]:
+            store.put(namespace, key, value)
+            reference.put(namespace, key, value)
+        searches = [
+            (("todo", "general", "u1"), {}),
+            (("todo",), {}),
+            (("todo",), {"filter": {"status": "done"}}),
+            (("todo", "general", "u1"), {"filter": {"time_to_complete": {"$gte": 20}}}),
+            (("todo",), {"limit": 2, "offset": 1}),
+        ]
+        for prefix, kwargs in searches:
+            expected = [(i.namespace, i.key) for i in reference.search(prefix, **kwargs)]
+            assert [(i.namespace, i.key) for i in store.search(prefix, **kwargs)] == expected, (prefix, kwargs)
+        assert store.list_namespaces(prefix=("todo",), max_depth=3) == reference.list_namespaces(prefix=("todo",), max_depth=3)
+        reference.close()
+
+    def test_batch_is_pipelined_and_atomic(self, store, redis_client):
+        """Test a batch costs one round-trip and a failing batch writes nothing."""
+        from langgraph.store.base import GetOp
+        namespace = ("todo", "general", "u1")
+        store.batch([PutOp(namespace, str(i), {"task": f"Task {i}"}) for i in range(10)])
+        before = redis_client.stats()["round_trips"]
+        results = store.batch([GetOp(namespace, str(i)) for i in range(10)])
+        assert [r.value["task"] for r in results] == [f"Task {i}" for i in range(10)]
+        assert redis_client.stats()["round_trips"] - before == 1
+        with pytest.raises(TypeError):
+            store.batch([PutOp(namespace, "x", {"task": "X"}), PutOp(namespace, "y", {"task": object()})])
+        assert store.get(namespace, "x") is None
+
+    @pytest.mark.asyncio
+    async def test_replicas_share_memories(self, store, redis_client):
+        """Test a second store on the same Redis, as another replica would have, sees the first's writes."""
+        from graph.memory import aload_memories
+        from storage.redis_client import RedisClient
+        from storage.redis_store import RedisStore
+        await store.aput(("profile", "general", "u1"), "user_profile", {"name": "Ana"})
+        await store.aput(("todo", "general", "u1"), "t1", {"task": "Renew passport"})
+        other_client = RedisClient(redis_client.url)
+        memories = await aload_memories(RedisStore(other_client), "u1", "general")
+        other_client.close()
+        assert memories.user_profile == {"name": "Ana"}
+        assert [todo.value["task"] for todo in memories.todos] == ["Renew passport"]
+
+
+class TestRedisCheckpointer:
+    """Test the Redis checkpointer against the in-process stand-in."""
+
+    @pytest.fixture
+    def saver(self, redis_client):
+        from storage.redis_checkpointer import RedisSaver
+        return RedisSaver(redis_client)
+
+    @pytest.mark.asyncio
+    async def test_conversation_resumes_on_another_replica(self, saver, redis_client):
+        """Test a thread written through one client continues through another."""
+        from storage.redis_checkpointer import RedisSaver
+        from storage.redis_client import RedisClient
+        await _chat(saver, "shared", turns=2)
+        other_client = RedisClient(redis_client.url)
+        graph, config = await _chat(RedisSaver(other_client), "shared", turns=1)
+        messages = (await graph.aget_state(config)).values["messages"]
+        other_client.close()
+        assert [m.content for m in messages if m.type == "human"] == ["Message 0", "Message 1", "Message 0"]
+
+    @pytest.mark.asyncio
+    async def test_list_filters_and_delete_thread(self, saver, redis_client):
+        """Test listing newest first with filters and limits, and deleting a thread's keys."""
+        graph, config = await _chat(saver, "listed", turns=2)
+        await _chat(saver, "other", turns=1)
+        checkpoints = list(saver.list(config))
+        assert checkpoints[0].config == (await saver.aget_tuple(config)).config
+        assert [c.checkpoint["id"] for c in checkpoints] == sorted((c.checkpoint["id"] for c in checkpoints), reverse=True)
+        assert len([c async for c in saver.alist(config, limit=2)]) == 2
+        assert all(c.metadata["source"] == "input" for c in saver.list(config, filter={"source": "input"}))
+        assert len(list(saver.list(config, before=checkpoints[0].config))) == len(checkpoints) - 1
+        assert {c.config["configurable"]["thread_id"] for c in saver.list(None)} == {"listed", "other"}
+        await saver.adelete_thread("listed")
+        assert saver.get_tuple(config) is None
+        assert saver.get_tuple({"configurable": {"thread_id": "other"}}) is not None
+        keys = await redis_client.aexecute("SMEMBERS", "asis:cp-threads")
+        assert keys == [b"other"]
+
+    def test_sync_graph_runs(self, saver):
+        """Test the sync checkpointer methods work from plain (non-async) code."""
+        from graph import nodes
+        from graph.builder import builder
+        from benchmarks.fake_model import FakeChatModel
+        graph = builder.compile(checkpointer=saver, store=InMemoryStore())
+        config = {"configurable": {"thread_id": "sync", "user_id": "test-user"}}
+        with patch.object(nodes, 'model', FakeChatModel(responses=["Noted."])):
+            graph.invoke({"messages": [HumanMessage(content="Hello")]}, config)
+        assert len(graph.get_state(config).values["messages"]) == 2
+
+
+class TestRedisClient:
+    """Test the pooled RESP client."""
+
+    @pytest.mark.asyncio
+    async def test_pool_bounds_concurrent_connections(self, redis_client):
+        """Test concurrent callers share at most max_connections connections."""
+        await redis_client.aexecute("SET", "k", "v")
+        replies = await asyncio.gather(*(redis_client.aexecute("GET", "k") for _ in range(50)))
+        assert replies == [b"v"] * 50
+        assert redis_client.stats()["connections"] <= redis_client.max_connections
+
+    def test_error_replies_raise(self, redis_client):
+        """Test an error reply raises RedisError and leaves the connection usable."""
+        from storage.redis_client import RedisError
+        redis_client.execute("SET", "k", "v")
+        with pytest.raises(RedisError, match="WRONGTYPE"):
+            redis_client.execute("HGET", "k", "field")
+        assert redis_client.execute("PING") == "PONG"
@@ -23,8 +23,8 @@ class Sniffer:
                     r.outputs["generations"][0][0]["message"]["kwargs"]["tool_calls"]
                 )
 
-def extract_tool_info(tool_calls: List, schema_name: str = "Memory") -> str:
-    """Extract information from tool calls for both patches and new memories in Trustcall.
+def collect_tool_changes(tool_calls: List, schema_name: str = "Memory") -> List[Dict[str, Any]]:
+    """Classify Trustcall tool calls as new documents, updates and no-op patches.
     
     Args:
         tool_calls: List of tool calls from the model
@@ -54,6 +54,17 @@ def extract_tool_info(tool_calls: List, schema_name: str = "Memory") -> str:
             elif call['name'] == schema_name:
                 changes.append({ 'type': 'new', 'value': call['args']})
 
+    return changes
+
+def extract_tool_info(tool_calls: List, schema_name: str = "Memory") -> str:
+    """Extract information from tool calls for both patches and new memories in Trustcall.
+    
+    Args:
+        tool_calls: List of tool calls from the model
+        schema_name: Name of the schema tool (e.g., "Memory", "ToDo", "Profile")
+    """
+    changes = collect_tool_changes(tool_calls, schema_name)
+
     # Format results as a single string
     result_parts = []
     for change in changes:
@@ -76,6 +87,10 @@ def extract_tool_info(tool_calls: List, schema_name: str = "Memory") -> str:
     
     return "\n\n".join(result_parts)
 
+def estimate_tokens(value: Any) -> int:
+    """Rough prompt-token cost of rendering `value` (about 4 characters per token)."""
+    return max(1, len(str(value)) // 4)
+
 def retry_on_failure(max_retries: int = 3, delay: float = 1.0):
     """Retry decorator with exponential backoff."""
     def decorator(func):
@@ -0,0 +1,222 @@
+"""Process-wide scheduler for outbound model calls.
+
+Every model and extractor call asks `LLMScheduler` for a slot before it goes
+to the provider. A slot is granted when
+
+- fewer than `max_concurrency` calls are in flight,
+- the requests-per-minute and tokens-per-minute buckets have capacity, and
+- no higher-priority call is waiting: interactive `task_asis` replies go
+  ahead of background `update_*` extraction and summaries.
+
+When more than `max_queue_depth` calls are already waiting, new calls are
+rejected with `SchedulerRejectedError` instead of piling up. Sync and async
+callers share the same queue.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from config import app_config
+
+T = TypeVar("T")
+
+# Priority classes: lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class SchedulerRejectedError(RuntimeError):
+    """Raised when too many model calls are already waiting for a slot."""
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, up to `per_minute`; 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests over capacity wait for a full bucket)."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount: float):
+        """Consume `amount`; the level may go negative to account for oversized requests."""
+        if self.capacity > 0:
+            self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "wake", "enqueued", "granted", "cancelled")
+
+    def __init__(self, priority: int, seq: int, tokens: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.wake = wake
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """Priority queue, concurrency limit and RPM/TPM token buckets in front of the model."""
+
+    def __init__(self, max_concurrency: int = 8, rpm: float = 0, tpm: float = 0, max_queue_depth: int = 100):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._waiting = 0
+        self._in_flight = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self.rejections = 0
+        self._wait_totals = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._wait_counts = {priority: 0 for priority in PRIORITY_NAMES}
+        self.max_wait = 0.0
+
+    @classmethod
+    def from_app_config(cls) -> "LLMScheduler":
+        """Build the scheduler from the LLM_* settings."""
+        return cls(
+            max_concurrency=app_config.llm_max_concurrency,
+            rpm=app_config.llm_rpm,
+            tpm=app_config.llm_tpm,
+            max_queue_depth=app_config.llm_queue_max_depth,
+        )
+
+    def _dispatch(self):
+        """Grant slots to waiters in priority order while capacity lasts (lock held)."""
+        while self._queue:
+            waiter = self._queue[0]
+            if waiter.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            if self._in_flight >= self.max_concurrency:
+                return
+            now = time.monotonic()
+            delay = max(self._requests.wait_time(1, now), self._tokens.wait_time(waiter.tokens, now))
+            if delay > 0:
+                # Rate limited: try again once the buckets have refilled
+                if self._timer is None:
+                    self._timer = threading.Timer(delay, self._on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(waiter.tokens)
+            self._waiting -= 1
+            self._in_flight += 1
+            waiter.granted = True
+            waited = now - waiter.enqueued
+            self._wait_totals[waiter.priority] += waited
+            self._wait_counts[waiter.priority] += 1
+            self.max_wait = max(self.max_wait, waited)
+            waiter.wake()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enqueue(self, priority: int, tokens: int, wake: Callable[[], None]) -> _Waiter:
+        with self._lock:
+            if self.max_queue_depth and self._waiting >= self.max_queue_depth:
+                self.rejections += 1
+                raise SchedulerRejectedError(f"{self._waiting} model calls already queued")
+            waiter = _Waiter(priority, next(self._seq), tokens, wake)
+            heapq.heappush(self._queue, waiter)
+            self._waiting += 1
+            self._dispatch()
+            return waiter
+
+    def _abandon(self, waiter: _Waiter):
+        """Give back a slot (or queue position) a cancelled caller no longer needs."""
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+            elif not waiter.cancelled:
+                waiter.cancelled = True
+                self._waiting -= 1
+            self._dispatch()
+
+    def _release(self, waiter: _Waiter, result: Any):
+        with self._lock:
+            self._in_flight -= 1
+            # Charge the TPM bucket for what the call actually used, when the provider reports it
+            usage = getattr(result, "usage_metadata", None)
+            if isinstance(usage, dict) and usage.get("total_tokens"):
+                self._tokens.take(usage["total_tokens"] - waiter.tokens)
+            self._dispatch()
+
+    def run(self, fn: Callable[[], T], priority: int = BACKGROUND, tokens: int = 1) -> T:
+        """Run a blocking call once a slot is granted."""
+        granted = threading.Event()
+        waiter = self._enqueue(priority, tokens, granted.set)
+        granted.wait()
+        result = None
+        try:
+            result = fn()
+            return result
+        finally:
+            self._release(waiter, result)
+
+    async def arun(self, fn: Callable[[], Awaitable[T]], priority: int = BACKGROUND, tokens: int = 1) -> T:
+        """Run an async call once a slot is granted; cancellation gives the slot back."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = self._enqueue(priority, tokens, wake)
+        try:
+            await granted
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        result = None
+        try:
+            result = await fn()
+            return result
+        finally:
+            self._release(waiter, result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Scheduler gauges and counters for monitoring."""
+        with self._lock:
+            stats: Dict[str, Any] = {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "rejections": self.rejections,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                count = self._wait_counts[priority]
+                stats[f"{name}_wait_ms"] = round(self._wait_totals[priority] / count * 1000, 2) if count else 0.0
+            return stats
+
+
+# Global scheduler shared by every model call in the process
+llm_scheduler = LLMScheduler.from_app_config()
@@ -8,6 +8,7 @@ class Metrics:
         self.requests_total = 0
         self.errors_total = 0
         self.memory_updates = 0
+        self.llm_calls_saved = 0
         self.response_times = []
     
     def record_request(self, response_time: float):
@@ -25,6 +26,10 @@ class Metrics:
         """Record a memory update operation."""
         self.memory_updates += 1
     
+    def record_llm_call_saved(self):
+        """Record a model call skipped by a templated reply."""
+        self.llm_calls_saved += 1
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get current metrics statistics."""
         avg_response_time = sum(self.response_times) / len(self.response_times) if self.response_times else 0
@@ -32,6 +37,7 @@ class Metrics:
             "requests_total": self.requests_total,
             "errors_total": self.errors_total,
             "memory_updates": self.memory_updates,
+            "llm_calls_saved": self.llm_calls_saved,
             "avg_response_time": avg_response_time,
             "error_rate": self.errors_total / max(self.requests_total, 1)
         }
@@ -0,0 +1,283 @@
+"""Retries, circuit breaking and request hedging for model calls.
+
+`ResiliencePolicy` wraps a model or extractor call so that transient provider
+errors (rate limits, 5xx, timeouts, dropped connections) are retried with
+exponential backoff and full jitter inside a per-call deadline. A shared
+`CircuitBreaker` makes calls fail fast with `CircuitOpenError` while the
+provider keeps failing, and async calls can optionally be hedged: if the first
+attempt is still running after the p95 of recent latencies, a second one is
+started and whichever finishes first wins.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from config import app_config
+from utils.logging_config import logger
+
+try:
+    from langchain_core.exceptions import ModelAPIError, ModelConnectionError, ModelRateLimitError, ModelTimeoutError
+    PROVIDER_ERRORS: tuple = (ModelAPIError, ModelConnectionError, ModelRateLimitError, ModelTimeoutError)
+except ImportError:  # langchain-core without typed model errors
+    PROVIDER_ERRORS = ()
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether `error` looks transient: a provider/server error, timeout or connection failure."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, PROVIDER_ERRORS + (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures -> half-open after `reset_timeout`.
+
+    In the half-open state a single trial call is let through; its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.rejections = 0
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" or "half_open"."""
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if now - self._opened_at >= self.reset_timeout else "open"
+
+    def before_call(self):
+        """Raise `CircuitOpenError` unless a call may go to the provider now."""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejections += 1
+        raise CircuitOpenError("Model provider circuit is open; failing fast")
+
+    def record_success(self):
+        """A call succeeded: close the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """A call failed with a transient error."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """A call ended with an error that says nothing about provider health."""
+        with self._lock:
+            self._trial_running = False
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The `q` quantile (0-1) of the window, or None when it is empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class ResiliencePolicy:
+    """Retry, circuit-breaker and hedging policy shared by every model call."""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float = 60.0,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_app_config(cls) -> "ResiliencePolicy":
+        """Build the policy from the MODEL_* / CIRCUIT_* / HEDGE_* settings."""
+        return cls(
+            max_attempts=app_config.model_max_attempts,
+            base_delay=app_config.model_retry_base_delay,
+            max_delay=app_config.model_retry_max_delay,
+            deadline=app_config.model_call_deadline,
+            breaker=CircuitBreaker(app_config.circuit_failure_threshold, app_config.circuit_reset_timeout),
+            hedge=app_config.hedge_requests,
+            hedge_min_samples=app_config.hedge_min_samples,
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _record(self, error: Optional[BaseException], started: float, track_latency: bool = False):
+        if error is None:
+            # Only hedge-eligible calls feed the p95, so slow extractor calls don't skew it
+            if track_latency:
+                self.latency.record(time.monotonic() - started)
+            self.breaker.record_success()
+        elif self.retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def _retry_delay(self, error: BaseException, attempt: int, deadline_at: float) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up and re-raise."""
+        if not self.retryable(error) or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        if time.monotonic() + delay >= deadline_at:
+            return None
+        self.retries += 1
+        logger.warning(f"Model call attempt {attempt} failed ({error!r}); retrying in {delay:.2f}s")
+        return delay
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run a blocking call under the policy.
+
+        The deadline is checked between attempts; a blocking attempt cannot be
+        interrupted. Hedging applies to async calls only.
+        """
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                self._record(e, started)
+                delay = self._retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._record(None, started)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], hedge: bool = False) -> T:
+        """Run an async call under the policy, hedging it when `hedge` and HEDGE_REQUESTS are on."""
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            started = time.monotonic()
+            try:
+                remaining = deadline_at - started
+                if remaining <= 0:
+                    raise TimeoutError("Model call deadline exceeded")
+                if hedge and self.hedge:
+                    result = await asyncio.wait_for(self._hedged(fn), remaining)
+                else:
+                    result = await asyncio.wait_for(fn(), remaining)
+            except Exception as e:
+                self._record(e, started, hedge)
+                delay = self._retry_delay(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._record(None, started, hedge)
+            return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Start a second attempt if the first outlives the recent p95 latency; first result wins."""
+        hedge_after = self.latency.percentile(0.95) if len(self.latency) >= self.hedge_min_samples else None
+        primary = asyncio.ensure_future(fn())
+        pending = {primary}
+        try:
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(fn()))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel the losing attempt (or both, if the deadline cancelled us)
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Policy counters for monitoring."""
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "circuit_rejections": self.breaker.rejections,
+            "circuit_state": self.breaker.state,
+        }
+
+
+# Global policy shared by every model call in the graph
+model_resilience = ResiliencePolicy.from_app_config()
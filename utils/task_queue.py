@@ -0,0 +1,113 @@
+"""In-process asyncio work queue for background memory extraction."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from utils.logging_config import logger
+
+
+class KeyedTaskQueue:
+    """Run background jobs with bounded concurrency and per-key ordering.
+
+    Jobs submitted under the same key (e.g. a user ID) run strictly one after
+    another in submission order; jobs for different keys run concurrently, at
+    most `max_concurrency` at a time.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tails: Dict[str, asyncio.Task] = {}
+        self._pending: Set[asyncio.Task] = set()
+        self._closed = False
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def closed(self) -> bool:
+        """Whether the queue has started draining."""
+        return self._closed
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs queued or running."""
+        return len(self._pending)
+
+    def submit(self, key: str, job: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Schedule `job` to run after every job previously submitted for `key`."""
+        if self._closed:
+            raise RuntimeError("Task queue is draining; no new jobs are accepted")
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._run(key, job, previous))
+        self._tails[key] = task
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _run(self, key: str, job: Callable[[], Awaitable[Any]], previous: Optional[asyncio.Task]):
+        try:
+            if previous is not None:
+                # Wait for the previous job of this key, whatever its outcome
+                await asyncio.wait([previous])
+            async with self._semaphore:
+                result = await job()
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Background job for {key} failed: {e}", exc_info=True)
+        finally:
+            if self._tails.get(key) is asyncio.current_task():
+                del self._tails[key]
+
+    async def wait(self, key: str):
+        """Wait until every job submitted so far for `key` has finished."""
+        tail = self._tails.get(key)
+        if tail is not None and tail is not asyncio.current_task():
+            await asyncio.wait([tail])
+
+    def wait_blocking(self, key: str):
+        """`wait` for synchronous callers on another thread than the queue's event loop.
+
+        Raises `RuntimeError` on the loop's own thread, where blocking would
+        keep the jobs from ever running.
+        """
+        tail = self._tails.get(key)
+        if tail is None or tail.done():
+            return
+        loop = tail.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("Cannot block on background jobs from their event loop; use the async API")
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.wait(key), loop).result()
+
+    async def drain(self, timeout: Optional[float] = None) -> int:
+        """Stop accepting jobs and wait for queued ones to finish.
+
+        Jobs still running after `timeout` seconds are cancelled. Returns the
+        number of cancelled jobs.
+        """
+        self._closed = True
+        if not self._pending:
+            return 0
+        logger.info(f"Draining {len(self._pending)} background jobs")
+        _, still_running = await asyncio.wait(set(self._pending), timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        if still_running:
+            await asyncio.wait(still_running)
+            logger.warning(f"Cancelled {len(still_running)} background jobs on shutdown")
+        return len(still_running)
+
+    def stats(self) -> Dict[str, int]:
+        """Queue counters for monitoring."""
+        return {
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+        }